@@ -0,0 +1,92 @@
+"""
+Memory benchmark of the in-memory repo model on synthetic repos (no DB needed).
+Compares the old dict-of-dicts tree with what the bot actually keeps resident: RepoTree.build,
+i.e. the __slots__ nodes plus the materialized paths and the name search index, measured with
+tracemalloc. (The old model had no search or path index, so RepoTree does more with its bytes.)
+
+Usage: python3 -m benchmarks.bench_memory [objects ...]   (default: 10000 100000 1000000)
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from services.repo_tree import RepoTree, ROOT_ID
+
+
+def synthetic_repo(objects, seed=42):
+    """
+    Rows shaped like R_DIRECTORY / R_JOB / R_TRANSFORMATION: 5% folders, 35% jobs, 60% trans.
+    Names come from the driver as separate string objects, as psycopg2 returns them.
+    """
+    rnd = random.Random(seed)
+    n_dirs = max(20, objects // 20)
+    n_jobs = objects * 35 // 100
+    n_trans = objects - n_dirs - n_jobs
+    dirs = [(d, 0 if d <= 20 else rnd.randint(1, d - 1), f"DIR_{d:07}") for d in range(1, n_dirs + 1)]
+    jobs = [(i, rnd.randint(1, n_dirs), f"JB_LOAD_{i % (n_jobs // 3 + 1):07}") for i in range(1, n_jobs + 1)]
+    trans = [(i, rnd.randint(1, n_dirs), f"TR_STG_{i % (n_trans // 3 + 1):07}") for i in range(1, n_trans + 1)]
+    return dirs, jobs, trans
+
+
+def legacy_build(dirs, jobs, trans):
+    """The pre-compact model: dict nodes, lists of one-key dicts, subfolder names duplicated."""
+    nodes = {ROOT_ID: {"name": "MAIN MENU", "parent": None, "subfolders": [], "jobs": [], "trans": []}}
+    for d, p, n in dirs:
+        nodes[d] = {"name": n, "parent": p if p != 0 else ROOT_ID, "subfolders": [], "jobs": [], "trans": []}
+    for d, p, n in dirs:
+        pid = nodes[d]['parent']
+        if pid in nodes: nodes[pid]["subfolders"].append({"id": d, "name": n})
+    for _, d, n in jobs:
+        nodes[d if d in nodes else ROOT_ID]["jobs"].append({"name": n})
+    for _, d, n in trans:
+        nodes[d if d in nodes else ROOT_ID]["trans"].append({"name": n})
+    return nodes
+
+
+def fresh_rows(rows):
+    """Copies the rows with new (non-shared) name strings, like a fresh DB fetch."""
+    return [[(a, b, "".join(list(n))) for a, b, n in part] for part in rows]
+
+
+def measure(builder, rows):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    # Traced from the fetch on, so the name strings each model keeps alive are counted
+    rows = fresh_rows(rows)
+    start = time.perf_counter()
+    model = builder(*rows)
+    elapsed = time.perf_counter() - start
+    # The fetched rows are dropped after the build, only the model stays resident
+    del rows
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del model
+    gc.collect()
+    return size, elapsed
+
+
+def main(sizes):
+    print(f"{'objects':>10} {'legacy MB':>10} {'RepoTree MB':>12} {'B/obj old':>10} {'B/obj new':>10} "
+          f"{'change':>7} {'build old':>10} {'build new':>10}")
+    for objects in sizes:
+        rows = synthetic_repo(objects)
+        legacy, legacy_sec = measure(legacy_build, rows)
+        tree, tree_sec = measure(RepoTree.build, rows)
+        print(f"{objects:>10,} {legacy / 2**20:>10.1f} {tree / 2**20:>12.1f} "
+              f"{legacy / objects:>10.0f} {tree / objects:>10.0f} {tree / legacy - 1:>+7.0%} "
+              f"{legacy_sec * 1000:>8.0f}ms {tree_sec * 1000:>8.0f}ms")
+
+    # Sanity check: the real RepoTree holds the same listings as the legacy model
+    rows = synthetic_repo(2000)
+    tree, legacy = RepoTree.build(*rows), legacy_build(*rows)
+    for d, node in legacy.items():
+        listing = tree.listing(d)
+        assert sorted(j['name'] for j in node['jobs']) == listing.jobs
+        assert sorted(s['name'] for s in node['subfolders']) == [n for _, n in listing.subfolders]
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,66 @@
+"""
+Path lookup benchmark on a synthetic repo tree (no DB needed).
+Compares the old recursive get_full_path walk with the materialized path index.
+
+Usage: python3 -m benchmarks.bench_paths [num_dirs]
+"""
+import random
+import sys
+import time
+from services.repo_tree import RepoTree, ROOT_ID
+
+
+def synthetic_dirs(count, seed=42):
+    """Rows (id, parent, name) shaped like R_DIRECTORY: 20 top-level folders, random nesting below."""
+    rnd = random.Random(seed)
+    rows = []
+    for d in range(1, count + 1):
+        parent = 0 if d <= 20 else rnd.randint(1, d - 1)
+        rows.append((d, parent, f"DIR_{d:06}"))
+    return rows
+
+
+def legacy_full_path(nodes, dir_id):
+    """The pre-index implementation: walks up the parents on every call."""
+    if dir_id not in nodes or dir_id == ROOT_ID: return "/"
+    node = nodes[dir_id]
+    if node.parent == ROOT_ID or node.parent is None: return "/" + node.name
+    return f"{legacy_full_path(nodes, node.parent)}/{node.name}".replace("//", "/")
+
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:>10.1f} ms total  {elapsed / repeat * 1e6:>8.2f} us/op")
+    return elapsed
+
+
+def main(count=50_000, lookups=100_000):
+    sys.setrecursionlimit(max(10_000, sys.getrecursionlimit()))
+    rows = synthetic_dirs(count)
+
+    start = time.perf_counter()
+    tree = RepoTree.build(rows, [], [])
+    print(f"Built tree: {count} dirs in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rnd = random.Random(7)
+    ids = [rnd.randint(1, count) for _ in range(lookups)]
+    paths = [tree.get_path(d) for d in ids]
+    depth = sum(p.count("/") for p in paths) / len(paths)
+    print(f"Average depth: {depth:.1f}\n")
+
+    it = iter(ids)
+    legacy = timed("legacy get_full_path", lambda: legacy_full_path(tree.nodes, next(it)), lookups)
+    it = iter(ids)
+    indexed = timed("indexed get_path", lambda: tree.get_path(next(it)), lookups)
+    it = iter(paths)
+    timed("indexed get_dir_id (reverse)", lambda: tree.get_dir_id(next(it)), lookups)
+
+    assert all(legacy_full_path(tree.nodes, d) == tree.get_path(d) for d in ids[:1000])
+    print(f"\nSpeed-up: x{legacy / indexed:.0f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
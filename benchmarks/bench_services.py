@@ -0,0 +1,268 @@
+"""
+Offline benchmark of the service layer against a local Carte stub and a seeded repo DB.
+Measures RepoService.fetch_structure / search_repo / find_sql_usage / get_broken_processes and the
+Carte side (parse_status, decode_log, snapshot / log / trigger / stop calls over HTTP to the stub),
+then writes one JSON report, so runs on two commits or two machines can be compared.
+
+config.settings is replaced by settings_template.py pointed at the stub, the given DB and a temp
+directory; the real config/settings.py is never read and no external host is contacted.
+
+Usage: python3 -m benchmarks.bench_services --dsn "host=127.0.0.1 dbname=pentaho_bench user=postgres"
+           [--objects 100000] [--log-indexes] [--repeat 20] [--out bench.json] [--compare previous.json]
+       python3 -m benchmarks.bench_services --no-db      (Carte part only)
+--objects (re)seeds the DB first (see benchmarks.seed_repo); without it the DB is used as is.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from benchmarks.carte_stub import start_stub, status_xml, log_lines, encode_log
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def install_settings(carte_url, db_conf, workdir):
+    """Loads settings_template.py as config.settings; must run before any services import."""
+    template = os.path.join(ROOT, 'config', 'settings_template.py')
+    module = types.ModuleType('config.settings')
+    # Paths derived from __file__ (strategy file, audit spill, users.json) land in workdir
+    module.__file__ = os.path.join(workdir, 'settings.py')
+    with open(template) as f:
+        exec(compile(f.read(), template, 'exec'), module.__dict__)
+    module.CARTE_URL = carte_url
+    if db_conf: module.DB_CONF = db_conf
+    module.LOG_DIR = workdir
+    # Warm calls must come from memory; re-checks are measured explicitly
+    module.REPO_TREE_CHECK_SEC = 3600
+    module.SQL_INDEX_CHECK_SEC = 3600
+    module.RUN_SUMMARY_CHECK_SEC = 3600
+
+    import config
+    sys.modules['config.settings'] = module
+    config.settings = module
+    return module
+
+
+def summarize(samples):
+    """Sample list (ms) -> stats; keys are stable so reports can be diffed."""
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        'n': n,
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(samples[n // 2], 3),
+        'p95_ms': round(samples[min(n - 1, int(n * 0.95))], 3),
+        'max_ms': round(samples[-1], 3),
+        'mean_ms': round(sum(samples) / n, 3),
+    }
+
+
+class Bench:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def record(self, name, samples, **extra):
+        self.results[name] = dict(summarize(samples), **extra)
+        r = self.results[name]
+        print(f"{name:<42} median {r['median_ms']:>10.3f} ms   p95 {r['p95_ms']:>10.3f} ms   (n={r['n']})")
+
+    def run(self, name, func, repeat=None, setup=None, **extra):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            if setup: setup()
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        self.record(name, samples, **extra)
+
+    async def run_async(self, name, coro_func, repeat=None, **extra):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            await coro_func()
+            samples.append((time.perf_counter() - start) * 1000)
+        self.record(name, samples, **extra)
+
+
+def bench_parsers(bench, status_sizes, log_sizes):
+    from services.carte import parse_status, decode_log
+    for size in status_sizes:
+        doc = status_xml(size // 10, size - size // 10).encode('utf-8')
+        bench.run(f"parse_status.{size}", lambda: parse_status(doc), bytes=len(doc))
+    for size in log_sizes:
+        raw = encode_log(log_lines(size))
+        bench.run(f"decode_log.{size}_lines", lambda: decode_log(raw), bytes=len(raw))
+
+
+async def bench_carte(bench, stub, concurrency):
+    from services.carte import carte_service
+    try:
+        await bench.run_async("carte.snapshot", lambda: carte_service.get_snapshot(max_age=0))
+
+        async def burst():
+            # Many monitor views at once share one /status fetch
+            await asyncio.gather(*(carte_service.get_snapshot(max_age=0) for _ in range(concurrency)))
+        before = stub.requests.get('status', 0)
+        await bench.run_async(f"carte.snapshot.x{concurrency}_concurrent", burst)
+        fetches = stub.requests.get('status', 0) - before
+
+        await bench.run_async("carte.get_log.full", lambda: carte_service.get_log("JB_LOAD_00001", "x", True, 0))
+        await bench.run_async("carte.get_log.incremental",
+                              lambda: carte_service.get_log("JB_LOAD_00001", "x", True, max(0, stub.log_total - 20)))
+        await bench.run_async("carte.trigger_job", lambda: carte_service.trigger_job("JB_LOAD_00001", "/DIR_0000001"))
+        await bench.run_async("carte.stop_process", lambda: carte_service.stop_process("JB_LOAD_00001", "x", True))
+        bench.results[f"carte.snapshot.x{concurrency}_concurrent"]['status_fetches'] = fetches
+    finally:
+        await carte_service.close()
+
+
+def bench_repo(bench, conn, cold_repeat, append):
+    from services.repository import RepoService
+    from services.run_summary import RunSummary
+    from services.sql_index import SqlUsageIndex
+    from benchmarks.seed_repo import append_runs
+
+    # --- fetch_structure ---
+    holder = {}
+
+    def fresh():
+        holder['svc'] = RepoService()
+    bench.run("fetch_structure.cold", lambda: holder['svc'].fetch_structure(), repeat=cold_repeat, setup=fresh)
+    svc = holder['svc']
+    bench.run("fetch_structure.warm", svc.fetch_structure)
+
+    def expire():
+        svc.last_check = 0
+    bench.run("fetch_structure.recheck", svc.fetch_structure, setup=expire)
+    nodes = len(svc.tree.nodes)
+
+    # --- search_repo (names as generated by seed_repo) ---
+    queries = {'exact': "TR_STG_0000042", 'prefix': "JB_LOAD_00001", 'contains': "STG_00004",
+               'fuzzy': "JB_LAOD_0000042", 'miss': "NO_SUCH_PROCESS"}
+    for kind, query in queries.items():
+        bench.run(f"search_repo.{kind}", lambda: svc.search_repo(query), results=len(svc.search_repo(query)))
+
+    # --- find_sql_usage ---
+    def reset_index():
+        svc.sql_index, svc.sql_last_check, svc.sql_last_full = SqlUsageIndex(), 0, 0
+    bench.run("find_sql_usage.index_build", svc.refresh_sql_index, repeat=cold_repeat, setup=reset_index)
+    terms = {'table': "DWH.T_00001", 'column': "STATUS_CODE", 'db_fallback': "IS_ACTIVE = 1"}
+    for kind, term in terms.items():
+        bench.run(f"find_sql_usage.{kind}", lambda: svc.find_sql_usage(term), repeat=cold_repeat if kind == 'db_fallback' else None,
+                  results=len(svc.find_sql_usage(term)))
+
+    # --- get_broken_processes ---
+    def reset_runs():
+        svc.runs, svc.runs_last_check = RunSummary(), 0
+    bench.run("get_broken_processes.cold", svc.get_broken_processes, repeat=cold_repeat, setup=reset_runs)
+    bench.run("get_broken_processes.cached", svc.get_broken_processes)
+
+    def new_rows():
+        append_runs(conn, append)
+        svc.runs_last_check = 0
+    bench.run("get_broken_processes.incremental", svc.get_broken_processes, repeat=cold_repeat, setup=new_rows,
+              appended_rows=append)
+    return {'folders': nodes, 'sql_steps': len(svc.sql_index), 'processes_24h': len(svc.runs.latest)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(report, path):
+    with open(path) as f:
+        base = json.load(f)['results']
+    print(f"\n{'benchmark':<42} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for name, result in report['results'].items():
+        if name not in base: continue
+        before, after = base[name]['median_ms'], result['median_ms']
+        change = f"{after / before:.2f}x" if before else "-"
+        print(f"{name:<42} {before:>11.3f} {after:>11.3f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dsn', help='libpq connection string of the scratch repo database')
+    parser.add_argument('--no-db', action='store_true', help="only the Carte stub / parser benchmarks")
+    parser.add_argument('--objects', type=int, help="reseed the DB with this many objects first")
+    parser.add_argument('--runs', type=int, default=50_000, help="log rows when reseeding")
+    parser.add_argument('--log-indexes', action='store_true', help="reseed with the LOGDATE / REPLAYDATE indexes")
+    parser.add_argument('--repeat', type=int, default=20, help="samples per warm benchmark")
+    parser.add_argument('--cold-repeat', type=int, default=3, help="samples per cold (full load) benchmark")
+    parser.add_argument('--append', type=int, default=200, help="new log rows per incremental summary sample")
+    parser.add_argument('--stub-jobs', type=int, default=200)
+    parser.add_argument('--stub-trans', type=int, default=2000)
+    parser.add_argument('--stub-log-lines', type=int, default=500)
+    parser.add_argument('--stub-latency-ms', type=float, default=2)
+    parser.add_argument('--concurrency', type=int, default=20, help="parallel snapshot callers")
+    parser.add_argument('--status-sizes', default="100,1000,10000", help="entries in parsed /status documents")
+    parser.add_argument('--log-sizes', default="100,10000", help="lines in decoded logs")
+    parser.add_argument('--out', default="bench_services.json")
+    parser.add_argument('--compare', help="previous report to compare medians with")
+    args = parser.parse_args()
+    if not args.dsn and not args.no_db:
+        parser.error("--dsn is required (or --no-db)")
+
+    logging.basicConfig(level=logging.WARNING)
+    stub, carte_url = start_stub(args.stub_jobs, args.stub_trans, args.stub_log_lines, args.stub_latency_ms)
+    db_conf = None
+    if not args.no_db:
+        import psycopg2.extensions
+        db_conf = psycopg2.extensions.parse_dsn(args.dsn)
+
+    bench = Bench(args.repeat)
+    repo_info, seeded = None, None
+    with tempfile.TemporaryDirectory() as workdir:
+        install_settings(carte_url, db_conf, workdir)
+
+        bench_parsers(bench, [int(s) for s in args.status_sizes.split(',')], [int(s) for s in args.log_sizes.split(',')])
+        asyncio.run(bench_carte(bench, stub, args.concurrency))
+
+        if not args.no_db:
+            import psycopg2
+            from benchmarks.seed_repo import seed
+            from services.db import db_pool
+            conn = psycopg2.connect(args.dsn)
+            try:
+                if args.objects:
+                    print(f"Seeding {args.objects:,} objects...")
+                    seeded = seed(conn, args.objects, runs=args.runs, log_indexes=args.log_indexes)
+                repo_info = bench_repo(bench, conn, args.cold_repeat, args.append)
+            finally:
+                conn.close()
+                db_pool.close_all()
+    stub.shutdown()
+
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('dsn', 'out', 'compare')},
+            'seeded_rows': seeded,
+            'repo': repo_info,
+        },
+        'results': bench.results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.out}")
+    if args.compare: compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stand-in for a Carte server (no network, no Pentaho needed).
+Serves the XML of /status, executeJob/executeTrans, jobStatus/transStatus and stopJob/stopTrans
+with a configurable number of processes, log size and per-request latency.
+
+Usage: python3 -m benchmarks.carte_stub [--port 8081] [--jobs 200] [--trans 2000] [--log-lines 500] [--latency-ms 5]
+       (then point CARTE_URL at http://127.0.0.1:<port>/kettle)
+"""
+import argparse
+import base64
+import gzip
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+JOB_STATES = ["Running", "Finished", "Finished", "Finished (with errors)", "Stopped", "Initializing"]
+TRANS_STATES = ["Running", "Finished", "Finished", "Stopped (with errors)", "Waiting", "Stopped"]
+
+
+def status_xml(jobs, trans, seed=42):
+    """A /status?xml=Y document with the given number of job and transformation entries."""
+    rnd = random.Random(seed)
+    parts = ["<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<serverstatus><statusdesc>Online</statusdesc><jobstatuslist>"]
+    for i in range(jobs):
+        parts.append(f"<jobstatus><jobname>JB_LOAD_{i:05}</jobname><id>{uuid.UUID(int=rnd.getrandbits(128))}</id>"
+                     f"<status_desc>{rnd.choice(JOB_STATES)}</status_desc><error_desc/>"
+                     f"<logging_string><![CDATA[]]></logging_string><first_log_line_nr>0</first_log_line_nr>"
+                     f"<last_log_line_nr>0</last_log_line_nr></jobstatus>")
+    parts.append("</jobstatuslist><transstatuslist>")
+    for i in range(trans):
+        parts.append(f"<transstatus><transname>TR_STG_{i:05}</transname><id>{uuid.UUID(int=rnd.getrandbits(128))}</id>"
+                     f"<status_desc>{rnd.choice(TRANS_STATES)}</status_desc><error_desc/><paused>N</paused>"
+                     f"<stepstatuslist/><first_log_line_nr>0</first_log_line_nr><last_log_line_nr>0</last_log_line_nr>"
+                     f"<logging_string><![CDATA[]]></logging_string></transstatus>")
+    parts.append("</transstatuslist><memory_free>1234567</memory_free><cpu_cores>8</cpu_cores></serverstatus>")
+    return "".join(parts)
+
+
+def log_lines(count, start=0):
+    return "".join(f"2024/01/01 02:{(i // 60) % 60:02}:{i % 60:02} - STEP_{i % 17:02} - Finished processing "
+                   f"(I=0, O=0, R={i * 37}, W={i * 37}, U=0, E=0)\n" for i in range(start, count))
+
+
+def encode_log(text):
+    """Carte's XML mode: logging_string is gzipped, then base64."""
+    return base64.b64encode(gzip.compress(text.encode('utf-8'))).decode('ascii')
+
+
+def process_status_xml(name, carte_id, is_job, log_total, from_line=0):
+    """jobStatus/transStatus?xml=Y: status plus the log lines after `from`."""
+    tag, name_tag = ("jobstatus", "jobname") if is_job else ("transstatus", "transname")
+    from_line = min(max(from_line, 0), log_total)
+    return (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<{tag}><{name_tag}>{escape(name)}</{name_tag}><id>{carte_id}</id>"
+            f"<status_desc>Running</status_desc><error_desc/>"
+            f"<logging_string><![CDATA[{encode_log(log_lines(log_total, from_line))}]]></logging_string>"
+            f"<first_log_line_nr>{from_line}</first_log_line_nr><last_log_line_nr>{log_total}</last_log_line_nr>"
+            f"<result><lines_read>0</lines_read><lines_written>0</lines_written><nr_errors>0</nr_errors></result></{tag}>")
+
+
+def webresult(message, carte_id=None):
+    id_tag = f"<id>{carte_id}</id>" if carte_id else ""
+    return (f"<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<webresult><result>OK</result>"
+            f"<message>{escape(message)}</message>{id_tag}</webresult>")
+
+
+class CarteStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Carte's Jetty
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't add delayed-ACK stalls
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if server.latency: time.sleep(server.latency)
+        server.requests[endpoint] = server.requests.get(endpoint, 0) + 1
+
+        if endpoint == 'status':
+            body = server.status_body
+        elif endpoint in ('executeJob', 'executeTrans'):
+            body = webresult("Started", uuid.uuid4())
+        elif endpoint in ('jobStatus', 'transStatus'):
+            name = query.get('name') or query.get('trans') or ''
+            body = process_status_xml(name, query.get('id', ''), endpoint == 'jobStatus',
+                                      server.log_total, int(query.get('from', 0) or 0))
+        elif endpoint in ('stopJob', 'stopTrans'):
+            body = webresult("Stop requested")
+        else:
+            self.send_error(404)
+            return
+
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(jobs=200, trans=2000, log_total=500, latency_ms=0, port=0):
+    """Starts the stub in a daemon thread; returns (server, base_url ending in /kettle)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), CarteStubHandler)
+    server.daemon_threads = True
+    server.status_body = status_xml(jobs, trans)
+    server.log_total = log_total
+    server.latency = latency_ms / 1000
+    server.requests = {}
+    threading.Thread(target=server.serve_forever, name="carte-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/kettle"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--jobs', type=int, default=200, help="jobs listed in /status")
+    parser.add_argument('--trans', type=int, default=2000, help="transformations listed in /status")
+    parser.add_argument('--log-lines', type=int, default=500, help="log lines per process")
+    parser.add_argument('--latency-ms', type=float, default=5, help="added to every response")
+    args = parser.parse_args()
+    server, url = start_stub(args.jobs, args.trans, args.log_lines, args.latency_ms, args.port)
+    print(f"Carte stub on {url} ({len(server.status_body) / 1024:.0f} KB /status). Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Seeds a local PostgreSQL database with a synthetic Pentaho repository at scale:
+R_DIRECTORY, R_JOB, R_TRANSFORMATION, R_STEP_TYPE, R_STEP, R_STEP_ATTRIBUTE, R_JOB_LOG, R_TRANS_LOG
+(only the columns the bot reads, same names and quoting). Data is deterministic for a given seed.
+Rows are loaded with COPY, so a 1M-object repo takes seconds, not minutes.
+
+Usage: python3 -m benchmarks.seed_repo --dsn "host=127.0.0.1 dbname=pentaho_bench user=postgres" [--objects 100000]
+       [--steps 4] [--runs 50000] [--seed 42] [--log-indexes]   (drops and recreates the R_* tables in that database)
+"""
+import argparse
+import io
+import random
+import time
+from datetime import datetime, timedelta
+import psycopg2
+
+SCHEMA = """
+DROP TABLE IF EXISTS R_DIRECTORY, R_JOB, R_TRANSFORMATION, R_STEP_TYPE, R_STEP, R_STEP_ATTRIBUTE, R_JOB_LOG, R_TRANS_LOG;
+CREATE TABLE R_DIRECTORY (ID_DIRECTORY BIGINT PRIMARY KEY, ID_DIRECTORY_PARENT BIGINT, DIRECTORY_NAME VARCHAR(255));
+CREATE TABLE R_JOB (ID_JOB BIGINT PRIMARY KEY, ID_DIRECTORY BIGINT, "NAME" VARCHAR(255),
+                    CREATED_USER VARCHAR(255), MODIFIED_USER VARCHAR(255));
+CREATE TABLE R_TRANSFORMATION (ID_TRANSFORMATION BIGINT PRIMARY KEY, ID_DIRECTORY BIGINT, "NAME" VARCHAR(255),
+                               CREATED_USER VARCHAR(255), MODIFIED_USER VARCHAR(255));
+CREATE TABLE R_STEP_TYPE (ID_STEP_TYPE BIGINT PRIMARY KEY, CODE VARCHAR(255));
+CREATE TABLE R_STEP (ID_STEP BIGINT PRIMARY KEY, ID_TRANSFORMATION BIGINT, "NAME" VARCHAR(255), ID_STEP_TYPE BIGINT);
+CREATE TABLE R_STEP_ATTRIBUTE (ID_STEP_ATTRIBUTE BIGINT PRIMARY KEY, ID_TRANSFORMATION BIGINT, ID_STEP BIGINT,
+                               NR INTEGER, CODE VARCHAR(255), VALUE_NUM BIGINT, VALUE_STR TEXT);
+CREATE TABLE R_JOB_LOG (ID_JOB INTEGER, CHANNEL_ID VARCHAR(255), JOBNAME VARCHAR(255), STATUS VARCHAR(15),
+                        LINES_READ BIGINT, LINES_WRITTEN BIGINT, ERRORS BIGINT, STARTDATE TIMESTAMP, ENDDATE TIMESTAMP,
+                        LOGDATE TIMESTAMP, DEPDATE TIMESTAMP, REPLAYDATE TIMESTAMP, LOG_FIELD TEXT);
+CREATE TABLE R_TRANS_LOG (ID_BATCH INTEGER, CHANNEL_ID VARCHAR(255), TRANSNAME VARCHAR(255), STATUS VARCHAR(15),
+                          LINES_READ BIGINT, LINES_WRITTEN BIGINT, ERRORS BIGINT, STARTDATE TIMESTAMP, ENDDATE TIMESTAMP,
+                          LOGDATE TIMESTAMP, DEPDATE TIMESTAMP, REPLAYDATE TIMESTAMP, LOG_FIELD TEXT);
+"""
+
+# Indexes the run summary's incremental refresh can use (see README); not part of a stock Pentaho repo
+RUN_LOG_INDEXES = """
+CREATE INDEX IF NOT EXISTS IDX_R_JOB_LOG_LOGDATE ON R_JOB_LOG (LOGDATE);
+CREATE INDEX IF NOT EXISTS IDX_R_JOB_LOG_REPLAYDATE ON R_JOB_LOG (REPLAYDATE);
+CREATE INDEX IF NOT EXISTS IDX_R_TRANS_LOG_LOGDATE ON R_TRANS_LOG (LOGDATE);
+CREATE INDEX IF NOT EXISTS IDX_R_TRANS_LOG_REPLAYDATE ON R_TRANS_LOG (REPLAYDATE);
+"""
+
+STEP_TYPES = [(1, 'TableInput'), (2, 'TableOutput'), (3, 'SelectValues'), (4, 'FilterRows'), (5, 'InsertUpdate')]
+STEP_ATTRIBUTES = ['connection', 'limit', 'lazy_conversion_active']
+USERS = ['admin', 'etl_dev', 'etl_ops', None]
+SCHEMAS = ['DWH', 'STG', 'ODS', 'MART']
+COPY_CHUNK = 50_000
+
+LOG_COLUMNS = {
+    'R_JOB_LOG': ['ID_JOB', 'CHANNEL_ID', 'JOBNAME', 'STATUS', 'LINES_READ', 'LINES_WRITTEN', 'ERRORS', 'STARTDATE',
+                  'ENDDATE', 'LOGDATE', 'DEPDATE', 'REPLAYDATE', 'LOG_FIELD'],
+    'R_TRANS_LOG': ['ID_BATCH', 'CHANNEL_ID', 'TRANSNAME', 'STATUS', 'LINES_READ', 'LINES_WRITTEN', 'ERRORS', 'STARTDATE',
+                    'ENDDATE', 'LOGDATE', 'DEPDATE', 'REPLAYDATE', 'LOG_FIELD'],
+}
+
+
+def table_name(rnd, tables):
+    return f"{rnd.choice(SCHEMAS)}.T_{rnd.randrange(tables):05}"
+
+
+def step_sql(rnd, tables):
+    """A Table Input query over a few of `tables` shared table names, with columns and a filter."""
+    main, joined = table_name(rnd, tables), table_name(rnd, tables)
+    return (f"SELECT a.ID, a.AMOUNT_{rnd.randrange(50)}, b.STATUS_CODE, b.UPDATED_AT\n"
+            f"FROM {main} a\nJOIN {joined} b ON b.ID = a.REF_ID\n"
+            f"WHERE a.LOAD_DATE >= CURRENT_DATE - {rnd.randrange(1, 30)}\n  AND b.IS_ACTIVE = 1")
+
+
+def log_text(rnd, name, size, failed):
+    lines = []
+    while sum(len(l) for l in lines) < size:
+        lines.append(f"2024/01/01 02:00:{len(lines) % 60:02} - {name} - Step {len(lines)} finished "
+                     f"(R={rnd.randrange(10 ** 6)}, W={rnd.randrange(10 ** 6)})")
+    if failed: lines.append(f"ERROR: {name} - ORA-00942: table or view does not exist")
+    return "\n".join(lines)
+
+
+def copy_value(value):
+    """One field in COPY text format."""
+    if value is None: return r"\N"
+    if isinstance(value, datetime): return value.isoformat(' ')
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+
+
+def copy_rows(cur, table, columns, rows):
+    """Streams rows into `table` with COPY, COPY_CHUNK rows per round trip. Returns the row count."""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    count, buf = 0, io.StringIO()
+    for row in rows:
+        buf.write("\t".join(copy_value(v) for v in row) + "\n")
+        count += 1
+        if count % COPY_CHUNK == 0:
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+            buf = io.StringIO()
+    buf.seek(0)
+    cur.copy_expert(sql, buf)
+    return count
+
+
+def run_rows(rnd, names, count, first_id, now, hours=48, log_size=600, failure_rate=0.05):
+    """Log rows (id, channel, name, status, read, written, errors, start, end, logdate, depdate, replaydate, log)."""
+    for i in range(count):
+        name = rnd.choice(names)
+        replay = now - timedelta(seconds=rnd.randrange(int(hours * 3600)))
+        logdate = min(now, replay + timedelta(seconds=rnd.randrange(5, 3600)))
+        failed = rnd.random() < failure_rate
+        rows = rnd.randrange(10 ** 6)
+        yield (first_id + i, f"ch-{first_id + i}", name, 'stop' if failed else 'end', rows, 0 if failed else rows,
+               1 if failed else 0, replay, logdate, logdate, replay, replay, log_text(rnd, name, log_size, failed))
+
+
+def seed(conn, objects=100_000, steps=4, runs=50_000, seed=42, log_indexes=False):
+    """
+    Recreates the tables and fills them: 5% folders, 35% jobs, 60% transformations (as in
+    benchmarks.bench_memory), `steps` steps per transformation (the first is a Table Input with SQL),
+    and `runs` log rows split between R_JOB_LOG and R_TRANS_LOG over the last 48 hours.
+    log_indexes adds RUN_LOG_INDEXES.
+    """
+    rnd = random.Random(seed)
+    n_dirs = max(20, objects // 20)
+    n_jobs = objects * 35 // 100
+    n_trans = objects - n_dirs - n_jobs
+    tables = max(50, objects // 200)
+    now = datetime.now()
+    counts = {}
+
+    cur = conn.cursor()
+    cur.execute(SCHEMA)
+    counts['R_DIRECTORY'] = copy_rows(cur, 'R_DIRECTORY', ['ID_DIRECTORY', 'ID_DIRECTORY_PARENT', 'DIRECTORY_NAME'], (
+        (d, 0 if d <= 20 else rnd.randint(1, d - 1), f"DIR_{d:07}") for d in range(1, n_dirs + 1)))
+    counts['R_JOB'] = copy_rows(cur, 'R_JOB', ['ID_JOB', 'ID_DIRECTORY', '"NAME"', 'CREATED_USER', 'MODIFIED_USER'], (
+        (i, rnd.randint(1, n_dirs), f"JB_LOAD_{i:07}", 'admin', rnd.choice(USERS)) for i in range(1, n_jobs + 1)))
+    counts['R_TRANSFORMATION'] = copy_rows(
+        cur, 'R_TRANSFORMATION', ['ID_TRANSFORMATION', 'ID_DIRECTORY', '"NAME"', 'CREATED_USER', 'MODIFIED_USER'], (
+            (i, rnd.randint(1, n_dirs), f"TR_STG_{i:07}", 'admin', rnd.choice(USERS)) for i in range(1, n_trans + 1)))
+    counts['R_STEP_TYPE'] = copy_rows(cur, 'R_STEP_TYPE', ['ID_STEP_TYPE', 'CODE'], STEP_TYPES)
+
+    def step_rows():
+        for t in range(1, n_trans + 1):
+            for s in range(steps):
+                step_type = 1 if s == 0 else rnd.randint(2, len(STEP_TYPES))
+                yield ((t - 1) * steps + s + 1, t, f"STEP_{s}_{t:07}" if s else f"SRC_T_{t % tables:05}", step_type)
+
+    def attribute_rows():
+        attr_id = 0
+        for t in range(1, n_trans + 1):
+            for s in range(steps):
+                step_id = (t - 1) * steps + s + 1
+                for code in STEP_ATTRIBUTES + (['sql'] if s == 0 else []):
+                    attr_id += 1
+                    value = step_sql(rnd, tables) if code == 'sql' else f"{code}_{rnd.randrange(10)}"
+                    yield attr_id, t, step_id, 0, code, None, value
+
+    counts['R_STEP'] = copy_rows(cur, 'R_STEP', ['ID_STEP', 'ID_TRANSFORMATION', '"NAME"', 'ID_STEP_TYPE'], step_rows())
+    counts['R_STEP_ATTRIBUTE'] = copy_rows(
+        cur, 'R_STEP_ATTRIBUTE', ['ID_STEP_ATTRIBUTE', 'ID_TRANSFORMATION', 'ID_STEP', 'NR', 'CODE', 'VALUE_NUM', 'VALUE_STR'],
+        attribute_rows())
+
+    job_names = [f"JB_LOAD_{i:07}" for i in range(1, n_jobs + 1)]
+    trans_names = [f"TR_STG_{i:07}" for i in range(1, n_trans + 1)]
+    counts['R_JOB_LOG'] = copy_rows(cur, 'R_JOB_LOG', LOG_COLUMNS['R_JOB_LOG'], run_rows(rnd, job_names, runs // 3, 1, now))
+    counts['R_TRANS_LOG'] = copy_rows(cur, 'R_TRANS_LOG', LOG_COLUMNS['R_TRANS_LOG'],
+                                      run_rows(rnd, trans_names, runs - runs // 3, 1, now))
+    if log_indexes: cur.execute(RUN_LOG_INDEXES)
+    cur.execute("ANALYZE")
+    conn.commit()
+    return counts
+
+
+
+def append_runs(conn, count, seed=7):
+    """Adds `count` fresh runs to R_TRANS_LOG (finished just now), like a batch landing mid-night."""
+    rnd = random.Random(seed)
+    cur = conn.cursor()
+    cur.execute('SELECT COALESCE(MAX(ID_BATCH), 0) FROM R_TRANS_LOG')
+    first_id = cur.fetchone()[0] + 1
+    cur.execute('SELECT "NAME" FROM R_TRANSFORMATION ORDER BY ID_TRANSFORMATION LIMIT 1000')
+    names = [r[0] for r in cur.fetchall()]
+    cur.execute("SELECT LOCALTIMESTAMP")
+    now = cur.fetchone()[0]
+    copy_rows(cur, 'R_TRANS_LOG', LOG_COLUMNS['R_TRANS_LOG'], run_rows(rnd, names, count, first_id, now, hours=1 / 60))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dsn', required=True, help='libpq connection string of a scratch database')
+    parser.add_argument('--objects', type=int, default=100_000, help="folders + jobs + transformations")
+    parser.add_argument('--steps', type=int, default=4, help="steps per transformation")
+    parser.add_argument('--runs', type=int, default=50_000, help="rows in R_JOB_LOG + R_TRANS_LOG")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-indexes', action='store_true', help="add the LOGDATE / REPLAYDATE indexes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = psycopg2.connect(args.dsn)
+    try:
+        counts = seed(conn, args.objects, args.steps, args.runs, args.seed, args.log_indexes)
+    finally:
+        conn.close()
+    for table, rows in counts.items():
+        print(f"{table:<20} {rows:>10,} rows")
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,27 @@ TELEGRAM_TOKEN = "8550091070:AAFPqy82XMYp5qDDuEO1yGZgqWb_1FDYjSM"
 CARTE_URL  = "http://10.7.7.230:8081/kettle"
 CARTE_AUTH = ('cluster', 'cluster') 
 
+# Shared keep-alive HTTP session: max open sockets and per-endpoint timeouts (sec)
+CARTE_MAX_CONNECTIONS = 10
+CARTE_TIMEOUTS = {'execute': 10, 'status': 5, 'process_status': 2, 'stop': 5}
+
+# /status snapshot shared by all monitor views: max age (sec), and how long it is
+# refreshed in the background after someone opened the monitor
+CARTE_STATUS_TTL = 3
+CARTE_STATUS_WATCH_SEC = 60
+
+# Execution watcher: one shared status poll for all launched runs (sec), and how many
+# ticks a run may be missing from /status before it is checked individually (after that many
+# checks without a status, e.g. Carte restarted or not answering, the run is reported as lost)
+WATCH_TICK_SEC = 3
+WATCH_LOST_TICKS = 10
+# Live progress: seconds between incremental log polls per run, log lines kept per run
+WATCH_LOG_SEC = 6
+WATCH_LOG_LINES = 30
+
+# Which dir/name encoding Carte accepted per directory (learned, survives restarts)
+CARTE_STRATEGY_FILE = os.path.join(os.path.dirname(__file__), 'carte_strategies.json')
+
 # Basic auth payload for URL generation
 REPO_CONF = {
     'rep': 'PENTAHO_REPO_BAITEREK',
@@ -31,6 +52,23 @@ DB_CONF = {
     'password': "N0CYmWFKGmSa"
 }
 
+# Connection pool shared by all repo DB queries
+DB_POOL_SIZE = 5
+DB_POOL_TIMEOUT = 10         # sec to wait for a free connection
+DB_POOL_IDLE_CHECK_SEC = 30  # ping idle connections older than this before reuse
+
+# Threads used for blocking DB / HTTP / system calls made from async handlers
+IO_WORKERS = 8
+# Telegram updates handled at the same time (a user's own updates still run in order)
+BOT_CONCURRENT_UPDATES = 16
+
+# Audit log writer: events are batched in memory and written every AUDIT_FLUSH_SEC
+# (or once AUDIT_BATCH_SIZE are queued). If the DB is down they go to a spill file.
+AUDIT_BATCH_SIZE = 50
+AUDIT_FLUSH_SEC = 5
+AUDIT_SPILL_PATH = os.path.join(os.path.dirname(__file__), 'audit_spill.jsonl')
+AUDIT_SPILL_MAX_ROWS = 50000
+
 # ==========================
 # ⚙️ APP SETTINGS
 # ==========================
@@ -42,5 +80,76 @@ LOG_LEVEL = logging.INFO
 # Modules to silence (too noisy)
 SILENCED_LOGGERS = ["httpx", "apscheduler"]
 
+# ==========================
+# ⚡ PERFORMANCE / CACHING
+# ==========================
+# How often (sec) the cached repo tree is checked against the DB for changes
+REPO_TREE_CHECK_SEC = 15
+# How often (sec) folder/job/trans names and parents are hashed to catch renames and moves
+REPO_TREE_VERIFY_SEC = 120
+
+# Rendered folder pages kept in memory (LRU, dropped whenever the tree changes)
+PAGE_CACHE_SIZE = 500
+
+# Name search: max results per query (the header shows "50+" when more names match)
+SEARCH_LIMIT = 50
+
+# "Find Table Usage" index: change check interval and forced full reload interval (sec)
+SQL_INDEX_CHECK_SEC = 60
+SQL_INDEX_FULL_REFRESH_SEC = 3600
+
+# Nightly load dashboard: how often (sec) new job/trans log rows are read into the summary
+# (each check scans R_JOB_LOG / R_TRANS_LOG unless they have the date indexes listed in README.md)
+RUN_SUMMARY_CHECK_SEC = 30
+
+# Run history: runs per page and log characters shown per run (full log on demand)
+HISTORY_PAGE_SIZE = 5
+HISTORY_LOG_PREFIX = 50
+
+# ETL log files (Peek Log): directory with <name>.log, lines shown, max bytes read from the end
+LOG_DIR = "/home/ac/etl_logs"
+LOG_TAIL_LINES = 20
+LOG_TAIL_MAX_BYTES = 256 * 1024
+
+# Log follow mode: seconds between message edits, auto-stop after, lines kept in the message
+LOG_FOLLOW_EDIT_SEC = 3
+LOG_FOLLOW_MAX_SEC = 600
+LOG_FOLLOW_LINES = 30
+
+# Server health sampler: seconds between samples and history kept for the trend view
+SYSTEM_SAMPLE_SEC = 10
+SYSTEM_HISTORY_SEC = 3600
+
+# Scheduler: scheduled fires running at once (others wait) and overlapping fires per job
+SCHED_MAX_CONCURRENT = 4
+SCHED_MAX_INSTANCES = 1
+
+# Execution queue: runs start only while Carte has fewer than QUEUE_MAX_ACTIVE active
+# processes and server CPU / RAM (%) are below the limits; others wait (manual > scheduled > bulk)
+QUEUE_MAX_ACTIVE = 8
+QUEUE_MAX_CPU = 90
+QUEUE_MAX_MEM = 90
+QUEUE_RECHECK_SEC = 3
+
+# Bulk runs (folder / all failures): runs in flight per bulk action, seconds between progress edits
+BULK_WORKERS = 4
+BULK_PROGRESS_SEC = 5
+# A bulk item whose run reports no end within this many seconds is marked lost
+BULK_RUN_TIMEOUT_SEC = 6 * 3600
+
+# User sessions (search mode, pending SQL edits, ...): idle expiry (sec) and max users kept.
+# Set SESSION_DB_PATH to keep them in SQLite (survive restarts, shared between bot processes).
+SESSION_TTL_SEC = 1800
+SESSION_MAX_ENTRIES = 1000
+SESSION_DB_PATH = None  # e.g. os.path.join(os.path.dirname(__file__), 'sessions.db')
+
+# Outgoing Telegram messages: overall messages/sec, min seconds between messages to one chat
+# (private / group), completion notices merged into one digest within OUTBOX_DIGEST_SEC
+OUTBOX_GLOBAL_PER_SEC = 25
+OUTBOX_CHAT_INTERVAL_SEC = 1.0
+OUTBOX_GROUP_INTERVAL_SEC = 3.0
+OUTBOX_DIGEST_SEC = 5
+OUTBOX_MAX_ATTEMPTS = 3
+
 # Version Control
 BOT_VERSION = "1.0.0"
@@ -3,34 +3,84 @@ from telegram.ext import ContextTypes
 from services.system import system_service
 from services.audit import audit_service
 from services.auth import auth_service
-from services.repository import repo_service
+from services.repository import repo_service, SEARCH_LIMIT
 from services.carte import carte_service
 from services.scheduler import scheduler_service
+from services.db import db_pool
+from services.executor import run_blocking
+from services.watcher import execution_watcher
+from services.log_tail import log_follower
+from services.exec_queue import execution_queue, PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from services.bulk import bulk_runner
+from services.run_summary import FAILED_STATUSES
+from services.cache import LRUCache
+from services.session import SessionStore
+from services.outbox import outbox
+from config import settings
 from ui.keyboards import Keyboards
 from ui.messages import Msg
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from telegram.error import BadRequest
 import asyncio
+import hashlib
+import secrets
 import io
 import html
+import logging
 
-USER_STATE = {}
+# Per-user conversation state (expires after SESSION_TTL_SEC idle, capped, optionally in SQLite)
+USER_STATE = SessionStore()
 BOT_FROZEN = False
 
+# Rendered folder pages: (dir, filter, page, role, frozen) -> (text, keyboard), reset on tree changes
+page_cache = LRUCache(getattr(settings, 'PAGE_CACHE_SIZE', 500))
+
+# History buttons carry a short key instead of folder + name (callback_data is max 64 bytes)
+history_refs = LRUCache(1000)
+
+
+def history_ref(dir_id, name, is_job):
+    """Short stable key for a history view's (dir_id, name, is_job), remembered in history_refs."""
+    key = hashlib.md5(f"{dir_id}|{name}|{is_job}".encode('utf-8')).hexdigest()[:10]
+    history_refs.put(key, (dir_id, name, is_job))
+    return key
+
+# Log follow buttons carry a short key instead of the process name (LOG_UNFOLLOW|<name> may not fit in 64 bytes)
+log_refs = LRUCache(1000)
+
+
+def log_ref(name):
+    """Short stable key for a process name, remembered in log_refs."""
+    key = hashlib.md5(name.encode('utf-8')).hexdigest()[:10]
+    log_refs.put(key, name)
+    return key
+
+# Bulk runs the user was asked to confirm: short key -> (title, items), run exactly as shown
+bulk_refs = LRUCache(200)
+
 # ==========================================
 # 🛠️ GLOBAL WRAPPER
 # ==========================================
-def scheduled_job_wrapper(job_name, dir_id):
-    path = repo_service.get_full_path(dir_id)
+async def scheduled_job_wrapper(job_name, dir_id):
+    # Coroutine -> APScheduler runs it on the bot loop (shared Carte session lives there)
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(carte_service.trigger_job(job_name, path))
-        loop.close()
+        path = await run_blocking(repo_service.get_full_path, dir_id)
+        await execution_queue.submit(job_name, path, True, PRIORITY_SCHEDULED)
     except Exception as e:
         print(f"Wrapper Error: {e}")
 
+def limit_matches(matches, limit=SEARCH_LIMIT):
+    """Cuts a limit+1 search result to `limit`; returns (matches, count label) -- "50+" if it was cut."""
+    if len(matches) > limit:
+        return matches[:limit], f"{limit}+"
+    return matches, str(len(matches))
+
+async def get_all_active():
+    """Running jobs + transformations from the shared (TTL-cached) Carte status snapshot."""
+    snapshot = await carte_service.get_snapshot()
+    return snapshot.active_jobs() + snapshot.active_trans()
+
 # ==========================================
 # 🛡️ UI HELPERS
 # ==========================================
@@ -68,7 +118,7 @@ async def render_admin_panel(query, user_id):
     if auth_service.get_role(user_id) != "SUPER": return
     
     # Fetch Audit Logs
-    logs = audit_service.get_recent_logs(10)
+    logs = await run_blocking(audit_service.get_recent_logs, 10)
     log_text = "\n".join([f"🔹 <b>{l['time']}</b>: {l['user']} {l['action']} <i>{l['target']}</i>" for l in logs])
     
     status_text = "❄️ <b>FROZEN</b>" if BOT_FROZEN else "🟢 <b>ACTIVE</b>"
@@ -79,6 +129,28 @@ async def render_admin_panel(query, user_id):
     kb = Keyboards.admin_menu(BOT_FROZEN)
     await safe_edit_message(query, text, kb)
 
+async def render_metrics(query, user_id):
+    if auth_service.get_role(user_id) != "SUPER": return
+
+    sections = [
+        ("🗄️ Repo DB Pool", db_pool.metrics()),
+        ("👀 Execution Watcher", execution_watcher.metrics()),
+        ("📝 Audit Writer", audit_service.metrics()),
+        ("🎯 Carte Trigger Strategies", carte_service.strategies.metrics()),
+        ("📜 Log Follow", log_follower.metrics()),
+        ("🖥️ System Sampler", system_service.metrics()),
+        ("🌙 Nightly Load Summary", repo_service.runs.metrics()),
+        ("📅 Scheduler", scheduler_service.metrics()),
+        ("🚦 Execution Queue", execution_queue.metrics()),
+        ("⚡ Bulk Runs", bulk_runner.metrics()),
+        ("🗂️ Page Cache", page_cache.metrics()),
+        ("💬 User Sessions", await run_blocking(USER_STATE.metrics)),
+        ("📮 Outbox", outbox.metrics()),
+    ]
+    kb = [[InlineKeyboardButton("🔄 Refresh", callback_data="ADMIN_METRICS")],
+          [InlineKeyboardButton("🔙 Back", callback_data="ADMIN_MENU")]]
+    await safe_edit_message(query, Msg.service_metrics(sections), InlineKeyboardMarkup(kb))
+
 async def render_prep_screen(query, dir_id, name, user_id, is_job=True):
     role = auth_service.get_role(user_id)
     perms = auth_service.roles.get(role, [])
@@ -94,7 +166,7 @@ async def render_prep_screen(query, dir_id, name, user_id, is_job=True):
                 'paused': job_schedule.next_run_time is None,
                 'next_run': job_schedule.next_run_time.strftime('%H:%M') if job_schedule.next_run_time else "PAUSED"
             }
-        default_cfg = repo_service.get_job_schedule_config(name)
+        default_cfg = await run_blocking(repo_service.get_job_schedule_config, name)
     
     # Build Text & Keyboard
     type_label = "JOB" if is_job else "TRANS"
@@ -146,7 +218,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    state = USER_STATE.get(user_id)
+    state = await USER_STATE.aget(user_id)
     if not state or state.get('mode') != 'AWAITING_NEW_SQL':
         return
 
@@ -181,45 +253,62 @@ async def process_sql_update(update, context, text, state, user_id):
         return
 
     # 2. Update Repo
-    success, db_msg = repo_service.backup_and_update_sql(trans, step, text, user_id)
+    success, db_msg = await run_blocking(repo_service.backup_and_update_sql, trans, step, text, user_id)
     
     if success:
         await update.message.reply_text(f"✅ <b>Success!</b>\nRepo updated for <code>{step}</code>.")
         audit_service.log(user_id, "CODE_UPDATE", state['step'], f"Trans: {state['trans']}")
         kb = [[InlineKeyboardButton("🔙 View New SQL", callback_data=f"SHOW_SQL|{dir_id}|{trans}|{step}")]]
         await update.message.reply_text("Click below to verify:", reply_markup=InlineKeyboardMarkup(kb))
-        USER_STATE[user_id] = None
+        await USER_STATE.aset(user_id, None)
     else:
         await update.message.reply_text(f"❌ <b>DB Error:</b> {db_msg}")    
 
 async def show_directory(update, context, dir_id, page=0, filter_mode='ALL'):
     user_id = update.effective_user.id
     dir_id = int(dir_id)
+    role = auth_service.get_role(user_id)
+
+    # Rendered pages are cached until the tree changes (a page built while it changed is not kept)
+    version = repo_service.tree_version()
+    node = await run_blocking(repo_service.get_listing, dir_id)
+    page_cache.validate(repo_service.tree_version())
+    cache_key = (dir_id, filter_mode, page, role, BOT_FROZEN)
+    rendered = page_cache.get(cache_key)
+
+    if rendered is None:
+        if not node:
+            try: await update.callback_query.message.reply_text("⚠️ Repo Changed.")
+            except: pass
+            return
+        rendered = await render_directory_page(node, dir_id, page, filter_mode, role)
+        page_cache.put(cache_key, rendered, version)
+    text, kb = rendered
     
-    tree = repo_service.fetch_structure()
-    node = tree.get(dir_id)
-    if not node:
-        try: await update.callback_query.message.reply_text("⚠️ Repo Changed.")
-        except: pass
-        return
+    if update.callback_query:
+        await safe_edit_message(update.callback_query, text, kb)
+    else:
+        await update.message.reply_text(text, reply_markup=kb, parse_mode='HTML')
 
+async def render_directory_page(node, dir_id, page, filter_mode, role):
+    """Text + keyboard of one folder page (listings come pre-sorted from the tree)."""
     items = []
     
     # 1. Always show subfolders (unless you want to hide them in JOB/TRANS mode, but usually folders are Nav)
     # Let's keep folders visible in ALL mode, but maybe hide them in strict 'JOB'/'TRANS' modes to focus?
     # For now, let's keep folders in ALL and specific modes so you can navigate deeper.
-    for sub in sorted(node['subfolders'], key=lambda x: x['name']):
-        items.append({"name": f"📁 {sub['name']}", "data": f"OPEN|{sub['id']}|0|ALL"})
+    for sub_id, sub_name in node.subfolders:
+        items.append({"name": f"📁 {sub_name}", "data": f"OPEN|{sub_id}|0|ALL"})
 
     # 2. Filter Jobs
     if filter_mode in ['ALL', 'JOB']:
-        for job in sorted(node['jobs'], key=lambda x: x['name']):
-            items.append({"name": f"✴️ {job['name']}", "data": f"PREP|{dir_id}|{job['name']}|JOB"})
+        for job in node.jobs:
+            items.append({"name": f"✴️ {job}", "data": f"PREP|{dir_id}|{job}|JOB"})
 
     # 3. Filter Transformations
     if filter_mode in ['ALL', 'TRANS']:
-        for trans in sorted(node['trans'], key=lambda x: x['name']):
-            items.append({"name": f"⚙️ {trans['name']}", "data": f"PREP|{dir_id}|{trans['name']}|TRANS"})
+        for trans in node.trans:
+            items.append({"name": f"⚙️ {trans}", "data": f"PREP|{dir_id}|{trans}|TRANS"})
     
     # Pagination Logic
     PER_PAGE = 10
@@ -229,18 +318,47 @@ async def show_directory(update, context, dir_id, page=0, filter_mode='ALL'):
     
     page_items = items[page * PER_PAGE : (page + 1) * PER_PAGE]
 
-    role = auth_service.get_role(user_id)
     perms = auth_service.roles.get(role, [])
-    path = repo_service.get_full_path(dir_id)
+    path = await run_blocking(repo_service.get_full_path, dir_id)
     
     # Pass filter_mode to UI
     text = Msg.browser_status(path, role, BOT_FROZEN, page, total_pages)
-    kb = Keyboards.main_menu(page_items, page, total_pages, dir_id, role, perms, node['parent'], filter_mode)
-    
-    if update.callback_query:
-        await safe_edit_message(update.callback_query, text, kb)
-    else:
-        await update.message.reply_text(text, reply_markup=kb, parse_mode='HTML')
+    kb = Keyboards.main_menu(page_items, page, total_pages, dir_id, role, perms, node.parent, filter_mode)
+    return text, kb
+
+async def collect_bulk_items(kind, arg, filter_mode='ALL'):
+    """
+    Targets of a bulk run -> (title, [(name, path, is_job)], skipped, running).
+    DIR: the jobs/trans directly in folder `arg`; FAIL: every process whose latest run ended
+    with an error/stop status, except those active on Carte right now (`running` counts them).
+    """
+    items, skipped, running = [], 0, 0
+    if kind == 'DIR':
+        dir_id = int(arg)
+        node = await run_blocking(repo_service.get_listing, dir_id)
+        path = await run_blocking(repo_service.get_full_path, dir_id)
+        if node:
+            if filter_mode in ['ALL', 'JOB']:
+                items += [(j, path, True) for j in node.jobs]
+            if filter_mode in ['ALL', 'TRANS']:
+                items += [(t, path, False) for t in node.trans]
+        return path, items, skipped, running
+
+    report = await run_blocking(repo_service.get_broken_processes) or {'failures': []}
+    snapshot = await carte_service.get_snapshot()
+    active = {(True, p['name']) for p in snapshot.active_jobs()} | {(False, p['name']) for p in snapshot.active_trans()}
+    for f in report['failures']:
+        is_job = f['type'] == 'Job'
+        if f['status'] not in FAILED_STATUSES: continue
+        if (is_job, f['name']) in active:
+            running += 1
+            continue
+        dir_id = await run_blocking(repo_service.locate, f['name'], is_job)
+        if dir_id is None:
+            skipped += 1
+            continue
+        items.append((f['name'], await run_blocking(repo_service.get_full_path, dir_id), is_job))
+    return "Failed Processes", items, skipped, running
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global BOT_FROZEN
@@ -274,30 +392,58 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif action == "RUN":
         dir_id, name = int(data[1]), data[2]
         is_job = (len(data) < 4) or (data[3] == 'JOB')
-        path = repo_service.get_full_path(dir_id)
+        path = await run_blocking(repo_service.get_full_path, dir_id)
         await execute_process(update, context, name, path, dir_id, is_job)
 
-    elif action == "HISTORY":
-        dir_id, name = int(data[1]), data[2]
-        is_job = (len(data) < 4) or (data[3] == 'JOB')
-        
-        # Fetch DB History
-        history = repo_service.get_history(name, is_job)
-        text = Msg.history_view(name, history)
+    elif action in ("HISTORY", "HIST_PAGE"):
+        # Data: HISTORY | DirID | Name | Type   (from the process screen)
+        #       HIST_PAGE | Key | [Cursor = batch id of the last run shown]   (key -> history_refs)
+        if action == "HISTORY":
+            dir_id, name = int(data[1]), data[2]
+            is_job = (len(data) < 4) or (data[3] == 'JOB')
+            cursor = None
+        else:
+            ref = history_refs.get(data[1])
+            if ref is None:
+                await query.answer("⚠️ This history view expired, please open it again.", show_alert=True)
+                return
+            dir_id, name, is_job = ref
+            cursor = int(data[2]) if len(data) > 2 else None
         
-        # Back button returns to Prep screen
-        kb = [[InlineKeyboardButton("🔙 Back", callback_data=f"PREP|{dir_id}|{name}|{'JOB' if is_job else 'TRANS'}"),
-               InlineKeyboardButton("🔄 Refresh", callback_data=f"HISTORY|{dir_id}|{name}|{'JOB' if is_job else 'TRANS'}")]]
+        # Fetch one page of DB History
+        (history, next_cursor), owner = await asyncio.gather(
+            run_blocking(repo_service.get_history, name, is_job, cursor),
+            run_blocking(repo_service.get_run_owner, name, is_job))
+        text = Msg.history_view(name, history, owner, older=cursor is not None)
+        kb = Keyboards.history_nav(history_ref(dir_id, name, is_job), history, next_cursor, cursor)
         
-        await safe_edit_message(query, text, InlineKeyboardMarkup(kb))
+        await safe_edit_message(query, text, kb)
+
+    elif action in ("HIST_LOG", "HIST_BACK"):
+        # Data: HIST_LOG | Key | RunID,  HIST_BACK | Key
+        ref = history_refs.get(data[1])
+        if ref is None:
+            await query.answer("⚠️ This history view expired, please open it again.", show_alert=True)
+            return
+        dir_id, name, is_job = ref
+        if action == "HIST_BACK":
+            await render_prep_screen(query, dir_id, name, user_id, is_job)
+            return
+        run_id = int(data[2])
+        full_log = await run_blocking(repo_service.get_run_log, name, run_id, is_job)
+        if not full_log:
+            await query.answer("No log stored for this run.", show_alert=True)
+            return
+        await send_smart_content(context, query.message.chat_id, f"📄 <b>Log: {name}</b> #{run_id}", full_log,
+                                 filename=f"{name}_{run_id}.log", caption="📄 Full Run Log")
 
     # --- MONITOR DASHBOARD ---
     elif action == "MONITOR":
-        active_jobs = carte_service.get_active_jobs()
-        active_trans = carte_service.get_active_trans()
-        all_active = active_jobs + active_trans
+        carte_service.watch()
+        all_active = await get_all_active()
+        queued = execution_queue.snapshot()
         
-        if not all_active:
+        if not all_active and not queued:
             text = "🖥️ <b>Monitor</b>\n\n✅ <i>No active processes running.</i>"
             kb = [[InlineKeyboardButton("🔄 Refresh", callback_data="MONITOR")],
                   [InlineKeyboardButton("🔙 Main Menu", callback_data="OPEN|-1|0")]]
@@ -309,6 +455,9 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # Show only first 8 chars of ID in text
                 short_id = p.get('id', '')[:8]
                 text += f"{icon} <b>{p_name}</b>\n   └ 🆔 <code>{short_id}...</code>\n"
+            if queued:
+                text += f"\n⏳ <b>Queued ({len(queued)})</b>\n"
+                text += "".join(f"{pos}. {q_name} <i>({label})</i>\n" for pos, q_name, label in queued[:10])
             
             kb = [[InlineKeyboardButton("🛑 Stop a Process...", callback_data="STOP_MENU")], 
                   [InlineKeyboardButton("🔄 Refresh", callback_data="MONITOR")],
@@ -318,9 +467,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- STOP MENU (Generates Buttons with Short IDs) ---
     elif action == "STOP_MENU":
-        active_jobs = carte_service.get_active_jobs()
-        active_trans = carte_service.get_active_trans()
-        all_active = active_jobs + active_trans
+        all_active = await get_all_active()
         
         if not all_active:
             await query.answer("Nothing is running anymore!", show_alert=True)
@@ -348,7 +495,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
    # ... inside handlers/core.py ...
     elif action == "SYS_HEALTH":
         # 1. Fetch Data
-        stats = system_service.get_health_report()
+        stats = await run_blocking(system_service.get_health_report)
         
         # 2. Determine Icons based on thresholds
         cpu_icon = "🟢" if stats['cpu'] < 70 else ("🟡" if stats['cpu'] < 90 else "🔴")
@@ -365,35 +512,75 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
         if stats['heavy_processes']:
-            text += "<b>⚠️ Heavy Processes:</b>\n" + "\n".join(stats['heavy_processes'])
+            text += "<b>☕ PDI / Java Processes:</b>\n" + "\n".join(stats['heavy_processes'][:10])
         else:
-            text += "✅ No memory hogs detected."
-
-        # 4. Add 'Back' button to return to Monitor
+            text += "✅ No Java processes running."
+
+        # 4. Trend over the last hour (from the background sampler)
+        history = await run_blocking(system_service.get_history)
+        if history:
+            text += "\n\n<b>📈 Last Hour</b> <i>(min / avg / max)</i>\n"
+            for key, label, unit in (('cpu', 'CPU', '%'), ('mem_percent', 'RAM', '%'), ('java_rss', 'Java', 'GB')):
+                h = history.get(key)
+                if not h: continue
+                text += f"<b>{label}:</b> {h['min']} / {h['avg']} / {h['max']}{unit}\n<code>{h['spark']}</code>\n"
+
+        # 5. Add 'Back' button to return to Monitor
         kb = [[InlineKeyboardButton("🔙 Back to Monitor", callback_data="MONITOR")]]
         
         await safe_edit_message(query, text, InlineKeyboardMarkup(kb))
 
     elif action == "PEEK_LOG":
         name = data[1]
-        # Fetch the tail
-        log_content = repo_service.get_log_tail(name)
+        # Fetch the tail (seeks from the end of the file)
+        log_content = await run_blocking(repo_service.get_log_tail, name)
         
         # Send as a fresh message (so it doesn't clutter the menu)
-        # Using <pre> tag for code formatting
-        msg = f"📜 <b>Log Tail: {name}</b>\n<pre>{html.escape(log_content)}</pre>"
-        
-        # Delete the menu to "clean up" or just send a new message
-        await query.message.reply_text(msg, parse_mode='HTML')
+        await query.message.reply_text(Msg.log_tail(name, log_content), parse_mode='HTML',
+                                       reply_markup=Keyboards.log_follow(log_ref(name)))
         await query.answer()
 
+    elif action == "LOG_FOLLOW":
+        # Data: LOG_FOLLOW | Key  (key -> log_refs)
+        ref = data[1]
+        name = log_refs.get(ref)
+        if name is None:
+            await query.answer("⚠️ This log view expired, please open it again.", show_alert=True)
+            return
+        log_content, offset = await run_blocking(repo_service.get_log_tail, name, None, True)
+        if offset is None:
+            await query.answer(log_content, show_alert=True)
+            return
+
+        chat_id, message_id = query.message.chat_id, query.message.message_id
+        await safe_edit_message(query, Msg.log_tail(name, log_content, following=True), Keyboards.log_follow(ref, True))
+
+        def on_edit_error(e):
+            # Message deleted / not editable anymore -> stop following
+            log_follower.stop((chat_id, message_id))
+
+        async def on_update(text):
+            outbox.edit(context.bot, chat_id, message_id, Msg.log_tail(name, text, following=True),
+                        on_error=on_edit_error, parse_mode='HTML', reply_markup=Keyboards.log_follow(ref, True))
+
+        async def on_end(text):
+            outbox.edit(context.bot, chat_id, message_id, Msg.log_tail(name, text),
+                        parse_mode='HTML', reply_markup=Keyboards.log_follow(ref))
+
+        log_follower.follow((chat_id, message_id), repo_service.get_log_path(name), offset, log_content,
+                            on_update, on_end)
+
+    elif action == "LOG_UNFOLLOW":
+        key = (query.message.chat_id, query.message.message_id)
+        if not log_follower.stop(key):
+            # Already stopped (timeout / restart) -> just restore the button
+            await safe_edit_message(query, query.message.text_html, Keyboards.log_follow(data[1]))
+
     elif action == "STOP_EXEC":
         short_id_target = data[1]
         
         # 1. Fetch live list to find the FULL ID
-        active_jobs = carte_service.get_active_jobs()
-        active_trans = carte_service.get_active_trans()
-        all_active = active_jobs + active_trans
+        all_active = await get_all_active()
         
         target = next((p for p in all_active if p['id'].startswith(short_id_target)), None)
         
@@ -411,7 +598,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # ✅ FIX 2: Pass 'is_job' to the service
         # This matches the new signature: stop_process(name, id, is_job)
-        success, msg = carte_service.stop_process(name, full_id, is_job)
+        success, msg = await carte_service.stop_process(name, full_id, is_job)
         
         if success:
             audit_service.log(user_id, "STOP", name, f"ID: {full_id} ({target['type']})")
@@ -428,7 +615,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         dir_id, trans_name = int(data[1]), data[2]
         chat_id = update.effective_chat.id
         
-        sources = repo_service.get_trans_sql(trans_name)
+        sources = await run_blocking(repo_service.get_trans_sql, trans_name)
         
         if not sources:
             await query.answer("⚠️ No Table Inputs found.", show_alert=True)
@@ -467,7 +654,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         dir_id, trans_name, step_name = int(data[1]), data[2], data[3]
         chat_id = update.effective_chat.id
         
-        sources = repo_service.get_trans_sql(trans_name)
+        sources = await run_blocking(repo_service.get_trans_sql, trans_name)
         target = next((s for s in sources if s['step'] == step_name), None)
         
         if target:
@@ -493,7 +680,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         dir_id, trans_name, step_name = int(data[1]), data[2], data[3]
         
         # NOTE: You must implement get_sql_history_list in repo_service!
-        history = repo_service.get_sql_history_list(trans_name, step_name)
+        history = await run_blocking(repo_service.get_sql_history_list, trans_name, step_name)
         
         if not history:
             await query.answer("⚠️ No history versions found.", show_alert=True)
@@ -514,7 +701,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat_id = update.effective_chat.id
         
         # NOTE: You must implement get_archived_sql in repo_service!
-        old_sql = repo_service.get_archived_sql(hist_id)
+        old_sql = await run_blocking(repo_service.get_archived_sql, hist_id)
         
         if old_sql:
             kb = [[InlineKeyboardButton("🗑️ Close View", callback_data=f"OPEN|{dir_id}|0")]]
@@ -532,12 +719,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         dir_id, trans_name, step_name = int(data[1]), data[2], data[3]
         
         # Set User State to Capture Text Input
-        USER_STATE[user_id] = {
+        await USER_STATE.aset(user_id, {
             'mode': 'AWAITING_NEW_SQL',
             'dir_id': dir_id,
             'trans': trans_name,
             'step': step_name
-        }
+        })
         
         kb = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"SHOW_SQL|{dir_id}|{trans_name}|{step_name}")]]
         await safe_edit_message(query, f"✍️ <b>Proposing change for:</b> <code>{step_name}</code>\n\n⬇️ <b>Paste the new SQL query below:</b>", InlineKeyboardMarkup(kb))
@@ -547,10 +734,10 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif action == "SEARCH_INIT":
         # 1. Set Default State: Name Search
         # This allows the user to just start typing immediately if they want.
-        USER_STATE[user_id] = {'mode': 'SEARCH', 'type': 'NAME'}
+        await USER_STATE.aset(user_id, {'mode': 'SEARCH', 'type': 'NAME'})
         
         # 2. Fetch History
-        recent_searches = audit_service.get_user_search_history(user_id)
+        recent_searches = await run_blocking(audit_service.get_user_search_history, user_id)
         
         kb = []
         # --- Mode Selectors ---
@@ -577,9 +764,12 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         audit_service.log(user_id, "SEARCH", "REPO", term)
         
         # 2. Execute Name Search (History items default to Name search)
-        matches = repo_service.search_repo(term)
+        matches, count = limit_matches(await run_blocking(repo_service.search_repo, term, SEARCH_LIMIT + 1))
         
-        header = f"🔍 <b>Found {len(matches)} matches for '{term}':</b>"
+        if matches and matches[0].get('suggestion'):
+            header = f"🤔 <b>No matches for '{term}'. Did you mean:</b>"
+        else:
+            header = f"🔍 <b>Found {count} matches for '{term}':</b>"
         if len(matches) > 15: header += "\n<i>(Showing top 15)</i>"
         
         kb = Keyboards.search_results(matches)
@@ -588,17 +778,17 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await safe_edit_message(query, header, kb)
         
         # Clear state so they don't accidentally search again by typing
-        USER_STATE[user_id] = None
+        await USER_STATE.aset(user_id, None)
 
     elif action == "SEARCH_MODE":
         # Data format: SEARCH_MODE | NAME  or  SEARCH_MODE | USAGE
         mode = data[1]
         
         # 1. Update State so handle_text knows what logic to use
-        USER_STATE[user_id] = {
+        await USER_STATE.aset(user_id, {
             'mode': 'SEARCH', 
             'type': mode  # 'NAME' or 'USAGE'
-        }
+        })
         
         # 2. Update UI to guide the user
         if mode == 'NAME':
@@ -611,7 +801,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif action == "MY_ACTIVITY":
         # 1. Fetch Personal Logs
-        logs = audit_service.get_user_logs(user_id)
+        logs = await run_blocking(audit_service.get_user_logs, user_id)
         
         if not logs:
             text = "📜 <b>My Activity</b>\n\nYou haven't done anything yet!"
@@ -634,13 +824,14 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # --- ADMIN / SCHEDULER (Existing logic) ---
     elif action == "ADMIN_MENU": await render_admin_panel(query, user_id)
+    elif action == "ADMIN_METRICS": await render_metrics(query, user_id)
     elif action == "TOGGLE_FREEZE":
         if auth_service.get_role(user_id) == "SUPER":
             BOT_FROZEN = not BOT_FROZEN
             await render_admin_panel(query, user_id)
     elif action == "ADMIN_ADD_USER":
         if auth_service.get_role(user_id) == "SUPER":
-            USER_STATE[user_id] = {'mode': 'ADD_USER_ID'}
+            await USER_STATE.aset(user_id, {'mode': 'ADD_USER_ID'})
             kb = [[InlineKeyboardButton("🔙 Cancel", callback_data="ADMIN_MENU")]]
             await safe_edit_message(query, "✍️ Enter Telegram ID:", InlineKeyboardMarkup(kb))
     elif action == "SAVE_USER":
@@ -659,7 +850,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif action == "SCHED_MENU":
         dir_id, name = int(data[1]), data[2]
-        USER_STATE[user_id] = {'job': name, 'dir_id': dir_id} 
+        await USER_STATE.aset(user_id, {'job': name, 'dir_id': dir_id})
         kb = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"PREP|{dir_id}|{name}|JOB")]]
         await safe_edit_message(query, f"✍️ <b>Time for {name}</b> (HH:MM):", InlineKeyboardMarkup(kb))
 
@@ -668,7 +859,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             dir_id, name = int(data[1]), data[2]
             
             # This is likely where it crashes (DB Error)
-            cfg = repo_service.get_job_schedule_config(name)
+            cfg = await run_blocking(repo_service.get_job_schedule_config, name)
             
             if not cfg or cfg.get('type') == 'NONE':
                 await query.answer("⚠️ No default schedule found in DB.", show_alert=True)
@@ -698,25 +889,72 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif action == "DASHBOARD":
         # 1. Fetch Stats (Renamed method)
-        failures = repo_service.get_broken_processes()
+        failures = await run_blocking(repo_service.get_broken_processes)
         
         # 2. Render Text
         text = Msg.manager_report(failures)
         
-        # 3. Back Button
-        kb = [[InlineKeyboardButton("🔙 Main Menu", callback_data="OPEN|-1|0")]]
+        # 3. Re-run failures + Back Button
+        kb = []
+        perms = auth_service.roles.get(auth_service.get_role(user_id), [])
+        rerun = [f for f in (failures or {}).get('failures', []) if f['status'] in FAILED_STATUSES]
+        if rerun and 'RUN' in perms:
+            kb.append([InlineKeyboardButton(f"🔁 Re-run Failures ({len(rerun)})",
+                                            callback_data="BULK_ASK|FAIL|0|ALL")])
+        kb.append([InlineKeyboardButton("🔙 Main Menu", callback_data="OPEN|-1|0")])
         await safe_edit_message(query, text, InlineKeyboardMarkup(kb))    
 
+    elif action == "BULK_ASK":
+        # Data: BULK_ASK | DIR/FAIL | DirID | FilterMode
+        kind, arg, f_mode = data[1], data[2], data[3]
+        title, items, skipped, running = await collect_bulk_items(kind, arg, f_mode)
+        back = f"OPEN|{arg}|0|{f_mode}" if kind == 'DIR' else "DASHBOARD"
+        if not items:
+            await query.answer("Nothing to run here.", show_alert=True)
+            return
+        # The confirmed list itself is run (not re-collected), under a short key
+        ref = secrets.token_hex(5)
+        bulk_refs.put(ref, (title, items))
+        await safe_edit_message(query, Msg.bulk_confirm(title, items, skipped, running),
+                                Keyboards.bulk_confirm(ref, back))
+
+    elif action == "BULK_RUN":
+        # Data: BULK_RUN | Key (-> bulk_refs)
+        if 'RUN' not in auth_service.roles.get(auth_service.get_role(user_id), []):
+            await query.answer("⛔ No permission to run.", show_alert=True)
+            return
+        # Popped: a second click on the same confirmation doesn't start it twice
+        confirmed = bulk_refs.pop(data[1])
+        if confirmed is None:
+            await query.answer("⚠️ This confirmation expired, please open it again.", show_alert=True)
+            return
+        title, items = confirmed
+
+        audit_service.log(user_id, "BULK_EXECUTE", title, f"{len(items)} items")
+        chat_id, message_id = query.message.chat_id, query.message.message_id
+        kb = InlineKeyboardMarkup([[InlineKeyboardButton("🖥️ Monitor", callback_data="MONITOR")]])
+
+        async def on_progress(bulk):
+            outbox.edit(context.bot, chat_id, message_id, Msg.bulk_progress(bulk), on_error=lambda e: None,
+                        parse_mode='HTML', reply_markup=kb)
+
+        async def on_done(bulk):
+            await on_progress(bulk)
+            outbox.post(context.bot, chat_id, Msg.bulk_summary(bulk), parse_mode='HTML')
+
+        bulk = bulk_runner.start(title, items, on_progress, on_done)
+        await safe_edit_message(query, Msg.bulk_progress(bulk), kb)
+
     elif action == "GOTO_PAGE_INIT":
         # Data: GOTO_PAGE_INIT | DirID | FilterMode
         dir_id = int(data[1])
         filter_mode = data[2] if len(data) > 2 else 'ALL'
         
-        USER_STATE[user_id] = {
+        await USER_STATE.aset(user_id, {
             'mode': 'AWAITING_PAGE_NUM',
             'dir_id': dir_id,
             'filter': filter_mode
-        }
+        })
         
         kb = [[InlineKeyboardButton("🔙 Cancel", callback_data=f"OPEN|{dir_id}|0|{filter_mode}")]]
         await safe_edit_message(query, "🔢 <b>Jump to Page</b>\n\nEnter the page number:", InlineKeyboardMarkup(kb))        
@@ -761,41 +999,66 @@ async def execute_process(update, context, name, path, dir_id, is_job):
     msg_func = update.callback_query.edit_message_text if update.callback_query else update.message.reply_text
     
     kb = [[InlineKeyboardButton("🔙 Main Menu", callback_data="OPEN|-1|0")]]
-    await msg_func(Msg.execution_start(name), parse_mode='HTML', reply_markup=InlineKeyboardMarkup(kb))
+    start_msg = await msg_func(Msg.execution_start(name), parse_mode='HTML', reply_markup=InlineKeyboardMarkup(kb))
     
-    if is_job:
-        success, res = await carte_service.trigger_job(name, path)
-    else:
-        success, res = await carte_service.trigger_trans(name, path)
+    async def on_wait(position, reason):
+        # Waiting for Carte/server capacity -> show the queue position in the same message
+        outbox.edit(context.bot, chat_id, start_msg.message_id, Msg.execution_queued(name, position, reason),
+                    on_error=lambda e: None, parse_mode='HTML', reply_markup=InlineKeyboardMarkup(kb))
 
-    # --- NEW: AUDIT LOG ---
-    if success:
-        user_id = update.effective_user.id
-        audit_service.log(user_id, "EXECUTE", name, f"Carte ID: {res}")
-    
-    if success:
-        kb = Keyboards.execution_controls(dir_id, name)
-        await context.bot.send_message(chat_id, Msg.execution_success(name, res), parse_mode='HTML', reply_markup=kb)
-        asyncio.create_task(monitor_loop(context, chat_id, name, res, dir_id, is_job))
-    else:
-        kb = Keyboards.execution_controls(dir_id, name, is_failure=True)
-        await context.bot.send_message(chat_id, Msg.execution_failure(name, res), parse_mode='HTML', reply_markup=kb)
-
-async def monitor_loop(context, chat_id, name, job_id, dir_id, is_job):
-    while True:
-        await asyncio.sleep(3)
-        status, root = carte_service.get_status(name, job_id, is_job)
-        if status == "Finished":
-            await context.bot.send_message(chat_id, f"🎉 {name} Completed!")
-            break
-        elif status in ["Stopped", "Failed", "Finished (with errors)"]:
+    # The run may wait in the queue for a long time (nightly window): finish in the background so
+    # this user's next clicks are handled meanwhile
+    user_id = update.effective_user.id
+    context.application.create_task(
+        finish_execution(context, chat_id, user_id, name, path, dir_id, is_job, on_wait),
+        name=f"execute:{name}")
+
+async def finish_execution(context, chat_id, user_id, name, path, dir_id, is_job, on_wait):
+    """Waits for the queued trigger and reports its result (runs as a background task)."""
+    try:
+        success, res = await execution_queue.submit(name, path, is_job, PRIORITY_MANUAL, on_wait)
+
+        # --- NEW: AUDIT LOG ---
+        if success:
+            audit_service.log(user_id, "EXECUTE", name, f"Carte ID: {res}")
+
+        if success:
+            kb = Keyboards.execution_controls(dir_id, name)
+            msg = await outbox.send(context.bot, chat_id, Msg.execution_success(name, res), parse_mode='HTML', reply_markup=kb)
+            tracked = execution_watcher.track(res, name, is_job, make_run_notifier(context, chat_id, dir_id),
+                                              make_run_progress(context, chat_id, msg.message_id, kb))
+            if not tracked:
+                outbox.post(context.bot, chat_id, f"ℹ️ Carte did not return a run id for {name}; check the Monitor for its result.")
+        else:
             kb = Keyboards.execution_controls(dir_id, name, is_failure=True)
-            log = root.find('logging_string').text or "No Log"
-            safe_log = html.escape(str(log)[:3000]) 
-            await context.bot.send_message(chat_id, f"⚠️ {name} Failed!\n<pre>{safe_log}</pre>", parse_mode='HTML', reply_markup=kb)
-            break
+            await outbox.send(context.bot, chat_id, Msg.execution_failure(name, res), parse_mode='HTML', reply_markup=kb)
+    except Exception as e:
+        logging.error(f"Execute Error ({name}): {e}")
 
-async def send_smart_content(context, chat_id, text_header, long_content, filename="query.sql", reply_markup=None):
+def make_run_notifier(context, chat_id, dir_id):
+    """Callback for the execution watcher: tells the chat how the run ended (queued, never blocks the watcher)."""
+    async def notify(run, success, log):
+        if success:
+            # Bursts of completions (nightly window) are merged into one digest message
+            outbox.notice(context.bot, chat_id, f"🎉 {run.name} Completed!")
+        else:
+            kb = Keyboards.execution_controls(dir_id, run.name, is_failure=True)
+            safe_log = html.escape(str(log or "No Log")[-3000:])
+            outbox.post(context.bot, chat_id, f"⚠️ {run.name} Failed!\n<pre>{safe_log}</pre>", parse_mode='HTML', reply_markup=kb)
+    return notify
+
+def make_run_progress(context, chat_id, message_id, reply_markup):
+    """Callback for the execution watcher: edits the 'Started' message with the newest log lines."""
+    async def progress(run):
+        def on_error(e):
+            # Message gone -> no one is watching anymore
+            run.on_progress = None
+        outbox.edit(context.bot, chat_id, message_id, Msg.execution_progress(run.name, run.carte_id, run.status, run.log_text()),
+                    on_error=on_error, parse_mode='HTML', reply_markup=reply_markup)
+    return progress
+
+async def send_smart_content(context, chat_id, text_header, long_content, filename="query.sql", reply_markup=None,
+                             caption="📄 Full SQL Query"):
     """
     Intelligently sends content.
     - If < 3000 chars: Sends as message text.
@@ -804,16 +1067,16 @@ async def send_smart_content(context, chat_id, text_header, long_content, filena
     if len(long_content) < 3000:
         # Strategy A: Send as Text
         full_text = f"{text_header}\n\n<pre>{html.escape(long_content)}</pre>"
-        await context.bot.send_message(chat_id, full_text, parse_mode='HTML', reply_markup=reply_markup)
+        await outbox.send(context.bot, chat_id, full_text, parse_mode='HTML', reply_markup=reply_markup)
     else:
         # Strategy B: Send as File
         file_obj = io.BytesIO(long_content.encode('utf-8'))
         file_obj.name = filename
         
         # Send header first
-        await context.bot.send_message(chat_id, f"{text_header}\n\n(📁 Content too long for chat, sent as file below)", parse_mode='HTML')
+        await outbox.send(context.bot, chat_id, f"{text_header}\n\n(📁 Content too long for chat, sent as file below)", parse_mode='HTML')
         # Send file with buttons attached
-        await context.bot.send_document(chat_id, document=file_obj, caption="📄 Full SQL Query", reply_markup=reply_markup)            
+        await outbox.send_document(context.bot, chat_id, file_obj, caption=caption, reply_markup=reply_markup)            
 
 # Text Handler remains largely same, just standard boilerplate...
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -825,12 +1088,12 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # --- NEW: SUPER HOME BUTTON HANDLER ---
     if text == "🏠 Main Menu":
         # Reset state just in case they were doing something else
-        USER_STATE[user_id] = None 
+        await USER_STATE.aset(user_id, None)
         # Show Root Directory
         await show_directory(update, context, -1, 0)
         return
 
-    state = USER_STATE.get(user_id)
+    state = await USER_STATE.aget(user_id)
     if not state: return
 
     # --- NEW: KILL COMMAND HANDLER ---
@@ -845,9 +1108,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # We need the Name for the Carte API, but we only have ID.
             # We must fetch the name first by checking active list.
-            active_jobs = carte_service.get_active_jobs()
-            active_trans = carte_service.get_active_trans()
-            all_active = active_jobs + active_trans
+            all_active = await get_all_active()
             
             target_name = None
             for p in all_active:
@@ -860,7 +1121,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
 
             # Execute Stop
-            success = carte_service.stop_process(target_name, c_id, is_job)
+            success, _ = await carte_service.stop_process(target_name, c_id, is_job)
             
             if success:
                 audit_service.log(user_id, "STOP_CMD", target_name, f"ID: {c_id}")
@@ -886,7 +1147,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_page_index = max(0, page_num - 1)
         
         await show_directory(update, context, dir_id, target_page_index, f_mode)
-        USER_STATE[user_id] = None
+        await USER_STATE.aset(user_id, None)
         return
 
     if state.get('mode') == 'AWAITING_NEW_SQL':
@@ -930,10 +1191,14 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         audit_service.log(user_id, "SEARCH", "REPO", text)
 
         if search_type == 'NAME':
-            matches = repo_service.search_repo(text)
+            matches, count = limit_matches(await run_blocking(repo_service.search_repo, text, SEARCH_LIMIT + 1))
+        else:
+            matches = await run_blocking(repo_service.find_sql_usage, text)
+            count = str(len(matches))
+
+        if search_type == 'NAME':
             header = f"🔍 <b>Name Matches for '{text}':</b>"
         else:
-            matches = repo_service.find_sql_usage(text)
             header = f"🕵️ <b>Table Usage: '{text}':</b>\n<i>(Found in these Transformations)</i>"
 
         if not matches:
@@ -941,9 +1206,14 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
             
         kb = Keyboards.search_results(matches)
-        await update.message.reply_text(f"{header}\nFound {len(matches)} results:", reply_markup=kb, parse_mode='HTML')
+        if matches[0].get('suggestion'):
+            # Nothing contains the term -> fuzzy suggestions, not counted as results
+            await update.message.reply_text(f"❌ No matches found for '{text}'\n🤔 <b>Did you mean:</b>",
+                                            reply_markup=kb, parse_mode='HTML')
+        else:
+            await update.message.reply_text(f"{header}\nFound {count} results:", reply_markup=kb, parse_mode='HTML')
         
-        USER_STATE[user_id] = None 
+        await USER_STATE.aset(user_id, None)
         return
 
     if state.get('mode') == 'ADD_USER_ID':
@@ -952,14 +1222,14 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         kb = Keyboards.role_selector(text)
         await update.message.reply_text(f"User: {text}. Role?", reply_markup=kb)
-        USER_STATE[user_id] = None
+        await USER_STATE.aset(user_id, None)
         return
 
     try:
         h, m = map(int, text.split(':'))
         scheduler_service.add_job(scheduled_job_wrapper, CronTrigger(hour=h, minute=m), [state['job'], state['dir_id']], state['job'])
         await update.message.reply_text(f"✅ Scheduled {state['job']}")
-        USER_STATE[user_id] = None 
+        await USER_STATE.aset(user_id, None)
     except:
         await update.message.reply_text("Error. Use HH:MM.")
 
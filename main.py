@@ -3,6 +3,12 @@ import asyncio
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 from config.settings import TELEGRAM_TOKEN, LOG_LEVEL, SILENCED_LOGGERS
 from services.scheduler import scheduler_service
+from services.db import db_pool
+from services.executor import io_pool, PerUserUpdateProcessor
+from services.carte import carte_service
+from services.audit import audit_service
+from services.system import system_service
+from services.outbox import outbox
 from config.settings import BOT_VERSION
 from handlers.core import start, handle_callback, handle_text, handle_document
 
@@ -13,10 +19,25 @@ for logger in SILENCED_LOGGERS:
 
 async def post_init(app):
     scheduler_service.start()
+    audit_service.start()
+    system_service.start()
     print("🚀 Services Started. Bot is Ready.")
 
+async def post_stop(app):
+    # Last notifications/digests still go out while the bot can send
+    await outbox.drain()
+
+async def post_shutdown(app):
+    await carte_service.close()
+    audit_service.close()
+    system_service.close()
+    io_pool.shutdown(wait=False)
+    db_pool.close_all()
+
 if __name__ == '__main__':
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).post_init(post_init).build()
+    # Updates run concurrently (one per user at a time), so a slow handler doesn't freeze the bot for everyone
+    app = ApplicationBuilder().token(TELEGRAM_TOKEN).concurrent_updates(PerUserUpdateProcessor()) \
+        .post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build()
     
     app.add_handler(CommandHandler('start', start))
     app.add_handler(CallbackQueryHandler(handle_callback))
@@ -1,29 +1,130 @@
-import psycopg2
+import atexit
+import json
 import logging
-from config.settings import DB_CONF
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from psycopg2.extras import execute_values
+from config import settings
+from services.db import db_pool
+
+# Flush when this many events are queued, or every AUDIT_FLUSH_SEC
+AUDIT_BATCH_SIZE = getattr(settings, 'AUDIT_BATCH_SIZE', 50)
+AUDIT_FLUSH_SEC = getattr(settings, 'AUDIT_FLUSH_SEC', 5)
+
+# Events that could not be written (DB down) are kept here and replayed on the next flush
+AUDIT_SPILL_PATH = getattr(settings, 'AUDIT_SPILL_PATH',
+                           os.path.join(os.path.dirname(settings.USERS_FILE_PATH), 'audit_spill.jsonl'))
+AUDIT_SPILL_MAX_ROWS = getattr(settings, 'AUDIT_SPILL_MAX_ROWS', 50000)
+SPILL_RETRY_SEC = 60
 
 class AuditService:
-    def get_connection(self):
-        return psycopg2.connect(**DB_CONF)
+    def __init__(self):
+        self.queue = deque()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.last_failure = 0
+        self.writing = []  # batch taken from the queue and not yet committed (still visible to reads)
+        self.exit_hook = False
+
+    def start(self):
+        """Starts the background writer (also started lazily by the first log call)."""
+        if self.thread and self.thread.is_alive(): return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self.thread.start()
+        if not self.exit_hook:
+            atexit.register(self.close)
+            self.exit_hook = True
+
+    def close(self):
+        """Stops the writer and flushes everything still queued (called on shutdown)."""
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=AUDIT_FLUSH_SEC * 2)
+        self.flush()
 
     def log(self, user_id, action, target, details=""):
-        """Records a user action."""
+        """Records a user action (queued in memory, written in batches by the writer thread)."""
+        self.queue.append((str(user_id), action, target, details, datetime.now()))
+        logging.info(f"AUDIT: User {user_id} -> {action} on {target}")
+        if self.thread is None: self.start()
+        if len(self.queue) >= AUDIT_BATCH_SIZE: self.wakeup.set()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait(AUDIT_FLUSH_SEC)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes queued (and previously spilled) events with one multi-row INSERT."""
         sql = """
-        INSERT INTO BOT_AUDIT_LOG (USER_ID, ACTION_TYPE, TARGET_NAME, DETAILS)
-        VALUES (%s, %s, %s, %s)
+        INSERT INTO BOT_AUDIT_LOG (USER_ID, ACTION_TYPE, TARGET_NAME, DETAILS, LOGGED_AT)
+        VALUES %s
         """
+        with self.flush_lock:
+            self.writing = batch = []
+            while self.queue:
+                batch.append(self.queue.popleft())
+            # Nothing new and the DB just failed -> don't hammer it with the spill file
+            if not batch and time.time() - self.last_failure < SPILL_RETRY_SEC: return
+            spilled = self._read_spill()
+            rows = spilled + batch
+            if not rows: return
+
+            try:
+                with db_pool.connection() as conn:
+                    cur = conn.cursor()
+                    execute_values(cur, sql, rows, page_size=500)
+                    conn.commit()
+                if spilled: os.remove(AUDIT_SPILL_PATH)
+            except Exception as e:
+                logging.error(f"Audit Log Error: {e} ({len(rows)} events spilled to disk)")
+                self.last_failure = time.time()
+                self._write_spill(rows)
+            finally:
+                self.writing = []
+
+    def _read_spill(self):
+        if not os.path.exists(AUDIT_SPILL_PATH): return []
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (str(user_id), action, target, details))
-            conn.commit()
-            conn.close()
-            logging.info(f"AUDIT: User {user_id} -> {action} on {target}")
+            with open(AUDIT_SPILL_PATH, 'r') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            return [(r[0], r[1], r[2], r[3], datetime.fromisoformat(r[4])) for r in rows]
         except Exception as e:
-            logging.error(f"Audit Log Error: {e}")
+            logging.error(f"Audit Spill Read Error: {e}")
+            return []
+
+    def _write_spill(self, rows):
+        # Keep the newest rows only, so an outage can't fill the disk
+        rows = rows[-AUDIT_SPILL_MAX_ROWS:]
+        try:
+            tmp_path = AUDIT_SPILL_PATH + ".tmp"
+            with open(tmp_path, 'w') as f:
+                for r in rows:
+                    f.write(json.dumps([r[0], r[1], r[2], r[3], r[4].isoformat()]) + "\n")
+            os.replace(tmp_path, AUDIT_SPILL_PATH)
+        except Exception as e:
+            logging.error(f"Audit Spill Write Error: {e}")
+
+    def metrics(self):
+        return {'queued': len(self.queue), 'spill_file': os.path.exists(AUDIT_SPILL_PATH)}
+
+    def _pending(self, user_id=None, action=None):
+        """Events not in the DB yet (queued or being written), newest first. Never touches the DB."""
+        rows = list(self.writing) + list(self.queue)
+        if user_id is not None: rows = [r for r in rows if r[0] == str(user_id)]
+        if action is not None: rows = [r for r in rows if r[1] == action]
+        return sorted(rows, key=lambda r: r[4], reverse=True)
 
     def get_recent_logs(self, limit=15):
-        """Fetches recent activity for the Admin dashboard."""
+        """Fetches recent activity for the Admin dashboard (DB rows + events still queued)."""
         sql = """
         SELECT USER_ID, ACTION_TYPE, TARGET_NAME, LOGGED_AT 
         FROM BOT_AUDIT_LOG 
@@ -31,27 +132,28 @@ class AuditService:
         LIMIT %s
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (limit,))
-            rows = cur.fetchall()
-            conn.close()
-            
-            logs = []
-            for row in rows:
-                logs.append({
-                    'user': row[0],
-                    'action': row[1],
-                    'target': row[2],
-                    'time': row[3].strftime('%m-%d %H:%M')
-                })
-            return logs
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (limit,))
+                rows = cur.fetchall()
         except Exception as e:
             logging.error(f"Audit Fetch Error: {e}")
-            return []
+            rows = []
+
+        pending = [(r[0], r[1], r[2], r[4]) for r in self._pending()]
+        rows = sorted(pending + list(rows), key=lambda r: r[3].replace(tzinfo=None), reverse=True)[:limit]
+        logs = []
+        for row in rows:
+            logs.append({
+                'user': row[0],
+                'action': row[1],
+                'target': row[2],
+                'time': row[3].strftime('%m-%d %H:%M')
+            })
+        return logs
 
     def get_user_search_history(self, user_id, limit=5):
-        """Returns the last N unique search terms for a user."""
+        """Returns the last N unique search terms for a user (queued searches first)."""
         sql = """
         SELECT DISTINCT DETAILS
         FROM BOT_AUDIT_LOG
@@ -70,20 +172,23 @@ class AuditService:
         LIMIT %s
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (str(user_id), limit))
-            rows = cur.fetchall()
-            conn.close()
-            return [row[0] for row in rows]
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (str(user_id), limit))
+                rows = cur.fetchall()
         except Exception as e:
             logging.error(f"Search History Error: {e}")
-            return []
+            rows = []
+
+        terms = []
+        for term in [r[3] for r in self._pending(user_id, 'SEARCH')] + [row[0] for row in rows]:
+            if term not in terms: terms.append(term)
+        return terms[:limit]
 
     # ... inside AuditService ...
 
     def get_user_logs(self, user_id, limit=10):
-        """Fetches the last N actions for a specific user."""
+        """Fetches the last N actions for a specific user (DB rows + events still queued)."""
         sql = """
         SELECT ACTION_TYPE, TARGET_NAME, LOGGED_AT, DETAILS 
         FROM BOT_AUDIT_LOG 
@@ -92,23 +197,24 @@ class AuditService:
         LIMIT %s
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (str(user_id), limit))
-            rows = cur.fetchall()
-            conn.close()
-            
-            logs = []
-            for row in rows:
-                logs.append({
-                    'action': row[0],
-                    'target': row[1],
-                    'time': row[2].strftime('%m-%d %H:%M'),
-                    'details': row[3]
-                })
-            return logs
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (str(user_id), limit))
+                rows = cur.fetchall()
         except Exception as e:
             logging.error(f"User Log Error: {e}")
-            return []            
+            rows = []
+
+        pending = [(r[1], r[2], r[4], r[3]) for r in self._pending(user_id)]
+        rows = sorted(pending + list(rows), key=lambda r: r[2].replace(tzinfo=None), reverse=True)[:limit]
+        logs = []
+        for row in rows:
+            logs.append({
+                'action': row[0],
+                'target': row[1],
+                'time': row[2].strftime('%m-%d %H:%M'),
+                'details': row[3]
+            })
+        return logs
 
 audit_service = AuditService()
\ No newline at end of file
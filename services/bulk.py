@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+from config import settings
+from services.exec_queue import execution_queue, PRIORITY_BULK
+from services.watcher import execution_watcher, LOST_STATE
+
+# Runs of one bulk action started/running at the same time, and min seconds between progress updates
+BULK_WORKERS = getattr(settings, 'BULK_WORKERS', 4)
+BULK_PROGRESS_SEC = getattr(settings, 'BULK_PROGRESS_SEC', 5)
+# A run with no end reported after this long is given up on (marked lost) so its worker moves on
+BULK_RUN_TIMEOUT_SEC = getattr(settings, 'BULK_RUN_TIMEOUT_SEC', 6 * 3600)
+
+PENDING, STARTING, RUNNING, SUCCEEDED, FAILED = 'pending', 'starting', 'running', 'succeeded', 'failed'
+# Started, but Carte gave no run id to follow / no end seen (timeout, or Carte forgot the run)
+UNKNOWN, LOST = 'unknown', 'lost'
+
+
+class BulkItem:
+    def __init__(self, name, path, is_job):
+        self.name = name
+        self.path = path
+        self.is_job = is_job
+        self.state = PENDING
+        self.error = ""
+
+
+class BulkRun:
+    """
+    Launches many jobs/transformations through a bounded pool of workers. A worker starts one
+    item (via the execution queue, bulk priority), waits until the watcher reports its end,
+    then takes the next one. Progress and the final summary go to two callbacks only.
+    """
+
+    def __init__(self, title, items, on_progress, on_done):
+        self.title = title
+        self.items = [BulkItem(name, path, is_job) for name, path, is_job in items]
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.started_at = time.time()
+        self.finished_at = None
+        self.changes = 0
+
+    def counts(self):
+        result = {PENDING: 0, STARTING: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, UNKNOWN: 0, LOST: 0}
+        for item in self.items:
+            result[item.state] += 1
+        return result
+
+    def duration(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def problems(self):
+        """Items that did not end successfully (failed, or started but not followed to the end)."""
+        return [i for i in self.items if i.state in (FAILED, UNKNOWN, LOST)]
+
+    async def run(self):
+        todo = asyncio.Queue()
+        for item in self.items:
+            todo.put_nowait(item)
+
+        workers = [asyncio.ensure_future(self._worker(todo)) for _ in range(min(BULK_WORKERS, len(self.items)))]
+        reporter = asyncio.ensure_future(self._report_loop())
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            reporter.cancel()
+            self.finished_at = time.time()
+        try:
+            await self.on_done(self)
+        except Exception as e:
+            logging.error(f"Bulk Summary Error ({self.title}): {e}")
+
+    async def _worker(self, todo):
+        while not todo.empty():
+            item = todo.get_nowait()
+            try:
+                await self._run_item(item)
+            except Exception as e:
+                item.state, item.error = FAILED, str(e)
+            self.changes += 1
+
+    async def _run_item(self, item):
+        item.state = STARTING
+        self.changes += 1
+        success, res = await execution_queue.submit(item.name, item.path, item.is_job, PRIORITY_BULK)
+        if not success:
+            item.state, item.error = FAILED, str(res)
+            return
+
+        item.state = RUNNING
+        self.changes += 1
+        finished = asyncio.get_running_loop().create_future()
+
+        async def on_run_done(run, ok, log):
+            if not finished.done(): finished.set_result((ok, run.status))
+
+        if not execution_watcher.track(res, item.name, item.is_job, on_run_done):
+            item.state, item.error = UNKNOWN, "started, but Carte returned no run id to follow"
+            return
+        try:
+            ok, status = await asyncio.wait_for(finished, BULK_RUN_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            item.state, item.error = LOST, f"no end reported within {int(BULK_RUN_TIMEOUT_SEC // 60)} min"
+            return
+        if status == LOST_STATE:
+            item.state, item.error = LOST, status
+            return
+        item.state = SUCCEEDED if ok else FAILED
+        if not ok: item.error = status
+
+    async def _report_loop(self):
+        reported = 0
+        while True:
+            await asyncio.sleep(BULK_PROGRESS_SEC)
+            if self.changes == reported: continue
+            reported = self.changes
+            try:
+                await self.on_progress(self)
+            except Exception as e:
+                logging.error(f"Bulk Progress Error ({self.title}): {e}")
+
+
+class BulkRunner:
+    def __init__(self):
+        self.active = set()
+        self.completed = 0
+
+    def start(self, title, items, on_progress, on_done):
+        bulk = BulkRun(title, items, on_progress, on_done)
+        self.active.add(bulk)
+        task = asyncio.ensure_future(bulk.run())
+        task.add_done_callback(lambda _: self._finished(bulk))
+        return bulk
+
+    def _finished(self, bulk):
+        self.active.discard(bulk)
+        self.completed += 1
+
+    def metrics(self):
+        return {'active_bulks': len(self.active), 'completed_bulks': self.completed,
+                'items_in_flight': sum(len(b.items) for b in self.active), 'workers_per_bulk': BULK_WORKERS}
+
+
+bulk_runner = BulkRunner()
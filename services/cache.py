@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map with a size cap.
+    `version` ties the contents to a data version: validate(v) drops everything when it changes.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def validate(self, version):
+        with self.lock:
+            if version != self.version:
+                self.data.clear()
+                self.version = version
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, version=None):
+        """`version`: data version the value was built from; not stored if the cache moved past it."""
+        with self.lock:
+            if version is not None and version != self.version: return
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def metrics(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self.data),
+            'max_entries': self.maxsize,
+            'hit_rate': f"{self.hits / total * 100:.0f}%" if total else "-",
+            'evictions': self.evictions,
+        }
@@ -1,23 +1,191 @@
-import requests
+import asyncio
+import base64
+import copy
+import gzip
+import httpx
+import json
+import os
+import time
 import urllib.parse
 import logging
 import xml.etree.ElementTree as ET
+from config import settings
 from config.settings import CARTE_URL, CARTE_AUTH, REPO_CONF
+from services.executor import run_blocking
+
+# Per-endpoint timeouts (sec); override any of them with CARTE_TIMEOUTS in settings
+TIMEOUTS = {'execute': 10, 'status': 5, 'process_status': 2, 'stop': 5}
+TIMEOUTS.update(getattr(settings, 'CARTE_TIMEOUTS', {}))
+
+# Keep-alive sockets kept open to Carte
+CARTE_MAX_CONNECTIONS = getattr(settings, 'CARTE_MAX_CONNECTIONS', 10)
+
+# Learned executeJob/executeTrans parameter strategy per directory
+STRATEGY_FILE = getattr(settings, 'CARTE_STRATEGY_FILE',
+                        os.path.join(os.path.dirname(settings.USERS_FILE_PATH), 'carte_strategies.json'))
+
+# /status snapshot: max age before re-fetching, and how long a viewer keeps it warm (sec)
+STATUS_TTL = getattr(settings, 'CARTE_STATUS_TTL', 3)
+STATUS_WATCH_SEC = getattr(settings, 'CARTE_STATUS_WATCH_SEC', 60)
+
+
+# Returned instead of an id when Carte accepted a run but its reply had no <id>
+UNKNOWN_ID = "Started (ID Unknown)"
+
+JOB_ACTIVE_STATES = ["Running", "Initializing"]
+TRANS_DONE_STATES = ["Finished", "Stopped", "Stopped (with errors)", "Waiting"]
+
+
+def parse_status(xml_text):
+    """Parses a /status?xml=Y document once -> every job and transformation with its state."""
+    root = ET.fromstring(xml_text)
+    jobs, trans = [], []
+    for j in root.findall(".//jobstatus"):
+        jobs.append({'name': j.findtext('jobname'), 'id': j.findtext('id'), 'status': j.findtext('status_desc'),
+                     'type': 'JOB', 'job_id': True})
+    for t in root.findall(".//transstatus"):
+        trans.append({'name': t.findtext('transname'), 'id': t.findtext('id'), 'status': t.findtext('status_desc'),
+                      'type': 'TRANS'})
+    return jobs, trans
+
+
+def decode_log(raw):
+    """Carte sends logging_string gzipped + base64 in XML mode; older servers send plain text."""
+    if not raw: return ""
+    raw = raw.strip()
+    try:
+        return gzip.decompress(base64.b64decode(raw)).decode('utf-8', errors='replace')
+    except Exception:
+        return raw
+
+
+class StatusSnapshot:
+    """One parsed /status document shared by every monitor view."""
+
+    def __init__(self, jobs=(), trans=(), ok=True):
+        self.jobs = list(jobs)
+        self.trans = list(trans)
+        self.ok = ok
+        self.fetched_at = time.monotonic()
+        self.by_id = {p['id']: p for p in self.jobs + self.trans}
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+    def active_jobs(self):
+        # Only show Running/Initializing jobs
+        return [j for j in self.jobs if j['status'] in JOB_ACTIVE_STATES]
+
+    def active_trans(self):
+        return [t for t in self.trans if t['status'] not in TRANS_DONE_STATES]
+
+    def find(self, carte_id):
+        return self.by_id.get(carte_id)
+
+    def stale(self):
+        """The same data flagged as not live (Carte did not answer); age() keeps counting from the last fetch."""
+        snapshot = copy.copy(self)
+        snapshot.ok = False
+        return snapshot
+
+
+class StrategyCache:
+    """
+    Remembers which trigger strategy worked per repository directory (plus a global favourite),
+    persisted as JSON so the learning survives restarts. Also counts hits/misses per strategy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.learned = {}
+        self.stats = {}
+        try:
+            with open(path, 'r') as f:
+                self.learned = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Carte Strategy Cache Load Error: {e}")
+
+    def order(self, directory, keys):
+        """Strategy keys to try: learned for this dir, then the global favourite, then the rest."""
+        first = [k for k in (self.learned.get(directory), self.learned.get('*')) if k in keys]
+        return list(dict.fromkeys(first + keys))
+
+    def record(self, directory, key, success):
+        stat = self.stats.setdefault(key, {'hits': 0, 'misses': 0})
+        stat['hits' if success else 'misses'] += 1
+
+        changed = False
+        if success:
+            changed = self.learned.get(directory) != key or self.learned.get('*') != key
+            self.learned[directory] = key
+            self.learned['*'] = key
+        elif self.learned.get(directory) == key:
+            # Learned strategy stopped working -> forget it
+            del self.learned[directory]
+            changed = True
+        if changed: self._save()
+
+    def _save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.learned, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logging.error(f"Carte Strategy Cache Save Error: {e}")
+
+    def metrics(self):
+        result = {'learned_dirs': len([k for k in self.learned if k != '*'])}
+        for key, stat in self.stats.items():
+            result[key] = f"{stat['hits']} hit / {stat['misses']} miss"
+        return result
+
 
 class CarteService:
-    
-    @staticmethod
-    def _execute(endpoint, name, directory, params=None):
-        """Helper to avoid code duplication between Job and Trans."""
-        strategies = [
-            {"params": {'dir': directory, 'name': name}}, 
-            {"params": {'dir': '/', 'name': f"{directory}/{name}".replace('//', '/')}},
-            {"params": {'dir': directory.lstrip('/'), 'name': name}}
-        ]
-        
+    def __init__(self):
+        self.client = None
+        self.strategies = StrategyCache(STRATEGY_FILE)
+
+        # Shared /status snapshot + the single in-flight fetch everyone waits on
+        self.snapshot = None
+        self.snapshot_task = None
+        self.watch_until = 0
+        self.watch_task = None
+
+    def _client(self):
+        """One shared keep-alive session (basic auth negotiated once per socket, not per call)."""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=CARTE_URL.rstrip('/') + '/',
+                auth=CARTE_AUTH,
+                timeout=TIMEOUTS['status'],
+                limits=httpx.Limits(max_connections=CARTE_MAX_CONNECTIONS,
+                                    max_keepalive_connections=CARTE_MAX_CONNECTIONS)
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _execute(self, endpoint, name, directory, params=None):
+        """
+        Helper to avoid code duplication between Job and Trans.
+        Carte accepts different dir/name encodings depending on the repo; the one that worked
+        for a directory is remembered and tried first next time.
+        """
+        strategies = {
+            'dir+name': {'dir': directory, 'name': name},
+            'root+path': {'dir': '/', 'name': f"{directory}/{name}".replace('//', '/')},
+            'relative': {'dir': directory.lstrip('/'), 'name': name},
+        }
+
         last_error = ""
-        for strat in strategies:
-            final_params = strat['params'].copy()
+        for key in self.strategies.order(directory, list(strategies)):
+            final_params = strategies[key].copy()
             if 'executeJob' in endpoint:
                 final_params['job'] = final_params.pop('name')
             else:
@@ -25,19 +193,19 @@ class CarteService:
 
             payload = {**REPO_CONF, **final_params, 'level': 'Basic'}
             if params: payload.update(params)
-            
+
             query = urllib.parse.urlencode(payload, quote_via=urllib.parse.quote, safe='/')
-            url = f"{CARTE_URL}/{endpoint}?{query}"
-            
+
             try:
-                response = requests.get(url, auth=CARTE_AUTH, timeout=10)
+                response = await self._client().get(f"{endpoint}?{query}", timeout=TIMEOUTS['execute'])
                 if response.status_code == 200:
                     text = response.text
                     if 'OK' in text or '<result>OK</result>' in text:
+                        self.strategies.record(directory, key, True)
                         try:
                             return True, ET.fromstring(text).find('id').text
                         except:
-                            return True, "Started (ID Unknown)"
+                            return True, UNKNOWN_ID
                     try:
                         last_error = ET.fromstring(text).find('message').text
                     except:
@@ -45,96 +213,96 @@ class CarteService:
                 else:
                     last_error = f"HTTP {response.status_code}"
             except Exception as e:
-                last_error = str(e)
+                # No answer from Carte (down, timeout, ...): says nothing about the strategy, and a
+                # timed-out request may still have started the process -> don't try the others
+                logging.error(f"Carte Execute Error ({endpoint} {name}): {e}")
+                return False, str(e) or type(e).__name__
+            self.strategies.record(directory, key, False)
         return False, last_error
 
-    @staticmethod
-    async def trigger_job(job_name, directory):
-        return CarteService._execute('executeJob', job_name, directory)
+    async def trigger_job(self, job_name, directory):
+        return await self._execute('executeJob', job_name, directory)
 
-    @staticmethod
-    async def trigger_trans(trans_name, directory):
-        return CarteService._execute('executeTrans', trans_name, directory)
+    async def trigger_trans(self, trans_name, directory):
+        return await self._execute('executeTrans', trans_name, directory)
 
-    @staticmethod
-    @staticmethod
-    def stop_process(name, id, is_job=True):
+    async def stop_process(self, name, id, is_job=True):
         """Stops a running process."""
         endpoint = "stopJob" if is_job else "stopTrans"
         p_name = "name" if is_job else "trans"
-        
+
         try:
             # Send Stop Signal
             params = {p_name: name, 'id': id, 'xml': 'Y'}
-            response = requests.get(f"{CARTE_URL}/{endpoint}/", params=params, auth=CARTE_AUTH, timeout=5)
-            
+            response = await self._client().get(f"{endpoint}/", params=params, timeout=TIMEOUTS['stop'])
+
             if response.status_code == 200:
                 return True, "🛑 Stop Signal Sent."
             else:
                 return False, f"HTTP Error {response.status_code}"
-                
+
         except Exception as e:
             return False, f"Connection Error: {str(e)}"
 
-    @staticmethod
-    def get_status(name, id, is_job=True):
-        """Checks the status of a specific job/trans ID."""
+    async def get_log(self, name, id, is_job=True, from_line=0):
+        """
+        Status plus only the log lines written after from_line (Carte's `from` parameter),
+        so polling a long run does not re-download its whole log.
+        Returns (status_desc, new_log_text, last_line_nr).
+        """
         endpoint = "jobStatus" if is_job else "transStatus"
         p_name = "name" if is_job else "trans"
-        
-        try:
-            params = {p_name: name, 'id': id, 'xml': 'Y'}
-            # Checks status
-            r = requests.get(f"{CARTE_URL}/kettle/{endpoint}/", params=params, auth=CARTE_AUTH, timeout=2)
-            if r.status_code == 200:
-                root = ET.fromstring(r.text)
-                return root.find('status_desc').text, root
-        except:
-            pass
-        return "Connection Error", None
 
-    @staticmethod
-    def get_active_jobs():
-        """Fetches running jobs."""
         try:
-            r = requests.get(f"{CARTE_URL}/status/", params={'xml': 'Y'}, auth=CARTE_AUTH, timeout=5)
+            params = {p_name: name, 'id': id, 'xml': 'Y', 'from': from_line}
+            r = await self._client().get(f"{endpoint}/", params=params, timeout=TIMEOUTS['process_status'])
             if r.status_code == 200:
-                running = []
-                root = ET.fromstring(r.text)
-                lst = root.find('jobstatuslist')
-                if lst:
-                    for j in lst.findall('jobstatus'):
-                        # Only show Running/Initializing jobs
-                        if j.find('status_desc').text in ["Running", "Initializing"]:
-                            running.append({'name': j.find('jobname').text, 'id': j.find('id').text, 'type': 'JOB', 'job_id': True})
-                return running
-        except:
+                root = ET.fromstring(r.content)
+                last_line = int(root.findtext('last_log_line_nr') or from_line)
+                return root.findtext('status_desc'), decode_log(root.findtext('logging_string')), last_line
+        except Exception:
             pass
-        return []
+        return "Connection Error", "", from_line
 
-    @staticmethod
-    def get_active_trans():
-        """Fetches running transformations."""
-        url = f"{CARTE_URL}/kettle/status/?xml=Y"
+    async def get_snapshot(self, max_age=None):
+        """
+        Returns the cached /status snapshot if younger than max_age (default CARTE_STATUS_TTL).
+        Concurrent callers share one fetch instead of each downloading the document.
+        """
+        max_age = STATUS_TTL if max_age is None else max_age
+        if self.snapshot and self.snapshot.age() < max_age:
+            return self.snapshot
+
+        if self.snapshot_task is None:
+            self.snapshot_task = asyncio.ensure_future(self._fetch_snapshot())
+            self.snapshot_task.add_done_callback(self._clear_snapshot_task)
+        return await asyncio.shield(self.snapshot_task)
+
+    def _clear_snapshot_task(self, task):
+        self.snapshot_task = None
+
+    async def _fetch_snapshot(self):
         try:
-            response = requests.get(url, auth=CARTE_AUTH, timeout=5)
-            if response.status_code != 200: return []
-            
-            root = ET.fromstring(response.content)
-            active = []
-            
-            for item in root.findall(".//transstatus"):
-                status = item.find("status_desc").text
-                if status not in ["Finished", "Stopped", "Stopped (with errors)", "Waiting"]:
-                    active.append({
-                        'id': item.find("id").text,
-                        'name': item.find("transname").text,
-                        'status': status,
-                        'type': 'TRANS'
-                    })
-            return active
+            r = await self._client().get("status/", params={'xml': 'Y'}, timeout=TIMEOUTS['status'])
+            if r.status_code == 200:
+                # ~0.1s for 10k entries -> parsed on the I/O pool, not on the event loop
+                self.snapshot = StatusSnapshot(*await run_blocking(parse_status, r.content))
+                return self.snapshot
+            logging.error(f"Carte Status Error: HTTP {r.status_code}")
         except Exception as e:
-            logging.error(f"Carte Active Trans Error: {e}")
-            return []
+            logging.error(f"Carte Status Error: {e}")
+        # Keep serving the last good data, but marked stale so callers don't take it as live
+        return self.snapshot.stale() if self.snapshot else StatusSnapshot(ok=False)
+
+    def watch(self):
+        """Someone is looking at the monitor: keep the snapshot refreshed in the background."""
+        self.watch_until = time.monotonic() + STATUS_WATCH_SEC
+        if self.watch_task is None or self.watch_task.done():
+            self.watch_task = asyncio.ensure_future(self._watch_loop())
+
+    async def _watch_loop(self):
+        while time.monotonic() < self.watch_until:
+            await self.get_snapshot(max_age=0)
+            await asyncio.sleep(STATUS_TTL)
 
-carte_service = CarteService()
\ No newline at end of file
+carte_service = CarteService()
@@ -0,0 +1,157 @@
+import psycopg2
+import psycopg2.extensions
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import settings
+from config.settings import DB_CONF
+
+POOL_SIZE = getattr(settings, 'DB_POOL_SIZE', 5)
+POOL_TIMEOUT = getattr(settings, 'DB_POOL_TIMEOUT', 10)
+# Idle connections older than this (sec) are pinged before being handed out
+POOL_IDLE_CHECK_SEC = getattr(settings, 'DB_POOL_IDLE_CHECK_SEC', 30)
+
+
+class DbPool:
+    """
+    Small thread-safe pool of repo DB connections.
+    Usage:
+        with db_pool.connection() as conn:
+            cur = conn.cursor()
+    Errors inside the block roll back; the connection always goes back to the pool
+    (or is dropped if it is broken).
+    """
+
+    def __init__(self, conf, size, timeout, idle_check_sec):
+        self.conf = conf
+        self.size = size
+        self.timeout = timeout
+        self.idle_check_sec = idle_check_sec
+
+        self.idle = deque()  # (conn, returned_at)
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+
+        self.in_use = 0
+        self.stats = {'waits': 0, 'wait_ms': 0.0, 'timeouts': 0, 'connects': 0,
+                      'connect_ms': 0.0, 'connect_max_ms': 0.0, 'dropped': 0}
+
+    @contextmanager
+    def connection(self):
+        self._acquire_slot()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            # Leave the connection clean (read-only blocks never commit)
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except Exception:
+                    self._drop(conn)
+                    conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._checkin(conn)
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+
+    def _acquire_slot(self):
+        if not self.slots.acquire(blocking=False):
+            start = time.perf_counter()
+            ok = self.slots.acquire(timeout=self.timeout)
+            with self.lock:
+                self.stats['waits'] += 1
+                self.stats['wait_ms'] += (time.perf_counter() - start) * 1000
+                if not ok: self.stats['timeouts'] += 1
+            if not ok:
+                raise psycopg2.OperationalError(f"DB pool exhausted ({self.size} connections busy)")
+        with self.lock:
+            self.in_use += 1
+
+    def _checkout(self):
+        while True:
+            with self.lock:
+                if not self.idle: break
+                conn, returned_at = self.idle.pop()
+            if conn.closed:
+                self._drop(conn)
+                continue
+            if time.time() - returned_at > self.idle_check_sec and not self._is_alive(conn):
+                self._drop(conn)
+                continue
+            return conn
+        return self._connect()
+
+    def _checkin(self, conn):
+        if conn.closed:
+            self._drop(conn)
+            return
+        with self.lock:
+            self.idle.append((conn, time.time()))
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = psycopg2.connect(**self.conf)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats['connects'] += 1
+            self.stats['connect_ms'] += elapsed
+            self.stats['connect_max_ms'] = max(self.stats['connect_max_ms'], elapsed)
+        return conn
+
+    def _is_alive(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"DbPool: Dropping dead connection ({e})")
+            return False
+
+    def _drop(self, conn):
+        with self.lock:
+            self.stats['dropped'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self.lock:
+            conns = [c for c, _ in self.idle]
+            self.idle.clear()
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+    def metrics(self):
+        with self.lock:
+            s = dict(self.stats)
+            in_use, idle = self.in_use, len(self.idle)
+        return {
+            'size': self.size,
+            'in_use': in_use,
+            'idle': idle,
+            'waits': s['waits'],
+            'avg_wait_ms': round(s['wait_ms'] / s['waits'], 1) if s['waits'] else 0,
+            'timeouts': s['timeouts'],
+            'connects': s['connects'],
+            'avg_connect_ms': round(s['connect_ms'] / s['connects'], 1) if s['connects'] else 0,
+            'max_connect_ms': round(s['connect_max_ms'], 1),
+            'dropped': s['dropped'],
+        }
+
+
+db_pool = DbPool(DB_CONF, POOL_SIZE, POOL_TIMEOUT, POOL_IDLE_CHECK_SEC)
@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from config import settings
+from services.carte import carte_service
+from services.executor import run_blocking
+from services.system import system_service
+
+# Admission: max processes running on Carte, and host load above which nothing new is started
+QUEUE_MAX_ACTIVE = getattr(settings, 'QUEUE_MAX_ACTIVE', 8)
+QUEUE_MAX_CPU = getattr(settings, 'QUEUE_MAX_CPU', 90)
+QUEUE_MAX_MEM = getattr(settings, 'QUEUE_MAX_MEM', 90)
+# Seconds between admission checks while something is waiting
+QUEUE_RECHECK_SEC = getattr(settings, 'QUEUE_RECHECK_SEC', 3)
+
+# Priority classes (lower runs first)
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 1
+PRIORITY_BULK = 2
+PRIORITY_LABELS = {PRIORITY_MANUAL: 'manual', PRIORITY_SCHEDULED: 'scheduled', PRIORITY_BULK: 'bulk'}
+
+
+class QueuedRun:
+    def __init__(self, name, path, is_job, priority, on_wait):
+        self.name = name
+        self.path = path
+        self.is_job = is_job
+        self.priority = priority
+        self.on_wait = on_wait
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.monotonic()
+        self.last_notice = None
+
+
+class ExecutionQueue:
+    """
+    Every trigger goes through here. Runs are started in priority order (manual > scheduled > bulk)
+    only while Carte has fewer than QUEUE_MAX_ACTIVE active processes and the host is below the
+    CPU/RAM limits; everyone else waits and is told their position.
+    """
+
+    def __init__(self):
+        self.heap = []  # (priority, seq, QueuedRun)
+        self.seq = itertools.count()
+        self.task = None
+        self.launched = []  # monotonic times of starts not yet visible in a /status snapshot
+        self.stats = {'started': 0, 'waited': 0, 'wait_sec_total': 0.0, 'blocked': ''}
+
+    async def submit(self, name, path, is_job=True, priority=PRIORITY_MANUAL, on_wait=None):
+        """
+        Queues a trigger and returns Carte's (success, id_or_error) once it has been started.
+        on_wait(position, reason) is awaited whenever the run is waiting and its position/reason changed.
+        """
+        run = QueuedRun(name, path, is_job, priority, on_wait)
+        heapq.heappush(self.heap, (priority, next(self.seq), run))
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._loop())
+        return await run.future
+
+    async def _loop(self):
+        while self.heap:
+            try:
+                reason = await self._blocked_reason()
+                if reason is None:
+                    _, _, run = heapq.heappop(self.heap)
+                    await self._start(run)
+                    continue
+                self.stats['blocked'] = reason
+                await self._notify_waiting(reason)
+            except Exception as e:
+                logging.error(f"Execution Queue Error: {e}")
+            await asyncio.sleep(QUEUE_RECHECK_SEC)
+        self.stats['blocked'] = ''
+
+    async def _blocked_reason(self):
+        """None if one more run may start now, else a short human-readable reason."""
+        health = await run_blocking(system_service.get_health_report)
+        if health['cpu'] >= QUEUE_MAX_CPU:
+            return f"server CPU at {health['cpu']}%"
+        if health['mem_percent'] >= QUEUE_MAX_MEM:
+            return f"server RAM at {health['mem_percent']}%"
+
+        snapshot = await carte_service.get_snapshot(max_age=QUEUE_RECHECK_SEC)
+        if not snapshot.ok:
+            # Carte unreachable: let the trigger itself report the error
+            return None
+        # Runs we started after this snapshot was taken are not in it yet
+        fetched_at = time.monotonic() - snapshot.age()
+        self.launched = [t for t in self.launched if t > fetched_at]
+        active = len(snapshot.active_jobs()) + len(snapshot.active_trans()) + len(self.launched)
+        if active >= QUEUE_MAX_ACTIVE:
+            return f"Carte busy ({active}/{QUEUE_MAX_ACTIVE} running)"
+        return None
+
+    async def _start(self, run):
+        waited = time.monotonic() - run.queued_at
+        if run.last_notice is not None:
+            self.stats['waited'] += 1
+            self.stats['wait_sec_total'] += waited
+        try:
+            if run.is_job:
+                result = await carte_service.trigger_job(run.name, run.path)
+            else:
+                result = await carte_service.trigger_trans(run.name, run.path)
+        except Exception as e:
+            result = (False, str(e))
+        if result[0]:
+            self.launched.append(time.monotonic())
+            self.stats['started'] += 1
+        if not run.future.done():
+            run.future.set_result(result)
+
+    async def _notify_waiting(self, reason):
+        for position, (_, _, run) in enumerate(sorted(self.heap), start=1):
+            if run.on_wait is None or run.last_notice == (position, reason): continue
+            run.last_notice = (position, reason)
+            try:
+                await run.on_wait(position, reason)
+            except Exception as e:
+                logging.error(f"Execution Queue Notify Error ({run.name}): {e}")
+
+    def snapshot(self):
+        """Waiting runs in start order: [(position, name, priority label)]."""
+        return [(i, run.name, PRIORITY_LABELS[p]) for i, (p, _, run) in enumerate(sorted(self.heap), start=1)]
+
+    def metrics(self):
+        waited = self.stats['waited']
+        return {
+            'queued': len(self.heap),
+            'started': self.stats['started'],
+            'had_to_wait': waited,
+            'avg_wait_sec': round(self.stats['wait_sec_total'] / waited, 1) if waited else 0,
+            'blocked_by': self.stats['blocked'] or '-',
+            'max_active': QUEUE_MAX_ACTIVE,
+        }
+
+
+execution_queue = ExecutionQueue()
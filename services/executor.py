@@ -0,0 +1,50 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from telegram.ext import BaseUpdateProcessor
+from config import settings
+
+# Bounded pool for blocking I/O (psycopg2, HTTP, psutil) so handlers never block the event loop
+IO_WORKERS = getattr(settings, 'IO_WORKERS', 8)
+# Telegram updates handled at the same time (updates of one user still run one after another)
+BOT_CONCURRENT_UPDATES = getattr(settings, 'BOT_CONCURRENT_UPDATES', 16)
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="bot-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Runs a blocking service call in the I/O pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_pool, functools.partial(func, *args, **kwargs))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Lets the bot handle up to BOT_CONCURRENT_UPDATES updates at once, so one slow DB query or
+    Carte call no longer stalls every other user. Updates of the same user still run one at a
+    time and in order, so their session state and message edits never interleave.
+    """
+
+    def __init__(self, max_concurrent_updates=BOT_CONCURRENT_UPDATES):
+        super().__init__(max_concurrent_updates)
+        self.users = {}  # user id -> [lock, updates waiting or running]
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, 'effective_user', None)
+        if user is None:
+            await coroutine
+            return
+        entry = self.users.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]: del self.users[user.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
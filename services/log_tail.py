@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from config import settings
+from services.executor import run_blocking
+
+# Follow mode: min seconds between message edits, hard stop, and lines kept on screen
+FOLLOW_EDIT_SEC = getattr(settings, 'LOG_FOLLOW_EDIT_SEC', 3)
+FOLLOW_MAX_SEC = getattr(settings, 'LOG_FOLLOW_MAX_SEC', 600)
+FOLLOW_LINES = getattr(settings, 'LOG_FOLLOW_LINES', 30)
+# Max bytes picked up per follow tick (a burst beyond that is skipped, not queued)
+FOLLOW_MAX_BYTES = getattr(settings, 'LOG_TAIL_MAX_BYTES', 256 * 1024)
+
+BLOCK_SIZE = 8192
+
+
+def read_tail(path, lines, max_bytes):
+    """
+    Last `lines` lines of a file, reading backwards from the end in blocks
+    (never more than max_bytes). Returns (text, end_offset) so a follower can continue from there.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        chunks = []
+        newlines = 0
+        # One newline more than needed: the file usually ends with one
+        while pos > 0 and newlines <= lines and end - pos < max_bytes:
+            size = min(BLOCK_SIZE, pos, max_bytes - (end - pos))
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            chunks.append(block)
+            newlines += block.count(b'\n')
+
+    data = b''.join(reversed(chunks))
+    if pos > 0:
+        # Started mid-line (line count or byte cap reached) -> drop the partial first line
+        data = data.partition(b'\n')[2]
+    tail = data.splitlines(keepends=True)[-lines:]
+    return b''.join(tail).decode('utf-8', errors='replace'), end
+
+
+def read_from(path, offset, max_bytes):
+    """
+    Complete lines appended since `offset` -> (text, new_offset).
+    A trailing partial line is left for the next call; a truncated/rotated file restarts at 0.
+    If more than max_bytes were appended, only the newest max_bytes are returned.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < offset:
+            offset = 0
+        if size == offset:
+            return "", offset
+
+        skipped = size - offset > max_bytes
+        if skipped:
+            offset = size - max_bytes
+        f.seek(offset)
+        data = f.read(size - offset)
+
+    consumed = data.rfind(b'\n') + 1
+    if consumed == 0:
+        # No complete line yet (a single line longer than max_bytes is passed through as is)
+        if len(data) < max_bytes: return "", offset
+        consumed = len(data)
+    data = data[:consumed]
+    if skipped:
+        data = data.partition(b'\n')[2]
+    return data.decode('utf-8', errors='replace'), offset + consumed
+
+
+class LogFollower:
+    """
+    Streams lines appended to a log file. Every FOLLOW_EDIT_SEC the new bytes (from the last
+    offset, nothing is re-read) are added to a window of the last FOLLOW_LINES lines and
+    on_update(text) is awaited, so the caller edits a single message at a bounded rate.
+    """
+
+    def __init__(self):
+        self.tasks = {}  # key -> asyncio.Task
+
+    def follow(self, key, path, offset, initial_text, on_update, on_end=None):
+        self.stop(key)
+        window = deque(initial_text.splitlines(), maxlen=FOLLOW_LINES)
+        self.tasks[key] = asyncio.ensure_future(self._loop(key, path, offset, window, on_update, on_end))
+
+    def stop(self, key):
+        task = self.tasks.pop(key, None)
+        if task and not task.done():
+            task.cancel()
+            return True
+        return False
+
+    def is_following(self, key):
+        task = self.tasks.get(key)
+        return task is not None and not task.done()
+
+    async def _loop(self, key, path, offset, window, on_update, on_end):
+        deadline = time.monotonic() + FOLLOW_MAX_SEC
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(FOLLOW_EDIT_SEC)
+                text, offset = await run_blocking(read_from, path, offset, FOLLOW_MAX_BYTES)
+                if not text: continue
+                window.extend(text.splitlines())
+                await on_update("\n".join(window))
+        except asyncio.CancelledError:
+            pass  # stop() -> still hand the final window to on_end
+        except Exception as e:
+            logging.error(f"Log Follow Error ({path}): {e}")
+        finally:
+            if self.tasks.get(key) is asyncio.current_task():
+                del self.tasks[key]
+        if on_end:
+            try:
+                await on_end("\n".join(window))
+            except Exception as e:
+                logging.error(f"Log Follow End Error ({path}): {e}")
+
+    def metrics(self):
+        return {'active_follows': len(self.tasks), 'edit_sec': FOLLOW_EDIT_SEC}
+
+
+log_follower = LogFollower()
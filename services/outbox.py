@@ -0,0 +1,234 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from config import settings
+
+# Telegram flood limits: ~30 messages/s overall, ~1/s per private chat, ~20/min per group
+OUTBOX_GLOBAL_PER_SEC = getattr(settings, 'OUTBOX_GLOBAL_PER_SEC', 25)
+OUTBOX_CHAT_INTERVAL_SEC = getattr(settings, 'OUTBOX_CHAT_INTERVAL_SEC', 1.0)
+OUTBOX_GROUP_INTERVAL_SEC = getattr(settings, 'OUTBOX_GROUP_INTERVAL_SEC', 3.0)
+# Completion notices for the same chat arriving within this window go out as one digest
+OUTBOX_DIGEST_SEC = getattr(settings, 'OUTBOX_DIGEST_SEC', 5)
+# Tries per message on network errors (RetryAfter waits don't count)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 3)
+
+TELEGRAM_TEXT_LIMIT = 4000
+
+
+def retry_seconds(error):
+    """RetryAfter.retry_after is an int or a timedelta depending on the PTB version/settings."""
+    wait = error.retry_after
+    return wait.total_seconds() if hasattr(wait, 'total_seconds') else float(wait)
+
+
+class Outgoing:
+    def __init__(self, seq, bot, method, chat_id, kwargs, key=None, on_error=None, future=None):
+        self.seq = seq
+        self.bot = bot
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.key = key  # (chat_id, message_id) for edits, which newer edits replace
+        self.on_error = on_error
+        self.future = future  # only for callers that wait for the result
+        self.attempts = 0
+
+
+class Outbox:
+    """
+    Single way out for bot-initiated messages (notifications, progress edits, file sends).
+    Each chat gets a FIFO sent at most once per OUTBOX_CHAT_INTERVAL_SEC (groups: GROUP_INTERVAL),
+    all chats together stay under OUTBOX_GLOBAL_PER_SEC. While an edit is still queued, a newer
+    edit of the same message replaces its content, and RetryAfter only pauses the affected chat.
+    """
+
+    def __init__(self):
+        self.seq = itertools.count()
+        self.chats = {}  # chat_id -> deque of Outgoing
+        self.edits = {}  # (chat_id, message_id) -> queued Outgoing edit
+        self.next_at = {}  # chat_id -> monotonic time the chat may be written to again
+        self.busy = set()  # chats with a request in flight (keeps each chat in order)
+        self.sent_at = deque()  # global send times of the last second
+        self.digests = {}  # chat_id -> (bot, [lines]) waiting for the digest timer
+        self.wakeup = None
+        self.task = None
+        self.stats = {'sent': 0, 'coalesced': 0, 'digested': 0, 'retry_after': 0, 'failed': 0}
+
+    # ---- Public API ----
+    async def send(self, bot, chat_id, text, **kwargs):
+        """Queues a message and waits until it is sent; returns the Message (errors are raised)."""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(Outgoing(next(self.seq), bot, 'send_message', chat_id, dict(text=text, **kwargs), future=future))
+        return await future
+
+    async def send_document(self, bot, chat_id, document, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(Outgoing(next(self.seq), bot, 'send_document', chat_id,
+                               dict(document=document, **kwargs), future=future))
+        return await future
+
+    def post(self, bot, chat_id, text, on_error=None, **kwargs):
+        """Queues a message without waiting for it (errors go to on_error(e) or the log)."""
+        self._enqueue(Outgoing(next(self.seq), bot, 'send_message', chat_id, dict(text=text, **kwargs),
+                               on_error=on_error))
+
+    def edit(self, bot, chat_id, message_id, text, on_error=None, **kwargs):
+        """
+        Queues an edit without waiting. If an edit of that message is still queued, only its
+        content is replaced. "Message is not modified" is ignored; other errors go to on_error(e).
+        """
+        key = (chat_id, message_id)
+        kwargs = dict(message_id=message_id, text=text, **kwargs)
+        pending = self.edits.get(key)
+        if pending is not None:
+            pending.kwargs, pending.on_error = kwargs, on_error
+            self.stats['coalesced'] += 1
+            return
+        item = Outgoing(next(self.seq), bot, 'edit_message_text', chat_id, kwargs, key=key, on_error=on_error)
+        self.edits[key] = item
+        self._enqueue(item)
+
+    def notice(self, bot, chat_id, text):
+        """Short plain-text notice; notices for a chat within OUTBOX_DIGEST_SEC are merged."""
+        digest = self.digests.get(chat_id)
+        if digest is not None:
+            digest[1].append(text)
+            self.stats['digested'] += 1
+            return
+        self.digests[chat_id] = (bot, [text])
+        asyncio.get_running_loop().call_later(OUTBOX_DIGEST_SEC, self._flush_digest, chat_id)
+
+    async def drain(self, timeout=10):
+        """Sends pending digests and waits (bounded) for the queue to empty, e.g. before shutdown."""
+        for chat_id in list(self.digests):
+            self._flush_digest(chat_id)
+        deadline = time.monotonic() + timeout
+        while (self.chats or self.busy) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    # ---- Internals ----
+    def _flush_digest(self, chat_id):
+        digest = self.digests.pop(chat_id, None)
+        if digest is None: return
+        bot, lines = digest
+        if len(lines) == 1:
+            self.post(bot, chat_id, lines[0])
+            return
+        chunk = f"📬 {len(lines)} updates:"
+        for line in lines:
+            if len(chunk) + len(line) + 1 > TELEGRAM_TEXT_LIMIT:
+                self.post(bot, chat_id, chunk)
+                chunk = ""
+            chunk = f"{chunk}\n{line}" if chunk else line
+        self.post(bot, chat_id, chunk)
+
+    def _enqueue(self, item):
+        self.chats.setdefault(item.chat_id, deque()).append(item)
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.ensure_future(self._loop())
+        self.wakeup.set()
+
+    async def _loop(self):
+        while self.chats or self.busy:
+            self.wakeup.clear()
+            delay = self._dispatch()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        now = time.monotonic()
+        self.next_at = {c: t for c, t in self.next_at.items() if t > now}
+
+    def _dispatch(self):
+        """Starts every send allowed right now; returns seconds until the next one may be (None: wait for a wakeup)."""
+        now = time.monotonic()
+        while self.sent_at and now - self.sent_at[0] >= 1:
+            self.sent_at.popleft()
+        delay = None
+        # Oldest queued message first, so one busy chat cannot starve the others
+        for _, chat_id in sorted((q[0].seq, c) for c, q in self.chats.items() if c not in self.busy):
+            ready_in = self.next_at.get(chat_id, 0) - now
+            if ready_in > 0:
+                delay = ready_in if delay is None else min(delay, ready_in)
+                continue
+            if len(self.sent_at) >= OUTBOX_GLOBAL_PER_SEC:
+                ready_in = 1 - (now - self.sent_at[0])
+                return ready_in if delay is None else min(delay, ready_in)
+            queue = self.chats[chat_id]
+            item = queue.popleft()
+            if not queue: del self.chats[chat_id]
+            if item.key: self.edits.pop(item.key, None)
+            self.busy.add(chat_id)
+            self.sent_at.append(now)
+            asyncio.ensure_future(self._send(item))
+        return delay
+
+    async def _send(self, item):
+        chat_id = item.chat_id
+        interval = OUTBOX_GROUP_INTERVAL_SEC if isinstance(chat_id, int) and chat_id < 0 else OUTBOX_CHAT_INTERVAL_SEC
+        try:
+            result = await getattr(item.bot, item.method)(chat_id=chat_id, **item.kwargs)
+            self.stats['sent'] += 1
+            if item.future and not item.future.done(): item.future.set_result(result)
+        except RetryAfter as e:
+            self.stats['retry_after'] += 1
+            interval = max(interval, retry_seconds(e))
+            logging.warning(f"Outbox: flood control for chat {chat_id}, pausing {interval:.0f}s")
+            self._requeue(item)
+        except BadRequest as e:
+            if "Message is not modified" in str(e):
+                if item.future and not item.future.done(): item.future.set_result(None)
+            else:
+                self._fail(item, e)
+        except NetworkError as e:
+            item.attempts += 1
+            if item.attempts < OUTBOX_MAX_ATTEMPTS:
+                interval = max(interval, 2 ** item.attempts)
+                self._requeue(item)
+            else:
+                self._fail(item, e)
+        except Exception as e:
+            self._fail(item, e)
+        finally:
+            self.next_at[chat_id] = time.monotonic() + interval
+            self.busy.discard(chat_id)
+            self.wakeup.set()
+
+    def _requeue(self, item):
+        """Puts a message back at the head of its chat (dropped if a newer edit replaced it meanwhile)."""
+        if item.key:
+            if item.key in self.edits: return
+            self.edits[item.key] = item
+        self.chats.setdefault(item.chat_id, deque()).appendleft(item)
+
+    def _fail(self, item, error):
+        self.stats['failed'] += 1
+        if item.future:
+            if not item.future.done(): item.future.set_exception(error)
+        elif item.on_error:
+            try:
+                item.on_error(error)
+            except Exception as e:
+                logging.error(f"Outbox Error Callback ({item.chat_id}): {e}")
+        else:
+            logging.error(f"Outbox Send Error ({item.method} to {item.chat_id}): {error}")
+
+    def metrics(self):
+        return {
+            'queued': sum(len(q) for q in self.chats.values()),
+            'chats_waiting': len(self.chats),
+            'in_flight': len(self.busy),
+            'sent': self.stats['sent'],
+            'edits_coalesced': self.stats['coalesced'],
+            'notices_digested': self.stats['digested'],
+            'retry_after': self.stats['retry_after'],
+            'failed': self.stats['failed'],
+            'global_per_sec': OUTBOX_GLOBAL_PER_SEC,
+        }
+
+
+outbox = Outbox()
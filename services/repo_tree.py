@@ -0,0 +1,165 @@
+import sys
+from collections import namedtuple
+from services.search_index import SearchIndex
+
+ROOT_ID = -1
+
+
+class Node:
+    """
+    One folder. Subfolders are child dir ids (their names live on the child node only),
+    jobs/trans are plain interned name strings.
+    """
+    __slots__ = ('name', 'parent', 'subfolders', 'jobs', 'trans')
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.subfolders = []
+        self.jobs = []
+        self.trans = []
+
+
+# What handlers get for one folder: subfolders as (id, name) pairs, jobs/trans as names
+Listing = namedtuple('Listing', 'name parent subfolders jobs trans')
+
+
+def intern_name(name):
+    return sys.intern(name) if name else name
+
+
+class RepoTree:
+    """
+    In-memory folder/job/trans tree built from the repo tables.
+    Rows can be applied in batches, so new objects are added without a full rebuild.
+    """
+
+    def __init__(self):
+        self.nodes = {ROOT_ID: Node("MAIN MENU", None)}
+        self.version = 0
+
+        # Materialized paths: dir_id -> "/a/b" and the reverse lookup
+        self.paths = {ROOT_ID: "/"}
+        self.path_ids = {"/": ROOT_ID}
+
+        # Name search over jobs/trans, kept in sync with the tree
+        self.search = SearchIndex()
+
+        # Watermark per table: (max id, row count) -> used to detect inserts cheaply
+        self.marks = {'dirs': (0, 0), 'jobs': (0, 0), 'trans': (0, 0)}
+        # DB hash of (id, parent/dir, name) over the rows up to the watermarks -> renames / moves
+        self.content = None
+
+    @classmethod
+    def build(cls, dirs, jobs, trans):
+        tree = cls()
+        tree.apply(dirs, jobs, trans)
+        return tree
+
+    def apply(self, dirs=(), jobs=(), trans=()):
+        """Adds rows (id, dir/parent id, name) to the tree and moves the watermarks."""
+        dirs, jobs, trans = list(dirs), list(jobs), list(trans)
+
+        # 1. Create all new folders first, then link them (parents may arrive in the same batch)
+        new_ids = []
+        for d, p, n in dirs:
+            if not n: n = "ROOT"
+            pid = p if p != 0 else ROOT_ID
+            self.nodes[d] = Node(intern_name(n), pid)
+            new_ids.append(d)
+
+        touched = set()
+        for d in new_ids:
+            pid = self.nodes[d].parent
+            if pid in self.nodes:
+                self.nodes[pid].subfolders.append(d)
+                touched.add(pid)
+
+        for d in new_ids:
+            self._materialize_path(d)
+
+        # 2. Populate Jobs / Transformations (unknown folder -> MAIN MENU, not searchable)
+        searchable = []
+        for j, d, n in jobs:
+            target = d if d in self.nodes else ROOT_ID
+            n = intern_name(n)
+            self.nodes[target].jobs.append(n)
+            touched.add(target)
+            if target != ROOT_ID and n: searchable.append((n, target, 'JOB'))
+
+        for t, d, n in trans:
+            target = d if d in self.nodes else ROOT_ID
+            n = intern_name(n)
+            self.nodes[target].trans.append(n)
+            touched.add(target)
+            if target != ROOT_ID and n: searchable.append((n, target, 'TRANS'))
+
+        if searchable: self.search.add_many(searchable)
+
+        # 3. Listings are kept sorted by name (only folders that got new entries are re-sorted)
+        for d in touched:
+            node = self.nodes[d]
+            node.subfolders.sort(key=lambda c: self.nodes[c].name)
+            node.jobs.sort(key=lambda x: x or "")
+            node.trans.sort(key=lambda x: x or "")
+
+        self._advance('dirs', dirs)
+        self._advance('jobs', jobs)
+        self._advance('trans', trans)
+        if dirs or jobs or trans:
+            self.version += 1
+
+    def _materialize_path(self, dir_id):
+        """Computes the path of a folder from its (already known) parent path."""
+        # Walk up until a folder with a known path, then resolve back down
+        chain = []
+        d = dir_id
+        while d not in self.paths and d in self.nodes and d not in chain:
+            chain.append(d)
+            d = self.nodes[d].parent
+
+        for d in reversed(chain):
+            node = self.nodes[d]
+            parent_path = self.paths.get(node.parent, "/")
+            path = "/" + node.name if parent_path == "/" else f"{parent_path}/{node.name}"
+            self.paths[d] = path
+            self.path_ids.setdefault(path, d)
+
+    def listing(self, dir_id):
+        """Contents of a folder, already sorted by name (None if unknown)."""
+        node = self.nodes.get(dir_id)
+        if node is None: return None
+        subfolders = [(c, self.nodes[c].name) for c in node.subfolders]
+        return Listing(node.name, node.parent, subfolders, node.jobs, node.trans)
+
+    def get_path(self, dir_id):
+        return self.paths.get(dir_id, "/")
+
+    def get_dir_id(self, path):
+        """Reverse lookup: "/a/b" -> dir_id (None if unknown)."""
+        path = "/" + path.strip("/") if path else "/"
+        return self.path_ids.get(path)
+
+    def _advance(self, key, rows):
+        if not rows: return
+        max_id, count = self.marks[key]
+        self.marks[key] = (max(max_id, max(r[0] for r in rows)), count + len(rows))
+
+    def watermarks(self):
+        return {k: max_id for k, (max_id, _) in self.marks.items()}
+
+    def is_append_only(self, fingerprint):
+        """
+        True if the DB only gained rows above our watermark (inserts).
+        Deletes change the count without raising max id, renames/moves change the content
+        hash of the rows we already have -> caller must rebuild.
+        """
+        if fingerprint['content'] != self.content: return False
+        for key, (db_max, db_count) in fingerprint['marks'].items():
+            max_id, count = self.marks[key]
+            if db_count < count or db_max < max_id: return False
+            if db_count > count and db_max == max_id: return False
+        return True
+
+    def is_current(self, fingerprint):
+        return fingerprint['content'] == self.content and fingerprint['marks'] == self.marks
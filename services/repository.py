@@ -1,73 +1,180 @@
-import psycopg2
 import logging
-from config.settings import DB_CONF
+import os
+import threading
+import time
+from config import settings
+from services.db import db_pool
+from services.log_tail import read_tail
+from services.repo_tree import RepoTree
+from services.run_summary import RunSummary
+from services.sql_index import SqlUsageIndex
+
+# Name search: results returned per query (the index stops there, so counts above it are "50+")
+SEARCH_LIMIT = getattr(settings, 'SEARCH_LIMIT', 50)
+
+# How often (sec) the tree fingerprint is re-checked against the DB
+TREE_CHECK_SEC = getattr(settings, 'REPO_TREE_CHECK_SEC', 15)
+# How often (sec) names/parents are hashed to catch renames and moves (a full pass over the model tables)
+TREE_VERIFY_SEC = getattr(settings, 'REPO_TREE_VERIFY_SEC', 120)
+
+# SQL usage index: change check interval / forced full reload interval (sec)
+SQL_INDEX_CHECK_SEC = getattr(settings, 'SQL_INDEX_CHECK_SEC', 60)
+SQL_INDEX_FULL_REFRESH_SEC = getattr(settings, 'SQL_INDEX_FULL_REFRESH_SEC', 3600)
+
+# Nightly load summary (DASHBOARD): how often new R_JOB_LOG/R_TRANS_LOG rows are pulled (sec)
+RUN_SUMMARY_CHECK_SEC = getattr(settings, 'RUN_SUMMARY_CHECK_SEC', 30)
+
+# Run history: runs per page and LOG_FIELD characters shown per run
+HISTORY_PAGE_SIZE = getattr(settings, 'HISTORY_PAGE_SIZE', 5)
+HISTORY_LOG_PREFIX = getattr(settings, 'HISTORY_LOG_PREFIX', 50)
+
+# ETL log files read by "Peek Log"
+LOG_DIR = getattr(settings, 'LOG_DIR', "/home/ac/etl_logs")
+LOG_TAIL_LINES = getattr(settings, 'LOG_TAIL_LINES', 20)
+LOG_TAIL_MAX_BYTES = getattr(settings, 'LOG_TAIL_MAX_BYTES', 256 * 1024)
 
 class RepoService:
     def __init__(self):
-        self.cache = {}
+        self.tree = None
+        self.last_check = 0
+        self.last_verify = 0
+        self.lock = threading.Lock()
+
+        # Identifier index over step SQL ("Find Table Usage")
+        self.sql_index = SqlUsageIndex()
+        self.sql_last_check = 0
+        self.sql_last_full = 0
+        self.sql_lock = threading.Lock()
+
+        # Latest status per process over the last 24h (DASHBOARD)
+        self.runs = RunSummary()
+        self.runs_last_check = 0
+        self.runs_lock = threading.Lock()
+
+    def fetch_structure(self, force=False):
+        """
+        Returns the folder/job/trans tree from memory.
+        The DB is only asked for a cheap fingerprint (max id + count per table) every
+        REPO_TREE_CHECK_SEC seconds, plus a content hash every REPO_TREE_VERIFY_SEC;
+        new rows are applied as deltas, anything else rebuilds.
+        """
+        with self.lock:
+            if self.tree and not force and time.time() - self.last_check < TREE_CHECK_SEC:
+                return self.tree.nodes
+            try:
+                with db_pool.connection() as conn:
+                    self._sync_tree(conn.cursor(), force)
+                self.last_check = time.time()
+            except Exception as e:
+                logging.error(f"RepoService Error: {e}")
+            return self.tree.nodes if self.tree else None
+
+    def invalidate(self):
+        """Call after writes to the repo: the next access re-checks the DB immediately."""
+        with self.lock:
+            self.last_check = 0
+            self.last_verify = 0
+
+    def _sync_tree(self, cur, force):
+        # One snapshot for the fingerprint and the rows it describes
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        tree = self.tree
+        verify = force or tree is None or time.time() - self.last_verify >= TREE_VERIFY_SEC
+        fingerprint = self._fingerprint(cur, tree.watermarks() if tree else None, verify)
+        if not verify:
+            # Counts unchanged -> nothing to do until the next hash check
+            if fingerprint['marks'] == tree.marks: return
+            # Rows changed -> hash the known rows too, a delta must not absorb a rename
+            fingerprint = self._fingerprint(cur, tree.watermarks())
+        self.last_verify = time.time()
+
+        if tree and not force and tree.is_current(fingerprint):
+            return
+
+        if tree and not force and tree.is_append_only(fingerprint):
+            # Only new rows -> fetch everything above the watermarks
+            tree.apply(*self._fetch_rows(cur, tree.marks))
+            fingerprint = self._fingerprint(cur, tree.watermarks())
+            if fingerprint['marks'] == tree.marks:
+                tree.content = fingerprint['content']
+                logging.info(f"RepoService: Tree updated incrementally (v{tree.version}).")
+                return
+
+        # Deletes / renames / moves / first load -> full rebuild
+        new_tree = RepoTree.build(*self._fetch_rows(cur))
+        new_tree.content = self._fingerprint(cur, new_tree.watermarks())['content']
+        if tree: new_tree.version = tree.version + 1
+        self.tree = new_tree
+        logging.info(f"RepoService: Tree rebuilt ({len(new_tree.nodes)} folders).")
+
+    def _fingerprint(self, cur, watermarks=None, with_content=True):
+        """
+        (max id, count) per table, plus an order-independent hash of (id, parent/dir, name) over
+        the rows up to the given watermarks -- a rename or move changes it, new rows don't.
+        The hash is one pass over the three model tables (~0.1s at 100k objects), so it is
+        only computed when with_content is set; the log tables are never touched.
+        """
+        watermarks = watermarks or {'dirs': 0, 'jobs': 0, 'trans': 0}
+        content = """(SELECT COALESCE(SUM(('x' || LEFT(md5(CONCAT_WS('/', ID_DIRECTORY, ID_DIRECTORY_PARENT, DIRECTORY_NAME)), 8))::bit(32)::int), 0)
+             FROM R_DIRECTORY WHERE ID_DIRECTORY <= %s)
+          + (SELECT COALESCE(SUM(('x' || LEFT(md5(CONCAT_WS('/', ID_JOB, ID_DIRECTORY, "NAME")), 8))::bit(32)::int), 0)
+             FROM R_JOB WHERE ID_JOB <= %s)
+          + (SELECT COALESCE(SUM(('x' || LEFT(md5(CONCAT_WS('/', ID_TRANSFORMATION, ID_DIRECTORY, "NAME")), 8))::bit(32)::int), 0)
+             FROM R_TRANSFORMATION WHERE ID_TRANSFORMATION <= %s)"""
+        cur.execute(f"""
+        SELECT
+            (SELECT COALESCE(MAX(ID_DIRECTORY), 0) FROM R_DIRECTORY), (SELECT COUNT(*) FROM R_DIRECTORY),
+            (SELECT COALESCE(MAX(ID_JOB), 0) FROM R_JOB), (SELECT COUNT(*) FROM R_JOB),
+            (SELECT COALESCE(MAX(ID_TRANSFORMATION), 0) FROM R_TRANSFORMATION), (SELECT COUNT(*) FROM R_TRANSFORMATION),
+            {content if with_content else "NULL"}
+        """, (watermarks['dirs'], watermarks['jobs'], watermarks['trans']) if with_content else None)
+        r = cur.fetchone()
+        return {'marks': {'dirs': (r[0], r[1]), 'jobs': (r[2], r[3]), 'trans': (r[4], r[5])},
+                'content': int(r[6]) if r[6] is not None else None}
 
-    def get_connection(self):
-        return psycopg2.connect(**DB_CONF)
+    def _fetch_rows(self, cur, marks=None):
+        """Fetches dirs/jobs/trans rows, optionally only those above the given watermarks."""
+        marks = marks or {'dirs': (0, 0), 'jobs': (0, 0), 'trans': (0, 0)}
 
-    def fetch_structure(self):
-        """Scans the DB and builds the folder/job/trans tree."""
-        try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            
-            # 1. Fetch Dirs
-            cur.execute("SELECT ID_DIRECTORY, ID_DIRECTORY_PARENT, DIRECTORY_NAME FROM R_DIRECTORY")
-            dirs = cur.fetchall()
-            
-            # 2. Fetch Jobs (.kjb)
-            cur.execute('SELECT ID_JOB, ID_DIRECTORY, "NAME" FROM R_JOB')
-            jobs = cur.fetchall()
+        # 1. Fetch Dirs
+        cur.execute("SELECT ID_DIRECTORY, ID_DIRECTORY_PARENT, DIRECTORY_NAME FROM R_DIRECTORY WHERE ID_DIRECTORY > %s ORDER BY ID_DIRECTORY", (marks['dirs'][0],))
+        dirs = cur.fetchall()
 
-            # 3. Fetch Transformations (.ktr) - NEW!
-            cur.execute('SELECT ID_TRANSFORMATION, ID_DIRECTORY, "NAME" FROM R_TRANSFORMATION')
-            trans = cur.fetchall()
+        # 2. Fetch Jobs (.kjb)
+        cur.execute('SELECT ID_JOB, ID_DIRECTORY, "NAME" FROM R_JOB WHERE ID_JOB > %s', (marks['jobs'][0],))
+        jobs = cur.fetchall()
 
-            conn.close()
+        # 3. Fetch Transformations (.ktr)
+        cur.execute('SELECT ID_TRANSFORMATION, ID_DIRECTORY, "NAME" FROM R_TRANSFORMATION WHERE ID_TRANSFORMATION > %s', (marks['trans'][0],))
+        trans = cur.fetchall()
 
-            # Build Tree
-            tree = {-1: {"name": "MAIN MENU", "parent": None, "subfolders": [], "jobs": [], "trans": []}}
-            
-            for d, p, n in dirs:
-                if not n: n = "ROOT"
-                pid = p if p != 0 else -1
-                tree[d] = {"name": n, "parent": pid, "subfolders": [], "jobs": [], "trans": []}
-
-            for d, node in tree.items():
-                if d == -1: continue
-                pid = node['parent']
-                if pid in tree: 
-                    tree[pid]["subfolders"].append({"id": d, "name": node['name']})
-                elif pid == 0: 
-                    tree[-1]["subfolders"].append({"id": d, "name": node['name']})
-
-            # Populate Jobs
-            for j, d, n in jobs:
-                target = d if d in tree else -1
-                tree[target]["jobs"].append({"name": n})
-
-            # Populate Transformations
-            for t, d, n in trans:
-                target = d if d in tree else -1
-                tree[target]["trans"].append({"name": n})
-            
-            self.cache = tree
-            return tree
-        except Exception as e:
-            logging.error(f"RepoService Error: {e}")
-            return None
+        return dirs, jobs, trans
 
     def get_full_path(self, dir_id):
-        if not self.cache: self.fetch_structure()
-        dir_id = int(dir_id)
-        if dir_id not in self.cache or dir_id == -1: return "/"
-        node = self.cache[dir_id]
-        if node['parent'] == -1 or node['parent'] is None: return "/" + node['name']
-        return f"{self.get_full_path(node['parent'])}/{node['name']}".replace("//", "/")
+        """O(1) lookup in the precomputed path index."""
+        self.fetch_structure()
+        return self.tree.get_path(int(dir_id)) if self.tree else "/"
+
+    def get_listing(self, dir_id):
+        """Sorted contents of one folder (see RepoTree.listing)."""
+        self.fetch_structure()
+        return self.tree.listing(int(dir_id)) if self.tree else None
+
+    def tree_version(self):
+        """Changes whenever the cached tree changes (used to invalidate rendered pages)."""
+        return self.tree.version if self.tree else None
+
+    def get_dir_id(self, path):
+        """Resolves a repo path ("/a/b") back to its dir_id."""
+        self.fetch_structure()
+        return self.tree.get_dir_id(path) if self.tree else None
+
+    def locate(self, name, is_job=True):
+        """dir_id of a job/trans by exact name (first match), or None."""
+        self.fetch_structure()
+        if not self.tree: return None
+        item_type = 'JOB' if is_job else 'TRANS'
+        return next((d for _, d, t in self.tree.search.find(name) if t == item_type), None)
 
     def get_job_schedule_config(self, job_name):
         """(Existing logic kept same)"""
@@ -79,11 +186,10 @@ class RepoService:
         WHERE rj.name = %s AND rje.name = 'Start'
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (job_name,))
-            rows = cur.fetchall()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (job_name,))
+                rows = cur.fetchall()
             config = {row[0]: (int(row[2]) if row[2] is not None else row[1]) for row in rows}
             sched_type = config.get('schedulerType', 0)
             if sched_type == 1:
@@ -125,11 +231,10 @@ class RepoService:
         ORDER BY rs."NAME"
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (trans_name,))
-            rows = cur.fetchall()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (trans_name,))
+                rows = cur.fetchall()
             
             # Return list of dicts: [{'step': 'Name', 'sql': 'SELECT...'}]
             return [{'step': row[0], 'sql': row[1]} for row in rows]
@@ -137,87 +242,105 @@ class RepoService:
             logging.error(f"SQL Fetch Error: {e}")
             return []            
 
-    def search_repo(self, query):
-        """Scans cache and returns results sorted by relevance (Exact > StartsWith > Contains)."""
-        if not self.cache: self.fetch_structure()
-        
-        q = query.strip().lower()
-        
-        # Buckets for sorting relevance
-        exact_matches = []
-        starts_with_matches = []
-        contains_matches = []
-        
-        # Helper to process items
-        def classify(name, dir_id, item_type):
-            name_lower = name.lower()
-            obj = {'name': name, 'dir_id': dir_id, 'type': item_type}
-            
-            if name_lower == q:
-                exact_matches.append(obj)
-            elif name_lower.startswith(q):
-                starts_with_matches.append(obj)
-            elif q in name_lower:
-                contains_matches.append(obj)
-
-        # Iterate over every folder in the tree
-        for dir_id, node in self.cache.items():
-            if dir_id == -1: continue 
-            
-            for job in node['jobs']:
-                classify(job['name'], dir_id, 'JOB')
-            
-            for trans in node['trans']:
-                classify(trans['name'], dir_id, 'TRANS')
-        
-        # Sort buckets alphabetically to keep them tidy
-        exact_matches.sort(key=lambda x: x['name'])
-        starts_with_matches.sort(key=lambda x: x['name'])
-        contains_matches.sort(key=lambda x: x['name'])
-        
-        # Combine: Exact first, then StartsWith, then loosely matched
-        return exact_matches + starts_with_matches + contains_matches   
+    def search_repo(self, query, limit=SEARCH_LIMIT):
+        """
+        Top-k results from the search index, ranked Exact > StartsWith > Contains
+        (fuzzy suggestions, flagged 'suggestion', only when nothing contains the query).
+        Pass limit + 1 to learn whether more than `limit` names match (handlers.core.limit_matches).
+        """
+        self.fetch_structure()
+        return self.tree.search.search(query, limit) if self.tree else []
 
     # --- NEW: HISTORY FEATURE ---
-    def get_history(self, name, is_job=True):
-        """Fetches last 5 runs using user's specific SQL logic."""
+    def get_history(self, name, is_job=True, before_id=None, limit=None):
+        """
+        One page of runs, newest first (keyset on REPLAYDATE, batch id as tie-breaker).
+        before_id: batch id of the last run of the previous page.
+        Only a LOG_FIELD prefix is read; the full log comes from get_run_log.
+        Returns (runs, next_cursor) -- next_cursor is None on the last page.
+        """
+        limit = limit or HISTORY_PAGE_SIZE
         table_log = "R_JOB_LOG" if is_job else "R_TRANS_LOG"
-        table_main = "R_JOB" if is_job else "R_TRANSFORMATION"
+        col_id = "ID_JOB" if is_job else "ID_BATCH"
         col_name = "JOBNAME" if is_job else "TRANSNAME"
-        col_main_name = "NAME" # Both tables use "NAME"
 
-        # Adapted SQL: We filter by specific name instead of getting all broken ones
+        keyset = ""
+        params = [name]
+        if before_id is not None:
+            keyset = f"""AND (t.REPLAYDATE, t.{col_id}) < (
+                SELECT c.REPLAYDATE, c.{col_id} FROM {table_log} c WHERE c.{col_name} = %s AND c.{col_id} = %s LIMIT 1
+            )"""
+            params += [name, before_id]
+
         sql = f"""
-        SELECT 
-            t.STATUS, 
-            t.REPLAYDATE, 
-            t.LOG_FIELD,
-            COALESCE(main.modified_user, main.created_user, 'NO USER') as EXECUTING_USER
+        SELECT
+            t.{col_id},
+            t.STATUS,
+            t.REPLAYDATE,
+            EXTRACT(EPOCH FROM (t.LOGDATE - t.REPLAYDATE)),
+            t.LINES_READ,
+            t.LINES_WRITTEN,
+            LEFT(t.LOG_FIELD, %s)
         FROM {table_log} t
-        LEFT JOIN {table_main} main ON t.{col_name} = main."{col_main_name}"
-        WHERE t.{col_name} = %s
-        ORDER BY t.REPLAYDATE DESC
-        LIMIT 5
+        WHERE t.{col_name} = %s AND t.REPLAYDATE IS NOT NULL
+        {keyset}
+        ORDER BY t.REPLAYDATE DESC, t.{col_id} DESC
+        LIMIT %s
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (name,))
-            rows = cur.fetchall()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, [HISTORY_LOG_PREFIX] + params + [limit + 1])
+                rows = cur.fetchall()
             
             history = []
-            for row in rows:
+            for row in rows[:limit]:
                 history.append({
-                    'status': row[0],
-                    'date': row[1].strftime('%Y-%m-%d %H:%M') if row[1] else 'Unknown',
-                    'log': str(row[2])[:50] + "..." if row[2] else "",
-                    'user': row[3]
+                    'id': row[0],
+                    'status': row[1],
+                    'date': row[2].strftime('%Y-%m-%d %H:%M') if row[2] else 'Unknown',
+                    'duration': int(row[3]) if row[3] is not None else None,
+                    'read': row[4],
+                    'written': row[5],
+                    'log': row[6] + "..." if row[6] else "",
                 })
-            return history
+            # Rows logged without a batch id can't be a keyset cursor -> the last one that has one
+            ids = [r['id'] for r in history if r['id'] is not None]
+            next_cursor = ids[-1] if len(rows) > limit and ids else None
+            return history, next_cursor
         except Exception as e:
             logging.error(f"History Error: {e}")
-            return []
+            return [], None
+
+    def get_run_owner(self, name, is_job=True):
+        """Last user who saved the job/trans (shown once per history page, not joined per run)."""
+        table_main = "R_JOB" if is_job else "R_TRANSFORMATION"
+        sql = f"""SELECT COALESCE(modified_user, created_user, 'NO USER') FROM {table_main} WHERE "NAME" = %s LIMIT 1"""
+        try:
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (name,))
+                row = cur.fetchone()
+            return row[0] if row else 'NO USER'
+        except Exception as e:
+            logging.error(f"History Owner Error: {e}")
+            return 'NO USER'
+
+    def get_run_log(self, name, run_id, is_job=True):
+        """Full LOG_FIELD of one run (loaded only when asked for)."""
+        table_log = "R_JOB_LOG" if is_job else "R_TRANS_LOG"
+        col_id = "ID_JOB" if is_job else "ID_BATCH"
+        col_name = "JOBNAME" if is_job else "TRANSNAME"
+        sql = f"SELECT LOG_FIELD FROM {table_log} WHERE {col_name} = %s AND {col_id} = %s LIMIT 1"
+        try:
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (name, run_id))
+                row = cur.fetchone()
+            return row[0] if row and row[0] else None
+        except Exception as e:
+            logging.error(f"Run Log Error: {e}")
+            return None
 
     def backup_and_update_sql(self, trans_name, step_name, new_sql, user_id):
         """
@@ -226,104 +349,92 @@ class RepoService:
         3. Updates R_STEP_ATTRIBUTE with new SQL.
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-
-            # 1. Find the Attribute ID and Current Value
-            find_sql = """
-            SELECT rsa.ID_STEP_ATTRIBUTE, rsa.VALUE_STR
-            FROM R_STEP rs
-            JOIN R_TRANSFORMATION rt ON rs.ID_TRANSFORMATION = rt.ID_TRANSFORMATION
-            JOIN R_STEP_ATTRIBUTE rsa ON rs.ID_STEP = rsa.ID_STEP
-            WHERE rt."NAME" = %s AND rs."NAME" = %s AND rsa.CODE = 'sql'
-            """
-            cur.execute(find_sql, (trans_name, step_name))
-            row = cur.fetchone()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+
+                # 1. Find the Attribute ID and Current Value
+                find_sql = """
+                SELECT rsa.ID_STEP_ATTRIBUTE, rsa.VALUE_STR
+                FROM R_STEP rs
+                JOIN R_TRANSFORMATION rt ON rs.ID_TRANSFORMATION = rt.ID_TRANSFORMATION
+                JOIN R_STEP_ATTRIBUTE rsa ON rs.ID_STEP = rsa.ID_STEP
+                WHERE rt."NAME" = %s AND rs."NAME" = %s AND rsa.CODE = 'sql'
+                """
+                cur.execute(find_sql, (trans_name, step_name))
+                row = cur.fetchone()
             
-            if not row:
-                conn.rollback()
-                return False, "Step not found or no SQL attribute."
+                if not row:
+                    conn.rollback()
+                    return False, "Step not found or no SQL attribute."
 
-            attr_id, old_sql = row
+                attr_id, old_sql = row
 
-            # 2. Insert into History (Versioning)
-            hist_sql = """
-            INSERT INTO BOT_SQL_HISTORY (TRANS_NAME, STEP_NAME, OLD_SQL, CHANGED_BY)
-            VALUES (%s, %s, %s, %s)
-            """
-            cur.execute(hist_sql, (trans_name, step_name, old_sql, str(user_id)))
+                # 2. Insert into History (Versioning)
+                hist_sql = """
+                INSERT INTO BOT_SQL_HISTORY (TRANS_NAME, STEP_NAME, OLD_SQL, CHANGED_BY)
+                VALUES (%s, %s, %s, %s)
+                """
+                cur.execute(hist_sql, (trans_name, step_name, old_sql, str(user_id)))
 
-            # 3. Update Live Repo
-            update_sql = "UPDATE R_STEP_ATTRIBUTE SET VALUE_STR = %s WHERE ID_STEP_ATTRIBUTE = %s"
-            cur.execute(update_sql, (new_sql, attr_id))
+                # 3. Update Live Repo
+                update_sql = "UPDATE R_STEP_ATTRIBUTE SET VALUE_STR = %s WHERE ID_STEP_ATTRIBUTE = %s"
+                cur.execute(update_sql, (new_sql, attr_id))
 
-            conn.commit()
-            conn.close()
+                conn.commit()
+
+            self.invalidate()
+            with self.sql_lock:
+                self.sql_index.update(attr_id, new_sql)
             return True, "Success"
 
         except Exception as e:
             logging.error(f"Update SQL Error: {e}")
-            if conn: conn.rollback()
             return False, str(e)
 
     # ... inside RepoService ...
 
     def get_broken_processes(self):
         """
-        1. Counts TOTAL unique processes run in last 24h.
-        2. Lists specific processes that failed in their latest run.
+        Nightly load summary from the in-memory RunSummary:
+        1. TOTAL unique processes run in the last 24h.
+        2. Processes that failed in their latest run.
+        Only log rows written since the last refresh are read (LOGDATE watermark).
         """
-        sql_failures = """
-        WITH TRANS_LOGS AS (
-            SELECT TRANSNAME, STATUS, REPLAYDATE,
-                   ROW_NUMBER() OVER(PARTITION BY TRANSNAME ORDER BY REPLAYDATE DESC) as rn
-            FROM R_TRANS_LOG
-            WHERE REPLAYDATE >= CURRENT_DATE - INTERVAL '24 HOURS'
-        ),
-        JOB_LOGS AS (
-            SELECT JOBNAME, STATUS, REPLAYDATE,
-                   ROW_NUMBER() OVER(PARTITION BY JOBNAME ORDER BY REPLAYDATE DESC) as rn
-            FROM R_JOB_LOG
-            WHERE REPLAYDATE >= CURRENT_DATE - INTERVAL '24 HOURS'
-        )
-        -- Get Failures
-        SELECT 'Transformation' as type, TRANSNAME, STATUS, TO_CHAR(REPLAYDATE, 'HH24:MI')
-        FROM TRANS_LOGS WHERE rn = 1 AND STATUS != 'end'
+        with self.runs_lock:
+            if self.runs.now is None or time.time() - self.runs_last_check >= RUN_SUMMARY_CHECK_SEC:
+                try:
+                    with db_pool.connection() as conn:
+                        self._refresh_runs(conn.cursor())
+                    self.runs_last_check = time.time()
+                except Exception as e:
+                    logging.error(f"Broken Process Fetch Error: {e}")
+                    if self.runs.now is None: return None
+            return self.runs.report
+
+    def _refresh_runs(self, cur):
+        cur.execute("SELECT LOCALTIMESTAMP")
+        now = cur.fetchone()[0]
+
+        if self.runs.watermark is None:
+            # First load: everything started inside the window
+            where, params = "REPLAYDATE >= %s", (now - self.runs.window,)
+        else:
+            # Rows inserted or updated since the last refresh (>= : same-timestamp rows are re-applied).
+            # Same as COALESCE(LOGDATE, REPLAYDATE) >= watermark, but can use indexes on both columns
+            where = "(LOGDATE >= %s OR (LOGDATE IS NULL AND REPLAYDATE >= %s))"
+            params = (self.runs.watermark, self.runs.watermark)
+
+        cur.execute(f"""
+        SELECT 'Transformation', TRANSNAME, STATUS, REPLAYDATE, COALESCE(LOGDATE, REPLAYDATE)
+        FROM R_TRANS_LOG WHERE {where}
         UNION ALL
-        SELECT 'Job', JOBNAME, STATUS, TO_CHAR(REPLAYDATE, 'HH24:MI')
-        FROM JOB_LOGS WHERE rn = 1 AND STATUS != 'end'
-        ORDER BY 4 DESC
-        """
-
-        sql_total_count = """
-        SELECT 
-            (SELECT COUNT(DISTINCT TRANSNAME) FROM R_TRANS_LOG WHERE REPLAYDATE >= CURRENT_DATE - INTERVAL '24 HOURS') 
-            + 
-            (SELECT COUNT(DISTINCT JOBNAME) FROM R_JOB_LOG WHERE REPLAYDATE >= CURRENT_DATE - INTERVAL '24 HOURS')
-        """
-
-        try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            
-            # 1. Get List of Failures
-            cur.execute(sql_failures)
-            rows = cur.fetchall()
-            failures = [{'type': r[0], 'name': r[1], 'status': r[2], 'time': r[3]} for r in rows]
-            
-            # 2. Get Total Count
-            cur.execute(sql_total_count)
-            total_runs = cur.fetchone()[0] or 0
-            
-            conn.close()
-            
-            return {
-                'total_runs': total_runs,
-                'failures': failures
-            }
-        except Exception as e:
-            logging.error(f"Broken Process Fetch Error: {e}")
-            return None
+        SELECT 'Job', JOBNAME, STATUS, REPLAYDATE, COALESCE(LOGDATE, REPLAYDATE)
+        FROM R_JOB_LOG WHERE {where}
+        """, params * 2)
+        self.runs.apply(cur.fetchall(), now)
+        if self.runs.watermark is None:
+            # Empty window -> start watching from the DB clock
+            self.runs.watermark = now
 
     def get_sql_history_list(self, trans_name, step_name):
         """Fetches the last 10 versions of this step's SQL."""
@@ -335,11 +446,10 @@ class RepoService:
         LIMIT 10
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (trans_name, step_name))
-            rows = cur.fetchall()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (trans_name, step_name))
+                rows = cur.fetchall()
             
             history = []
             for row in rows:
@@ -358,11 +468,10 @@ class RepoService:
         """Fetches a specific archived SQL body."""
         sql = "SELECT OLD_SQL FROM BOT_SQL_HISTORY WHERE ID = %s"
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute(sql, (history_id,))
-            row = cur.fetchone()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(sql, (history_id,))
+                row = cur.fetchone()
             return row[0] if row else None
         except:
             return None            
@@ -383,9 +492,16 @@ class RepoService:
 
     def find_sql_usage(self, search_term):
         """
-        Scans all Table Input steps to find where a specific table/column is used.
-        Case-insensitive search inside the raw SQL code.
+        Finds every step whose SQL uses a specific table/column.
+        Identifier-like terms are answered from the local index; anything else (spaces,
+        operators, ...) falls back to a case-insensitive scan of the raw SQL in the DB.
         """
+        if SqlUsageIndex.can_answer(search_term):
+            self.refresh_sql_index()
+            with self.sql_lock:
+                if len(self.sql_index):
+                    return self.sql_index.search(search_term)
+
         sql = """
         SELECT DISTINCT 
             rt.ID_DIRECTORY,
@@ -400,47 +516,92 @@ class RepoService:
             rsa.CODE = 'sql' 
             AND rsa.VALUE_STR ILIKE %s
         ORDER BY 
-            rt."NAME"
-        LIMIT 40;
+            rt."NAME", rs."NAME"
         """
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            # Wrap search term in % % for wildcard match
-            cur.execute(sql, (f"%{search_term}%",))
-            rows = cur.fetchall()
-            conn.close()
+            with db_pool.connection() as conn:
+                cur = conn.cursor()
+                # Wrap search term in % % for wildcard match
+                cur.execute(sql, (f"%{search_term}%",))
+                rows = cur.fetchall()
             
             # Format results to be compatible with your existing 'search_results' keyboard
-            results = []
-            for row in rows:
-                results.append({
-                    'dir_id': row[0], 
-                    'name': row[1], 
-                    'type': row[2]
-                    # We don't need 'step_name' for the main list, but good to have if you expand later
-                })
-            return results
+            return [{'dir_id': r[0], 'name': r[1], 'type': r[2], 'step': r[3]} for r in rows]
         except Exception as e:
             logging.error(f"Usage Search Error: {e}")
             return []             
 
+    def refresh_sql_index(self, force=False):
+        """
+        Keeps the identifier index of all step SQL in sync with the repo.
+        New attribute ids -> only those rows are read. A changed hash of R_TRANSFORMATION
+        (id, dir, name) -> names/folders are fixed and deleted transformations dropped in place.
+        Fewer steps without new ids or SQL_INDEX_FULL_REFRESH_SEC passed -> full reload.
+        """
+        with self.sql_lock:
+            now = time.time()
+            if not force and now - self.sql_last_check < SQL_INDEX_CHECK_SEC: return
+            if now - self.sql_last_full > SQL_INDEX_FULL_REFRESH_SEC: force = True
+
+            sql_rows = """
+            SELECT rsa.ID_STEP_ATTRIBUTE, rt.ID_TRANSFORMATION, rt.ID_DIRECTORY, rt."NAME", rs."NAME", rsa.VALUE_STR
+            FROM R_STEP_ATTRIBUTE rsa
+            JOIN R_STEP rs ON rs.ID_STEP = rsa.ID_STEP
+            JOIN R_TRANSFORMATION rt ON rt.ID_TRANSFORMATION = rs.ID_TRANSFORMATION
+            WHERE rsa.CODE = 'sql' AND rsa.ID_STEP_ATTRIBUTE > %s
+            """
+            try:
+                with db_pool.connection() as conn:
+                    cur = conn.cursor()
+                    # One snapshot for the counts, the hash and the rows read below
+                    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cur.execute("""
+                    SELECT (SELECT COALESCE(MAX(ID_STEP_ATTRIBUTE), 0) FROM R_STEP_ATTRIBUTE), (SELECT COUNT(*) FROM R_STEP),
+                           (SELECT COALESCE(SUM(('x' || LEFT(md5(CONCAT_WS('/', ID_TRANSFORMATION, ID_DIRECTORY, "NAME")), 8))::bit(32)::int), 0)
+                            FROM R_TRANSFORMATION)
+                    """)
+                    max_id, step_count, trans_hash = cur.fetchone()
+
+                    index = self.sql_index
+                    if force or step_count < index.step_count and max_id <= index.max_id:
+                        index = SqlUsageIndex()
+                    elif max_id <= index.max_id and step_count == index.step_count and trans_hash == index.trans_hash:
+                        self.sql_last_check = now
+                        return
+
+                    if index is self.sql_index and index.trans_hash is not None and trans_hash != index.trans_hash:
+                        cur.execute('SELECT ID_TRANSFORMATION, ID_DIRECTORY, "NAME" FROM R_TRANSFORMATION')
+                        index.sync_transformations(cur.fetchall())
+                    cur.execute(sql_rows, (index.max_id,))
+                    index.load(cur.fetchall())
+                    index.step_count = step_count
+                    index.trans_hash = trans_hash
+
+                if index is not self.sql_index:
+                    self.sql_last_full = now
+                    logging.info(f"RepoService: SQL index rebuilt ({len(index)} steps).")
+                self.sql_index = index
+                self.sql_last_check = now
+            except Exception as e:
+                logging.error(f"SQL Index Error: {e}")
+
     # Add to RepoService class
-    def get_log_tail(self, name, lines=20):
-        """Reads the last N lines of a log file without loading the whole thing."""
-        # Assuming logs are stored in /home/ac/etl_logs/ or similar
-        # You might need to adjust the path logic to match where your jobs write logs
-        log_path = f"/home/ac/etl_logs/{name}.log" 
-        
+    def get_log_path(self, name):
+        # Jobs write their logs to LOG_DIR/<name>.log
+        return os.path.join(LOG_DIR, f"{name}.log")
+
+    def get_log_tail(self, name, lines=None, with_offset=False):
+        """
+        Reads the last N lines of a log file by seeking from the end (at most LOG_TAIL_MAX_BYTES).
+        with_offset=True also returns the end offset to follow the file from.
+        """
+        lines = lines or LOG_TAIL_LINES
         try:
-            from collections import deque
-            with open(log_path, 'r') as f:
-                # deque(f, 20) efficiently grabs the last 20 lines
-                tail = deque(f, lines) 
-                return "".join(tail)
+            text, offset = read_tail(self.get_log_path(name), lines, LOG_TAIL_MAX_BYTES)
         except FileNotFoundError:
-            return "⚠️ Log file not found."
+            text, offset = "⚠️ Log file not found.", None
         except Exception as e:
-            return f"Error reading log: {e}"
+            text, offset = f"Error reading log: {e}", None
+        return (text, offset) if with_offset else text
 
 repo_service = RepoService()
\ No newline at end of file
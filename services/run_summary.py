@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+# Latest-run statuses that mean the run ended badly (others: 'start'/'running' = still going, 'end' = ok)
+FAILED_STATUSES = ('stop', 'error')
+
+
+class RunSummary:
+    """
+    Latest status of every job/trans run in a rolling window, maintained from new log rows only.
+    Rows are (type, name, status, replaydate, logdate); LOGDATE moves on every log update, so it
+    is the watermark (a run inserted as 'start' and later updated to 'end' is seen again).
+    """
+
+    def __init__(self, window_hours=24):
+        self.window = timedelta(hours=window_hours)
+        self.latest = {}      # (type, name) -> (replaydate, status)
+        self.watermark = None # max LOGDATE applied
+        self.now = None       # DB clock at the last refresh
+        self.rows_applied = 0
+        self.report = {'total_runs': 0, 'failures': []}
+
+    def apply(self, rows, now):
+        for p_type, name, status, replaydate, logdate in rows:
+            if replaydate is None: continue
+            key = (p_type, name)
+            current = self.latest.get(key)
+            # Same run updated (start -> end) or a newer run
+            if current is None or replaydate >= current[0]:
+                self.latest[key] = (replaydate, status)
+            if logdate and (self.watermark is None or logdate > self.watermark):
+                self.watermark = logdate
+            self.rows_applied += 1
+
+        self.now = now
+        self._prune()
+        self._build_report()
+
+    def _prune(self):
+        cutoff = self.now - self.window
+        for key in [k for k, (replaydate, _) in self.latest.items() if replaydate < cutoff]:
+            del self.latest[key]
+
+    def _build_report(self):
+        failures = [
+            {'type': p_type, 'name': name, 'status': status, 'time': replaydate.strftime('%H:%M'), 'at': replaydate}
+            for (p_type, name), (replaydate, status) in self.latest.items() if status != 'end'
+        ]
+        failures.sort(key=lambda f: f['at'], reverse=True)
+        self.report = {'total_runs': len(self.latest), 'failures': failures}
+
+    def metrics(self):
+        return {
+            'processes_24h': len(self.latest),
+            'failures': len(self.report['failures']),
+            'rows_applied': self.rows_applied,
+            'watermark': self.watermark.strftime('%Y-%m-%d %H:%M:%S') if self.watermark else None,
+        }
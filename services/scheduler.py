@@ -1,29 +1,69 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+from config import settings
+from services.executor import run_blocking
+import asyncio
+import inspect
 import logging
 
+# Scheduled fires running at the same time (the rest wait on the bot loop, no extra threads)
+SCHED_MAX_CONCURRENT = getattr(settings, 'SCHED_MAX_CONCURRENT', 4)
+# Overlapping fires allowed per job (a fire while it is still running is skipped)
+SCHED_MAX_INSTANCES = getattr(settings, 'SCHED_MAX_INSTANCES', 1)
+
 class SchedulerService:
     def __init__(self):
-        self.scheduler = AsyncIOScheduler()
+        # Coroutine jobs run directly on the bot loop; missed fires collapse into one run
+        self.scheduler = AsyncIOScheduler(job_defaults={
+            'coalesce': True,
+            'max_instances': SCHED_MAX_INSTANCES,
+            'misfire_grace_time': 60,  # If bot is down for <60s, run job on restart
+        })
+        self.scheduler.add_listener(self._on_skipped, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+        self.slots = asyncio.Semaphore(SCHED_MAX_CONCURRENT)
+        self.stats = {'fired': 0, 'running': 0, 'waiting': 0, 'missed': 0, 'overlap_skipped': 0}
     
     def start(self):
         if not self.scheduler.running:
             self.scheduler.start()
             logging.info("SchedulerService: Started.")
 
+    async def _run_limited(self, func, *args):
+        """Runs one fire under the global concurrency cap (blocking callables go to the IO pool)."""
+        self.stats['fired'] += 1
+        self.stats['waiting'] += 1
+        async with self.slots:
+            self.stats['waiting'] -= 1
+            self.stats['running'] += 1
+            try:
+                if inspect.iscoroutinefunction(func):
+                    await func(*args)
+                else:
+                    await run_blocking(func, *args)
+            finally:
+                self.stats['running'] -= 1
+
+    def _on_skipped(self, event):
+        if event.code == EVENT_JOB_MISSED:
+            self.stats['missed'] += 1
+            logging.warning(f"SchedulerService: Missed fire of {event.job_id}.")
+        else:
+            self.stats['overlap_skipped'] += 1
+            logging.warning(f"SchedulerService: {event.job_id} still running, fire skipped.")
+
     # --- BASIC CRUD ---
     def add_job(self, func, trigger, args, job_id, meta=None):
         """
         Adds a job with metadata (like dir_id) so we can link back to the menu.
         """
         self.scheduler.add_job(
-            func, 
+            self._run_limited, 
             trigger, 
-            args=args, 
+            args=[func] + list(args), 
             id=job_id, 
-            replace_existing=True,
-            misfire_grace_time=60  # If bot is down for <60s, run job on restart
+            replace_existing=True
         )
 
     def remove_job(self, job_id):
@@ -70,5 +110,9 @@ class SchedulerService:
             return True
         except: return False
 
+    def metrics(self):
+        return {**self.stats, 'max_concurrent': SCHED_MAX_CONCURRENT, 'max_instances': SCHED_MAX_INSTANCES,
+                'scheduled': len(self.scheduler.get_jobs())}
+
 # Singleton
 scheduler_service = SchedulerService()
@@ -0,0 +1,138 @@
+import bisect
+import heapq
+import sys
+from array import array
+from collections import defaultdict
+
+# Share of the query trigrams a name must contain to count as a fuzzy match
+FUZZY_MIN_SCORE = 0.6
+
+TYPES = ('JOB', 'TRANS')
+TYPE_CODES = {t: i for i, t in enumerate(TYPES)}
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Name index over jobs and transformations.
+    - Entry ids ordered by lowercased name -> exact and starts-with matches via bisect.
+    - Trigram postings -> contains matches (and fuzzy suggestions) without scanning every name.
+    Entries are only ever added; removals are handled by rebuilding the tree.
+    Kept compact for large repos: per-entry columns and postings are arrays of machine ints
+    (no tuple / int object per entry), and the lowercased names are interned.
+    """
+
+    def __init__(self):
+        self.names = []             # entry_id -> name (interned by the tree)
+        self.lowers = []            # entry_id -> interned lowercased name
+        self.dir_ids = array('q')   # entry_id -> dir_id
+        self.types = bytearray()    # entry_id -> index into TYPES
+        self.order = array('i')     # entry ids sorted by lowercased name (ties: insertion order)
+        self.grams = {}             # trigram -> array('i') of entry ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def entry(self, entry_id):
+        return self.names[entry_id], self.dir_ids[entry_id], TYPES[self.types[entry_id]]
+
+    def add_many(self, items):
+        """Indexes (name, dir_id, type) tuples."""
+        first = len(self.names)
+        new_grams = defaultdict(list)
+        for name, dir_id, item_type in items:
+            entry_id = len(self.names)
+            lower = sys.intern(name.lower())
+            self.names.append(name)
+            self.lowers.append(lower)
+            self.dir_ids.append(dir_id)
+            self.types.append(TYPE_CODES[item_type])
+            for g in trigrams(lower):
+                new_grams[g].append(entry_id)
+        # Collected as lists first, appended to the arrays once per trigram
+        for g, ids in new_grams.items():
+            postings = self.grams.get(g)
+            if postings is None:
+                self.grams[g] = array('i', ids)
+            else:
+                postings.extend(ids)
+
+        # Bulk load -> one (stable) sort; small deltas -> insort keeps it ordered
+        added = range(first, len(self.names))
+        if len(added) > len(self.order) // 8:
+            self.order = array('i', sorted(list(self.order) + list(added), key=self.lowers.__getitem__))
+        else:
+            for e in added:
+                bisect.insort(self.order, e, key=self.lowers.__getitem__)
+
+    def _first(self, lower):
+        """Position in `order` of the first entry whose name is >= lower."""
+        return bisect.bisect_left(self.order, lower, key=self.lowers.__getitem__)
+
+    def search(self, query, limit=50):
+        """
+        Returns up to `limit` results ranked Exact > StartsWith > Contains.
+        Only if nothing contains the query: fuzzy suggestions instead, flagged 'suggestion': True.
+        """
+        q = query.strip().lower()
+        if not q: return []
+        lowers = self.lowers
+
+        # 1. Exact + StartsWith: one contiguous range of the sorted order
+        exact, starts = [], []
+        i = self._first(q)
+        while i < len(self.order) and len(exact) + len(starts) < limit:
+            entry_id = self.order[i]
+            lower = lowers[entry_id]
+            if not lower.startswith(q): break
+            (exact if lower == q else starts).append(entry_id)
+            i += 1
+        ranked = exact + starts
+        seen = set(ranked)
+
+        # 2. Contains: candidates from trigram postings (short queries -> scan names)
+        if len(ranked) < limit:
+            if len(q) < 3:
+                candidates = range(len(self.names))
+            else:
+                candidates = self._candidates(q)
+            contains = [e for e in candidates if e not in seen and q in lowers[e]]
+            contains = heapq.nsmallest(
+                limit - len(ranked), contains,
+                key=lambda e: (lowers[e].find(q), len(lowers[e]), self.names[e], e)
+            )
+            ranked += contains
+
+        if ranked or len(q) < 4:
+            return [{'name': n, 'dir_id': d, 'type': t} for n, d, t in (self.entry(e) for e in ranked)]
+
+        # 3. Fuzzy: names sharing most of the query trigrams (typos, swapped words)
+        q_grams = trigrams(q)
+        hits = {}
+        for g in q_grams:
+            for e in self.grams.get(g, ()):
+                hits[e] = hits.get(e, 0) + 1
+        min_hits = max(2, len(q_grams) * FUZZY_MIN_SCORE)
+        fuzzy = heapq.nsmallest(
+            limit, [e for e, n in hits.items() if n >= min_hits],
+            key=lambda e: (-hits[e], len(lowers[e]), self.names[e], e)
+        )
+        return [{'name': n, 'dir_id': d, 'type': t, 'suggestion': True} for n, d, t in (self.entry(e) for e in fuzzy)]
+
+    def find(self, name):
+        """Entries named exactly `name` -> [(name, dir_id, type)]."""
+        lower = name.lower()
+        found = []
+        i = self._first(lower)
+        while i < len(self.order) and self.lowers[self.order[i]] == lower:
+            entry_id = self.order[i]
+            if self.names[entry_id] == name: found.append(self.entry(entry_id))
+            i += 1
+        return found
+
+    def _candidates(self, q):
+        """Entries that may contain q: the shortest posting list of its trigrams (callers check q itself)."""
+        return min((self.grams.get(g, ()) for g in trigrams(q)), key=len)
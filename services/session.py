@@ -0,0 +1,186 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import settings
+from services.executor import run_blocking
+
+# Conversation state per user (search mode, pending SQL edit, ...): idle expiry and size cap
+SESSION_TTL_SEC = getattr(settings, 'SESSION_TTL_SEC', 1800)
+SESSION_MAX_ENTRIES = getattr(settings, 'SESSION_MAX_ENTRIES', 1000)
+# Set to a file path to keep sessions in SQLite (survive restarts, shared by several bot processes)
+SESSION_DB_PATH = getattr(settings, 'SESSION_DB_PATH', None)
+
+
+class MemorySessionBackend:
+    """OrderedDict in LRU order: key -> (expires_at, value)."""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None: return None
+            if entry[0] <= now:
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at, max_entries):
+        """Stores the value; returns how many entries were evicted to stay under max_entries."""
+        with self.lock:
+            self.data[key] = (expires_at, value)
+            self.data.move_to_end(key)
+            evicted = 0
+            while len(self.data) > max_entries:
+                self.data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def purge(self, now):
+        with self.lock:
+            expired = [k for k, (exp, _) in self.data.items() if exp <= now]
+            for k in expired:
+                del self.data[k]
+            return len(expired)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class SqliteSessionBackend:
+    """Same contract, stored in a SQLite file (values as JSON, LRU by last access)."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, touched_at REAL NOT NULL
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_touched ON sessions (touched_at)")
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires_at FROM sessions WHERE key = ?", (str(key),)).fetchone()
+            if row is None: return None
+            if row[1] <= now:
+                self.conn.execute("DELETE FROM sessions WHERE key = ?", (str(key),))
+                return None
+            self.conn.execute("UPDATE sessions SET touched_at = ? WHERE key = ?", (now, str(key)))
+            return row[1], json.loads(row[0])
+
+    def set(self, key, value, expires_at, max_entries):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, value, expires_at, touched_at) VALUES (?, ?, ?, ?)",
+                (str(key), json.dumps(value), expires_at, time.time()))
+            cur = self.conn.execute("""
+            DELETE FROM sessions WHERE key IN (
+                SELECT key FROM sessions ORDER BY touched_at DESC LIMIT -1 OFFSET ?
+            )""", (max_entries,))
+            return cur.rowcount
+
+    def delete(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE key = ?", (str(key),))
+
+    def purge(self, now):
+        with self.lock:
+            return self.conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionStore:
+    """
+    Dict-like user state with an idle TTL (refreshed on every write), LRU eviction and a size cap.
+        store[user_id] = {...}     # set (None deletes)
+        store.get(user_id)         # None if missing or expired
+    From the event loop use `await store.aget(...)` / `await store.aset(...)`: with the SQLite
+    backend they run on the I/O pool, so a slow or locked session file never blocks the bot.
+    """
+
+    def __init__(self, ttl=SESSION_TTL_SEC, max_entries=SESSION_MAX_ENTRIES, db_path=SESSION_DB_PATH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = None
+        if db_path:
+            try:
+                self.backend = SqliteSessionBackend(db_path)
+            except Exception as e:
+                logging.error(f"Session Store: SQLite unavailable ({e}), keeping sessions in memory.")
+        if self.backend is None:
+            self.backend = MemorySessionBackend()
+        self.blocking = isinstance(self.backend, SqliteSessionBackend)
+        self.stats = {'expired': 0, 'evicted': 0}
+        self.last_purge = time.time()
+
+    def get(self, key, default=None):
+        now = time.time()
+        entry = self.backend.get(key, now)
+        if entry is None: return default
+        return entry[1]
+
+    async def aget(self, key, default=None):
+        if self.blocking: return await run_blocking(self.get, key, default)
+        return self.get(key, default)
+
+    async def aset(self, key, value):
+        """store[key] = value (None deletes)."""
+        if self.blocking:
+            await run_blocking(self.__setitem__, key, value)
+        else:
+            self[key] = value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None: raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if value is None:
+            self.backend.delete(key)
+            return
+        now = time.time()
+        self.stats['evicted'] += self.backend.set(key, value, now + self.ttl, self.max_entries)
+        # Sweep expired sessions now and then (lookups also drop them lazily)
+        if now - self.last_purge > self.ttl / 4:
+            self.last_purge = now
+            self.stats['expired'] += self.backend.purge(now)
+
+    def __delitem__(self, key):
+        self.backend.delete(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        self.backend.delete(key)
+        return value
+
+    def __len__(self):
+        return len(self.backend)
+
+    def metrics(self):
+        return {
+            'sessions': len(self),
+            'max_entries': self.max_entries,
+            'ttl_sec': self.ttl,
+            'expired': self.stats['expired'],
+            'evicted': self.stats['evicted'],
+            'backend': 'sqlite' if self.blocking else 'memory',
+        }
@@ -0,0 +1,138 @@
+import re
+from collections import defaultdict
+
+# schema.table.column chains, optionally "quoted"
+IDENT_CHAIN = re.compile(r'"?[A-Za-z_][\w$#]*"?(?:\s*\.\s*"?[A-Za-z_][\w$#]*"?)*')
+
+# Plain identifier (what we can answer from the index without going to the DB)
+IDENT_TERM = re.compile(r'^[\w$#."]+$')
+
+# Too common to be useful as table/column names
+SQL_KEYWORDS = {
+    'select', 'from', 'where', 'and', 'or', 'not', 'in', 'is', 'null', 'as', 'on', 'join', 'left',
+    'right', 'inner', 'outer', 'full', 'cross', 'group', 'by', 'order', 'having', 'union', 'all',
+    'distinct', 'case', 'when', 'then', 'else', 'end', 'with', 'between', 'like', 'asc', 'desc',
+    'limit', 'offset', 'over', 'partition', 'exists', 'cast', 'coalesce', 'nvl', 'sum', 'count',
+    'min', 'max', 'avg', 'to_char', 'to_date', 'date', 'current_date', 'interval', 'true', 'false',
+}
+
+
+def extract_identifiers(sql):
+    """
+    Returns the lowercased identifiers of a SQL body.
+    "DWH.Loans.AMOUNT" yields dwh.loans.amount, dwh.loans, loans.amount, dwh, loans and amount.
+    """
+    found = set()
+    for m in IDENT_CHAIN.finditer(sql or ""):
+        parts = [p.strip().strip('"').lower() for p in m.group(0).split('.')]
+        for i in range(len(parts)):
+            for j in range(i + 1, len(parts) + 1):
+                found.add(".".join(parts[i:j]))
+    return found - SQL_KEYWORDS
+
+
+class SqlUsageIndex:
+    """
+    Inverted index: identifier -> SQL attributes (steps) that mention it.
+    Only identifiers are kept in memory, not the SQL bodies.
+    """
+
+    def __init__(self):
+        self.steps = {}                   # attr_id -> (trans_id, dir_id, trans_name, step_name, identifiers)
+        self.by_trans = defaultdict(set)  # trans_id -> attr_ids
+        self.postings = defaultdict(set)  # identifier -> attr_ids
+        self.max_id = 0
+        self.step_count = 0
+        self.trans_hash = None            # DB hash of (id, dir, name) of R_TRANSFORMATION when last synced
+
+    def __len__(self):
+        return len(self.steps)
+
+    def load(self, rows):
+        """
+        Adds rows (attr_id, trans_id, dir_id, trans_name, step_name, sql).
+        A saved transformation is re-inserted with new ids, so its old steps are dropped first.
+        """
+        rows = list(rows)
+        for trans_id in {r[1] for r in rows}:
+            for attr_id in list(self.by_trans.get(trans_id, ())):
+                self.remove(attr_id)
+
+        for attr_id, trans_id, dir_id, trans_name, step_name, sql in rows:
+            self._add(attr_id, trans_id, dir_id, trans_name, step_name, extract_identifiers(sql))
+            self.max_id = max(self.max_id, attr_id)
+
+    def sync_transformations(self, rows):
+        """
+        Applies the current (trans_id, dir_id, name) rows: steps of deleted transformations are
+        dropped, renamed/moved ones get the new name and folder (their SQL is not re-read).
+        """
+        current = {trans_id: (dir_id, name) for trans_id, dir_id, name in rows}
+        for trans_id in list(self.by_trans):
+            attr_ids = self.by_trans[trans_id]
+            if trans_id not in current:
+                for attr_id in list(attr_ids):
+                    self.remove(attr_id)
+                del self.by_trans[trans_id]
+                continue
+            dir_id, name = current[trans_id]
+            for attr_id in attr_ids:
+                entry = self.steps[attr_id]
+                if entry[1] != dir_id or entry[2] != name:
+                    self.steps[attr_id] = (trans_id, dir_id, name, entry[3], entry[4])
+
+    def update(self, attr_id, sql):
+        """Re-indexes one attribute in place (after the bot itself updated the SQL)."""
+        if attr_id not in self.steps: return
+        trans_id, dir_id, trans_name, step_name, _ = self.steps[attr_id]
+        self.remove(attr_id)
+        self._add(attr_id, trans_id, dir_id, trans_name, step_name, extract_identifiers(sql))
+
+    def remove(self, attr_id):
+        entry = self.steps.pop(attr_id, None)
+        if not entry: return
+        self.by_trans[entry[0]].discard(attr_id)
+        for ident in entry[4]:
+            hits = self.postings.get(ident)
+            if hits is None: continue
+            hits.discard(attr_id)
+            if not hits: del self.postings[ident]
+
+    def _add(self, attr_id, trans_id, dir_id, trans_name, step_name, identifiers):
+        self.steps[attr_id] = (trans_id, dir_id, trans_name, step_name, frozenset(identifiers))
+        self.by_trans[trans_id].add(attr_id)
+        for ident in identifiers:
+            self.postings[ident].add(attr_id)
+
+    @staticmethod
+    def can_answer(term):
+        """
+        Identifier-like terms only. Keywords are not indexed (a column named "date" has no
+        postings), so terms that are, or are part of, a keyword go to the DB scan instead.
+        """
+        t = term.strip()
+        if not IDENT_TERM.match(t): return False
+        t = t.replace('"', '').lower()
+        return not any(t in keyword for keyword in SQL_KEYWORDS)
+
+    def search(self, term):
+        """
+        Every step using `term`: exact identifier hits first, then identifiers containing it
+        (same semantics as the old ILIKE '%term%', but over the identifier vocabulary).
+        """
+        t = term.strip().replace('"', '').lower()
+        if not t: return []
+
+        exact = self.postings.get(t, set())
+        partial = set()
+        for ident, hits in self.postings.items():
+            if t in ident and ident != t:
+                partial |= hits
+        partial -= exact
+
+        results = []
+        for group in (exact, partial):
+            entries = sorted((self.steps[a] for a in group), key=lambda e: (e[2], e[3]))
+            for trans_id, dir_id, trans_name, step_name, _ in entries:
+                results.append({'dir_id': dir_id, 'name': trans_name, 'type': 'TRANS', 'step': step_name})
+        return results
@@ -1,47 +1,302 @@
 import psutil
 import shutil
 import os
+import logging
+import threading
+import time
+from array import array
+from config import settings
+
+# Background sampler: seconds between samples and how much history is kept
+SYSTEM_SAMPLE_SEC = getattr(settings, 'SYSTEM_SAMPLE_SEC', 10)
+SYSTEM_HISTORY_SEC = getattr(settings, 'SYSTEM_HISTORY_SEC', 3600)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+# Java main classes / launch scripts -> PDI workload
+PDI_ROLES = (
+    ('org.pentaho.di.www.Carte', 'Carte'), ('carte.sh', 'Carte'),
+    ('org.pentaho.di.kitchen.Kitchen', 'Kitchen'), ('kitchen.sh', 'Kitchen'),
+    ('org.pentaho.di.pan.Pan', 'Pan'), ('pan.sh', 'Pan'),
+)
+# Kitchen/Pan arguments naming the job/transformation
+PDI_TARGET_ARGS = ('-job=', '/job:', '-trans=', '/trans:', '-file=', '/file:')
+# Launchers that may turn into java later (kitchen.sh -> exec java): re-checked every refresh
+LAUNCHER_NAMES = ('sh', 'bash', 'dash', 'kitchen.sh', 'pan.sh', 'carte.sh')
+
+
+class RingSeries:
+    """
+    Fixed-size time series: one float array per metric plus a timestamp array,
+    written round-robin (no per-sample objects).
+    """
+
+    def __init__(self, metrics, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.data = {m: array('f', bytes(4 * capacity)) for m in metrics}
+        self.pos = 0    # next slot to write
+        self.count = 0  # filled slots
+
+    def append(self, ts, values):
+        for m, col in self.data.items():
+            col[self.pos] = values.get(m, 0.0)
+        self.times[self.pos] = ts
+        self.pos = (self.pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def values(self, metric, since=None):
+        """Chronological values of one metric (optionally only samples newer than `since`)."""
+        col = self.data[metric]
+        start = (self.pos - self.count) % self.capacity
+        idx = [(start + i) % self.capacity for i in range(self.count)]
+        if since is not None:
+            idx = [i for i in idx if self.times[i] >= since]
+        return [col[i] for i in idx]
+
+    def latest(self, metric):
+        if not self.count: return None
+        return self.data[metric][(self.pos - 1) % self.capacity]
+
+
+def sparkline(values, width=30):
+    """Text sparkline; longer series are averaged down to `width` buckets."""
+    if not values: return ""
+    if len(values) > width:
+        step = len(values) / width
+        values = [sum(b) / len(b) for b in
+                  (values[int(i * step):int((i + 1) * step)] for i in range(width)) if b]
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1
+    return "".join(SPARK_CHARS[int((v - lo) / span * (len(SPARK_CHARS) - 1))] for v in values)
+
+
+def describe_java(cmdline):
+    """Maps a Java command line to (role, target) e.g. ('Kitchen', 'LOAD_DWH')."""
+    cmd = " ".join(cmdline)
+    role = next((r for marker, r in PDI_ROLES if marker in cmd), 'PDI' if 'pentaho' in cmd.lower() else 'Java')
+    target = ""
+    for arg in cmdline:
+        for prefix in PDI_TARGET_ARGS:
+            if arg.lower().startswith(prefix):
+                target = os.path.basename(arg[len(prefix):].strip('"\''))
+    return role, target
+
+
+class TrackedProcess:
+    def __init__(self, proc, role, target):
+        self.proc = proc
+        self.pid = proc.pid
+        self.role = role
+        self.target = target
+        self.io_last = None  # (read_bytes, write_bytes, ts)
+        self.stats = {}
+
+
+class ProcessTable:
+    """
+    Java/PDI processes discovered once, then kept up to date incrementally: each refresh only
+    diffs the PID list against the previous one, classifies PIDs that are new and drops exited
+    ones (no full process scan). Launcher shells are re-checked until they exec into java.
+    A PID that vanished and came back (reused) shows up as new, so it is classified again.
+    """
+
+    def __init__(self):
+        self.tracked = {}   # pid -> TrackedProcess (proc.is_running() also checks create_time)
+        self.ignored = {}   # (pid, create_time) -> name of non-Java processes already looked at
+        self.pids = set()   # PID list of the previous refresh
+        self.scans = 0
+
+    def refresh(self):
+        pids = set(psutil.pids())
+        fresh = pids - self.pids
+        for pid in list(self.tracked):
+            if pid not in pids or not self.tracked[pid].proc.is_running():
+                del self.tracked[pid]
+                if pid in pids: fresh.add(pid)  # same PID, different process
+        gone = self.pids - pids
+        if gone:
+            for key in [k for k in self.ignored if k[0] in gone]:
+                del self.ignored[key]
+
+        # New PIDs, plus launcher shells (they may exec into java under the same PID)
+        recheck = [k for k, name in self.ignored.items() if name in LAUNCHER_NAMES]
+        for pid in fresh:
+            if pid in self.tracked: continue
+            try:
+                proc = psutil.Process(pid)
+                key = (pid, proc.create_time())
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            self._classify(proc, key)
+        for key in recheck:
+            try:
+                self._classify(psutil.Process(key[0]), key)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                self.ignored.pop(key, None)
+        self.pids = pids
+        self.scans += 1
+
+        now = time.time()
+        for tp in list(self.tracked.values()):
+            try:
+                self._sample(tp, now)
+            except psutil.NoSuchProcess:
+                del self.tracked[tp.pid]
+        return list(self.tracked.values())
+
+    def _classify(self, proc, key):
+        try:
+            name = proc.name() or ''
+            if 'java' not in name.lower():
+                self.ignored[key] = name
+                return
+            self.ignored.pop(key, None)
+            role, target = describe_java(proc.cmdline())
+            tp = TrackedProcess(proc, role, target)
+            proc.cpu_percent(interval=None)  # baseline for the next sample
+            self.tracked[proc.pid] = tp
+        except psutil.AccessDenied:
+            self.ignored[key] = ''
+        except psutil.NoSuchProcess:
+            pass
+
+    def _sample(self, tp, now):
+        p = tp.proc
+        with p.oneshot():
+            stats = {
+                'rss_gb': round(p.memory_info().rss / (1024**3), 2),
+                'cpu': p.cpu_percent(interval=None),
+                'threads': p.num_threads(),
+                'fds': None,
+                'read_bps': None,
+                'write_bps': None,
+            }
+            try:
+                stats['fds'] = p.num_fds()
+            except (psutil.AccessDenied, AttributeError):
+                pass
+            try:
+                io = p.io_counters()
+                if tp.io_last:
+                    r0, w0, t0 = tp.io_last
+                    dt = max(now - t0, 1e-6)
+                    stats['read_bps'] = (io.read_bytes - r0) / dt
+                    stats['write_bps'] = (io.write_bytes - w0) / dt
+                tp.io_last = (io.read_bytes, io.write_bytes, now)
+            except (psutil.AccessDenied, AttributeError):
+                pass
+        tp.stats = stats
+
+
+def fmt_rate(bps):
+    if bps is None: return "n/a"
+    for unit in ("B", "KB", "MB"):
+        if bps < 1024: return f"{bps:.0f}{unit}/s"
+        bps /= 1024
+    return f"{bps:.1f}GB/s"
+
 
 class SystemService:
-    def get_health_report(self):
-        """
-        Returns a dictionary with vital system stats.
-        """
-        # 1. CPU Usage
-        cpu_usage = psutil.cpu_percent(interval=1)
-        
-        # 2. Memory (RAM)
+    METRICS = ('cpu', 'mem_percent', 'mem_used', 'disk_percent', 'disk_free', 'java_rss')
+
+    def __init__(self):
+        self.series = RingSeries(self.METRICS, max(1, SYSTEM_HISTORY_SEC // SYSTEM_SAMPLE_SEC))
+        self.processes = ProcessTable()
+        self.latest = None
+        self.lock = threading.Lock()
+        self.sample_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Starts the background sampler (also started lazily by the first report)."""
+        if self.thread and self.thread.is_alive(): return
+        self.stopping.clear()
+        # First cpu_percent(None) call only sets the baseline
+        psutil.cpu_percent(interval=None)
+        self.thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stopping.set()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logging.error(f"System Sampler Error: {e}")
+            self.stopping.wait(SYSTEM_SAMPLE_SEC)
+
+    def sample(self):
+        """Takes one sample (non-blocking CPU reading since the previous one)."""
+        with self.sample_lock:
+            return self._take_sample()
+
+    def _take_sample(self):
+        cpu_usage = psutil.cpu_percent(interval=None)
         mem = psutil.virtual_memory()
-        mem_total_gb = round(mem.total / (1024**3), 1)
-        mem_used_gb = round(mem.used / (1024**3), 1)
-        mem_percent = mem.percent
-        
-        # 3. Disk Space (Root partition)
         disk = shutil.disk_usage("/")
-        disk_total_gb = round(disk.total / (1024**3), 1)
-        disk_free_gb = round(disk.free / (1024**3), 1)
-        disk_percent = round((disk.used / disk.total) * 100, 1)
-        
-        # 4. Process Check (Find PDI/Java hogs)
+
+        # Tracked PDI/Java processes (incremental, no full process scan)
+        procs = sorted(self.processes.refresh(), key=lambda tp: tp.stats.get('rss_gb', 0), reverse=True)
+        java_rss = sum(tp.stats.get('rss_gb', 0) for tp in procs)
         java_procs = []
-        for proc in psutil.process_iter(['pid', 'name', 'memory_info']):
-            try:
-                if 'java' in proc.info['name'].lower():
-                    mem_gb = round(proc.info['memory_info'].rss / (1024**3), 2)
-                    if mem_gb > 0.5: # Only show heavy processes (>500MB)
-                        java_procs.append(f"☕ Java (PID {proc.info['pid']}): {mem_gb} GB")
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
+        for tp in procs:
+            st = tp.stats
+            label = f"{tp.role}: {tp.target}" if tp.target else tp.role
+            java_procs.append(
+                f"☕ {label} (PID {tp.pid}): {st['rss_gb']} GB | CPU {st['cpu']}% | "
+                f"🧵 {st['threads']} | 📂 {st['fds'] if st['fds'] is not None else 'n/a'} | "
+                f"IO r {fmt_rate(st['read_bps'])} w {fmt_rate(st['write_bps'])}"
+            )
 
-        return {
+        report = {
             "cpu": cpu_usage,
-            "mem_total": mem_total_gb,
-            "mem_used": mem_used_gb,
-            "mem_percent": mem_percent,
-            "disk_total": disk_total_gb,
-            "disk_free": disk_free_gb,
-            "disk_percent": disk_percent,
-            "heavy_processes": java_procs
+            "mem_total": round(mem.total / (1024**3), 1),
+            "mem_used": round(mem.used / (1024**3), 1),
+            "mem_percent": mem.percent,
+            "disk_total": round(disk.total / (1024**3), 1),
+            "disk_free": round(disk.free / (1024**3), 1),
+            "disk_percent": round((disk.used / disk.total) * 100, 1),
+            "java_rss": round(java_rss, 2),
+            "heavy_processes": java_procs,
+            "sampled_at": time.time(),
         }
+        with self.lock:
+            self.series.append(report['sampled_at'], report)
+            self.latest = report
+        return report
+
+    def get_health_report(self):
+        """
+        Returns a dictionary with vital system stats (latest background sample, no waiting).
+        """
+        if self.thread is None: self.start()
+        with self.lock:
+            latest = self.latest
+        return latest or self.sample()
+
+    def get_history(self, window_sec=3600, width=30):
+        """min/avg/max + sparkline per metric over the last window_sec seconds."""
+        since = time.time() - window_sec
+        result = {}
+        with self.lock:
+            for m in self.METRICS:
+                vals = self.series.values(m, since)
+                if not vals: continue
+                result[m] = {
+                    'min': round(min(vals), 1),
+                    'avg': round(sum(vals) / len(vals), 1),
+                    'max': round(max(vals), 1),
+                    'spark': sparkline(vals, width),
+                    'samples': len(vals),
+                }
+        return result
+
+    def metrics(self):
+        return {'samples': self.series.count, 'capacity': self.series.capacity, 'sample_sec': SYSTEM_SAMPLE_SEC,
+                'tracked_java': len(self.processes.tracked), 'known_other_pids': len(self.processes.ignored)}
 
-system_service = SystemService()
\ No newline at end of file
+system_service = SystemService()
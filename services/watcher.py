@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from config import settings
+from services.carte import carte_service, UNKNOWN_ID
+
+# One shared tick for all tracked runs (sec)
+WATCH_TICK_SEC = getattr(settings, 'WATCH_TICK_SEC', 3)
+# Ticks a run may be missing from /status before we ask Carte about it directly; after this many
+# direct checks without a status (Carte restarted and forgot it, or is not answering) the run ends as lost
+WATCH_LOST_TICKS = getattr(settings, 'WATCH_LOST_TICKS', 10)
+
+# Live progress: min seconds between log polls per run, and log lines kept per run
+WATCH_LOG_SEC = getattr(settings, 'WATCH_LOG_SEC', 6)
+WATCH_LOG_LINES = getattr(settings, 'WATCH_LOG_LINES', 30)
+
+# Direct status checks allowed per tick (keeps lost runs from bursting Carte)
+LOST_CHECKS_PER_TICK = 5
+
+SUCCESS_STATES = ["Finished"]
+FAILED_STATES = ["Stopped", "Stopped (with errors)", "Failed", "Finished (with errors)"]
+LOST_STATE = "Lost (no longer known to Carte)"
+
+
+class Run:
+    def __init__(self, carte_id, name, is_job, on_done, on_progress=None):
+        self.carte_id = carte_id
+        self.name = name
+        self.is_job = is_job
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.started_at = time.time()
+        self.status = "Initializing"
+        self.missing = 0
+        self.unanswered = 0  # direct checks in a row that came back without a status
+
+        # Incremental log: next Carte line number to ask for + bounded window of recent lines
+        self.log_line = 0
+        self.log = deque(maxlen=WATCH_LOG_LINES)
+        self.log_polled_at = 0
+
+    def log_text(self):
+        return "\n".join(self.log)
+
+
+class ExecutionWatcher:
+    """
+    Tracks every launched job/trans and refreshes them all from one /status snapshot per tick,
+    so the number of Carte requests does not grow with the number of runs.
+    """
+
+    def __init__(self):
+        self.runs = {}  # carte_id -> Run
+        self.task = None
+
+    def track(self, carte_id, name, is_job, on_done, on_progress=None):
+        """
+        Starts watching a run. on_done(run, success, log) is awaited once when it ends
+        (log is only fetched for failures). If given, on_progress(run) is awaited whenever
+        new log lines arrived (run.log holds the latest WATCH_LOG_LINES of them).
+        Returns False (nothing tracked) if Carte gave no usable id.
+        """
+        if not carte_id or carte_id == UNKNOWN_ID: return False
+        self.runs[carte_id] = Run(carte_id, name, is_job, on_done, on_progress)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._loop())
+        return True
+
+    async def _loop(self):
+        while self.runs:
+            await asyncio.sleep(WATCH_TICK_SEC)
+            try:
+                await self._tick()
+            except Exception as e:
+                logging.error(f"Watcher Error: {e}")
+
+    async def _tick(self):
+        snapshot = await carte_service.get_snapshot(max_age=WATCH_TICK_SEC)
+
+        finished = []
+        direct_checks = 0
+        for run in list(self.runs.values()):
+            # A stale snapshot (Carte not answering /status) says nothing about the run -> treated as missing
+            entry = snapshot.find(run.carte_id) if snapshot.ok else None
+            if entry:
+                run.missing = 0
+                run.status = entry['status']
+            else:
+                # Not (yet / anymore) in /status -> after a while ask for this run directly
+                run.missing += 1
+                if run.missing < WATCH_LOST_TICKS or direct_checks >= LOST_CHECKS_PER_TICK: continue
+                run.missing = 0
+                direct_checks += 1
+                status, text, run.log_line = await carte_service.get_log(run.name, run.carte_id, run.is_job,
+                                                                         run.log_line)
+                if status and status != "Connection Error":
+                    run.log.extend(text.splitlines())
+                    run.unanswered = 0
+                    run.status = status
+                else:
+                    # Error page (unknown id), bad reply or no reply at all instead of a status
+                    run.unanswered += 1
+                    if run.unanswered >= WATCH_LOST_TICKS: run.status = LOST_STATE
+
+            if run.status in SUCCESS_STATES or run.status in FAILED_STATES or run.status == LOST_STATE:
+                finished.append(run)
+
+        for run in finished:
+            self.runs.pop(run.carte_id, None)
+        if finished:
+            await asyncio.gather(*(self._finish(run) for run in finished))
+
+        # Live progress for runs someone is watching
+        now = time.monotonic()
+        due = [r for r in self.runs.values() if r.on_progress and now - r.log_polled_at >= WATCH_LOG_SEC]
+        if due:
+            await asyncio.gather(*(self._progress(run) for run in due))
+
+    async def _poll_log(self, run):
+        """Fetches only the log lines after the last one seen -> True if there were new ones."""
+        run.log_polled_at = time.monotonic()
+        status, text, last_line = await carte_service.get_log(run.name, run.carte_id, run.is_job, run.log_line)
+        if status == "Connection Error": return False
+        run.log_line = last_line
+        lines = text.splitlines()
+        run.log.extend(lines)
+        return bool(lines)
+
+    async def _progress(self, run):
+        try:
+            if await self._poll_log(run):
+                await run.on_progress(run)
+        except Exception as e:
+            logging.error(f"Watcher Progress Error ({run.name}): {e}")
+
+    async def _finish(self, run):
+        success = run.status in SUCCESS_STATES
+        log = None
+        if not success and run.status != LOST_STATE:
+            # Only the lines we have not seen yet
+            await self._poll_log(run)
+        if not success:
+            log = run.log_text() or run.status
+        try:
+            await run.on_done(run, success, log)
+        except Exception as e:
+            logging.error(f"Watcher Notify Error ({run.name}): {e}")
+
+    def metrics(self):
+        return {'tracked_runs': len(self.runs), 'tick_sec': WATCH_TICK_SEC,
+                'live_progress': sum(1 for r in self.runs.values() if r.on_progress)}
+
+
+execution_watcher = ExecutionWatcher()
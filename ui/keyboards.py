@@ -44,6 +44,9 @@ class Keyboards:
             tools.append(InlineKeyboardButton("🔙 Up Level", callback_data=f"OPEN|{target_up}|0|ALL"))
 
         tools.append(InlineKeyboardButton("🔍 Search", callback_data="SEARCH_INIT"))
+
+        if dir_id != -1 and 'RUN' in permissions:
+            tools.append(InlineKeyboardButton("⚡ Run Folder", callback_data=f"BULK_ASK|DIR|{dir_id}|{filter_mode}"))
         
         if dir_id == -1:
             tools.append(InlineKeyboardButton("📜 My Activity", callback_data="MY_ACTIVITY"))
@@ -60,9 +63,8 @@ class Keyboards:
 
         if len(tools) > 3:
              # Split into two rows if > 3 buttons
-             keyboard.append(tools[:3])
-             keyboard.append(tools[3:6])
-             keyboard.append(tools[6:])
+             for i in range(0, len(tools), 3):
+                 keyboard.append(tools[i:i + 3])
         elif tools:
              keyboard.append(tools)
         
@@ -73,8 +75,10 @@ class Keyboards:
         kb = []
         for item in matches[:15]:
             icon = "✴️" if item['type'] == 'JOB' else "⚙️"
+            label = f"{icon} {item['name']}"
+            if item.get('step'): label += f" › {item['step']}"
             kb.append([InlineKeyboardButton(
-                f"{icon} {item['name']}", 
+                label, 
                 callback_data=f"PREP|{item['dir_id']}|{item['name']}|{item['type']}"
             )])
             
@@ -149,6 +153,42 @@ class Keyboards:
         kb.append([InlineKeyboardButton("🔙 Main Menu", callback_data="OPEN|-1|0")])
         return InlineKeyboardMarkup(kb)
 
+    @staticmethod
+    def history_nav(ref, runs, next_cursor, cursor=None):
+        """`ref` is the short key of the (dir_id, name, is_job) shown; buttons carry only it and a run id / cursor."""
+        kb = []
+        # Full log per run (loaded on demand; runs without a batch id have no log to load)
+        log_btns = [InlineKeyboardButton(f"📄 #{r['id']}", callback_data=f"HIST_LOG|{ref}|{r['id']}")
+                    for r in runs if r['id'] is not None]
+        for i in range(0, len(log_btns), 3):
+            kb.append(log_btns[i:i + 3])
+
+        nav = []
+        if cursor is not None:
+            nav.append(InlineKeyboardButton("⏮ Newest", callback_data=f"HIST_PAGE|{ref}"))
+        if next_cursor is not None:
+            nav.append(InlineKeyboardButton("⬅️ Older", callback_data=f"HIST_PAGE|{ref}|{next_cursor}"))
+        if nav: kb.append(nav)
+
+        kb.append([InlineKeyboardButton("🔙 Back", callback_data=f"HIST_BACK|{ref}"),
+                   InlineKeyboardButton("🔄 Refresh", callback_data=f"HIST_PAGE|{ref}" + (f"|{cursor}" if cursor is not None else ""))])
+        return InlineKeyboardMarkup(kb)
+
+    @staticmethod
+    def bulk_confirm(ref, back_data):
+        kb = [[InlineKeyboardButton("✅ Run All", callback_data=f"BULK_RUN|{ref}")],
+              [InlineKeyboardButton("🔙 Cancel", callback_data=back_data)]]
+        return InlineKeyboardMarkup(kb)
+
+    @staticmethod
+    def log_follow(ref, following=False):
+        """`ref` is the short key of the process name (see log_refs in handlers)."""
+        if following:
+            btn = InlineKeyboardButton("⏹ Stop Following", callback_data=f"LOG_UNFOLLOW|{ref}")
+        else:
+            btn = InlineKeyboardButton("▶️ Follow Live", callback_data=f"LOG_FOLLOW|{ref}")
+        return InlineKeyboardMarkup([[btn]])
+
     @staticmethod
     def admin_menu(is_frozen):
         toggle_txt = "🔥 Unfreeze System" if is_frozen else "❄️ Freeze System"
@@ -156,6 +196,7 @@ class Keyboards:
             [InlineKeyboardButton("👤 Add User", callback_data="ADMIN_ADD_USER")], 
             [InlineKeyboardButton(toggle_txt, callback_data="TOGGLE_FREEZE")],
             [InlineKeyboardButton("📅 Scheduled Jobs", callback_data="SCHED_DASHBOARD")],
+            [InlineKeyboardButton("📈 Service Metrics", callback_data="ADMIN_METRICS")],
             [InlineKeyboardButton("💀 Kill Bot Process", callback_data="KILL_CONFIRM")],
             [InlineKeyboardButton("🔙 Back to Menu", callback_data="OPEN|-1|0")]
         ]
@@ -1,3 +1,4 @@
+import html
 from datetime import datetime
 
 class Msg:
@@ -37,6 +38,14 @@ class Msg:
     def execution_start(job_name):
         return f"✴️ <b>Starting:</b> <code>{job_name}</code>"
 
+    @staticmethod
+    def execution_queued(job_name, position, reason):
+        return (
+            f"⏳ <b>Queued:</b> <code>{job_name}</code>\n"
+            f"Position: <b>{position}</b>\n"
+            f"<i>Waiting: {reason}</i>"
+        )
+
     @staticmethod
     def execution_success(job_name, job_id):
         return (
@@ -46,6 +55,15 @@ class Msg:
             f"⏳ Monitoring..."
         )
 
+    @staticmethod
+    def execution_progress(job_name, job_id, status, log_text):
+        # Newest lines only, the message is edited in place while the run is going
+        log_text = log_text[-1500:]
+        return (
+            f"{Msg.execution_success(job_name, job_id)} <i>{status}</i>\n"
+            f"<pre>{html.escape(log_text) or ' '}</pre>"
+        )
+
     @staticmethod
     def execution_failure(job_name, error):
         return f"❌ <b>Error:</b> {error}"
@@ -60,20 +78,91 @@ class Msg:
         return msg
 
     @staticmethod
-    def history_view(name, history_data):
+    def service_metrics(sections):
+        """sections: list of (title, {metric: value})"""
+        msg = "📈 <b>Service Metrics</b>\n━━━━━━━━━━━━━━━━━━\n"
+        for title, stats in sections:
+            msg += f"\n<b>{title}</b>\n"
+            msg += "\n".join(f"• {k}: <code>{v}</code>" for k, v in stats.items()) + "\n"
+        return msg
+
+    @staticmethod
+    def log_tail(name, content, following=False):
+        # Keep the newest part so the message stays under Telegram's 4096 chars
+        content = content[-3500:]
+        state = "🔴 <i>Live (following)</i>\n" if following else ""
+        return f"📜 <b>Log Tail: {name}</b>\n{state}<pre>{html.escape(content) or ' '}</pre>"
+
+    @staticmethod
+    def bulk_confirm(title, items, skipped=0, running=0):
+        jobs = sum(1 for _, _, is_job in items if is_job)
+        msg = (
+            f"⚡ <b>Bulk Run: {html.escape(title)}</b>\n"
+            f"━━━━━━━━━━━━━━━━━━\n"
+            f"✴️ {jobs} Jobs | ⚙️ {len(items) - jobs} Transformations\n"
+        )
+        if skipped: msg += f"⚠️ {skipped} not found in the repository (skipped)\n"
+        if running: msg += f"🏃 {running} running on Carte right now (skipped)\n"
+        msg += "\n" + "\n".join(f"• {html.escape(name)}" for name, _, _ in items[:15])
+        if len(items) > 15: msg += f"\n<i>...and {len(items) - 15} more.</i>"
+        return msg
+
+    @staticmethod
+    def bulk_progress(bulk):
+        c = bulk.counts()
+        done = c['succeeded'] + c['failed'] + c['unknown'] + c['lost']
+        msg = (
+            f"⚡ <b>Bulk Run: {html.escape(bulk.title)}</b>\n"
+            f"━━━━━━━━━━━━━━━━━━\n"
+            f"📦 {done}/{len(bulk.items)} done · ⏱ {Msg.duration(bulk.duration())}\n"
+            f"✅ {c['succeeded']} | ❌ {c['failed']} | 🏃 {c['running']} | ⏳ {c['pending'] + c['starting']}"
+        )
+        if c['unknown'] or c['lost']: msg += f" | ❔ {c['unknown'] + c['lost']}"
+        return msg
+
+    @staticmethod
+    def bulk_summary(bulk):
+        c = bulk.counts()
+        icon = "🎉" if not (c['failed'] or c['unknown'] or c['lost']) else "⚠️"
+        msg = (
+            f"{icon} <b>Bulk Run Finished: {html.escape(bulk.title)}</b>\n"
+            f"✅ {c['succeeded']} succeeded | ❌ {c['failed']} failed | ⏱ {Msg.duration(bulk.duration())}\n"
+        )
+        if c['unknown'] or c['lost']:
+            msg += f"❔ {c['unknown']} not followed (no run id) | {c['lost']} lost (no end seen)\n"
+        problems = bulk.problems()
+        if problems:
+            msg += "\n<b>Failed / not followed:</b>\n" + "\n".join(
+                f"• {html.escape(i.name)}: <i>{html.escape(i.error[:80])}</i>" for i in problems[:10])
+            if len(problems) > 10: msg += f"\n<i>...and {len(problems) - 10} more.</i>"
+        return msg
+
+    @staticmethod
+    def history_view(name, history_data, owner=None, older=False):
         if not history_data:
             return f"📜 <b>History: {name}</b>\n\nNo records found (or DB error)."
         
-        msg = f"📜 <b>History: {name}</b>\n\n"
+        msg = f"📜 <b>History: {name}</b>\n"
+        if owner: msg += f"👤 {owner}\n"
+        if older: msg += "<i>(older runs)</i>\n"
+        msg += "\n"
         for h in history_data:
             icon = "✅" if h['status'] == 'end' else "❌"
+            duration = Msg.duration(h['duration']) if h['duration'] is not None else "?"
+            run_id = f" · #{h['id']}" if h['id'] is not None else ""
             msg += (
-                f"{icon} <b>{h['date']}</b>\n"
-                f"👤 {h['user']} | Status: {h['status']}\n"
-                f"📝 <i>{h['log']}</i>\n\n"
+                f"{icon} <b>{h['date']}</b> · ⏱ {duration}{run_id}\n"
+                f"Status: {h['status']} | 📥 {h['read'] or 0} / 📤 {h['written'] or 0} rows\n"
+                f"📝 <i>{html.escape(h['log'])}</i>\n\n"
             )
         return msg
 
+    @staticmethod
+    def duration(seconds):
+        h, rem = divmod(max(int(seconds), 0), 3600)
+        m, s = divmod(rem, 60)
+        return f"{h}h {m:02}m" if h else f"{m}m {s:02}s"
+
     @staticmethod
     def manager_report(data):
         if not data: return "⚠️ Error fetching stats."